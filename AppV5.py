@@ -1,31 +1,33 @@
-import asyncio
-import threading
 import tkinter as tk
-from tkinter import ttk, messagebox, Toplevel, Scale
+from tkinter import ttk, messagebox, simpledialog, Toplevel, Scale
 import keyboard
-import mouse
-import json  # Import the json module
-import os
+import time
+import signal
+import multiprocessing
+from collections import deque
 
-# Correct imports for the Siege-Wizard fork
-from buttplug import Client, WebsocketConnector
-from buttplug.errors import (ClientError, ConnectorError,
-                       ButtplugError)
+from IntifaceCore import IntifaceCore, DEFAULT_SERVER_URL
+from Choreography import PATTERNS, OFFSETS
+from ResponseCurve import curve_value, compile_curve
+
+GRAPH_SECONDS = 10.0  # Time span shown by the intensity graph
+GRAPH_FPS = 20  # Frame rate cap for the graph
 
 
 class IntifaceApp:
+    """Tk front end; connections, devices, sending and bindings live in IntifaceCore."""
+
     def __init__(self, master):
         self.master = master
         master.title("Intiface Haptic Control")
         master.minsize(300, 250)
 
-        self.client = None
-        self.device = None
-        self.vibrating = False  # Track vibration state
-
-        # Load keybindings from file, or use defaults
-        self.load_keybindings()
+        self.graph = None
 
+        # Engine: event loop thread, devices, key bindings, watchdog and plugins. Created
+        # first so an auto-connect runs while the widgets below are built; its events are
+        # applied once the main loop starts.
+        self.core = IntifaceCore(listener=self.on_core_event)
 
         # Styling
         self.style = ttk.Style()
@@ -56,6 +58,23 @@ class IntifaceApp:
         self.options_menu.add_command(label="Rebind Intensity Increase Key", command=self.rebind_increase_key)
         self.options_menu.add_command(label="Rebind Intensity Decrease Key", command=self.rebind_decrease_key)
         self.options_menu.add_command(label="Set Vibration Intensity", command=self.set_intensity)
+        self.options_menu.add_command(label="Set Max Vibration Time", command=self.set_max_vibration_time)
+        self.options_menu.add_command(label="Set Intiface Servers", command=self.set_server_urls)
+        self.options_menu.add_command(label="Plugins", command=self.show_plugins)
+        self.options_menu.add_command(label="Choreography", command=self.show_choreography)
+        self.options_menu.add_command(label="Device Response Curves", command=self.show_curves)
+        self.hook_process_var = tk.BooleanVar(value=False)
+        self.options_menu.add_checkbutton(label="Run Key Hooks in Separate Process", variable=self.hook_process_var,
+                                          command=self.toggle_hook_process)
+        self.auto_connect_var = tk.BooleanVar(value=False)
+        self.options_menu.add_checkbutton(label="Connect at Launch", variable=self.auto_connect_var,
+                                          command=self.toggle_auto_connect)
+        self.show_graph_var = tk.BooleanVar(value=False)
+        self.options_menu.add_checkbutton(label="Show Intensity Graph", variable=self.show_graph_var,
+                                          command=self.toggle_graph)
+        self.options_menu.add_command(label="Diagnostics", command=self.show_diagnostics)
+        self.options_menu.add_command(label="Log", command=self.show_log)
+        self.options_menu.add_command(label="Statistics", command=self.show_stats)
 
 
         # Connect Button
@@ -64,6 +83,11 @@ class IntifaceApp:
         )
         self.connect_button.pack(pady=10, padx=20, fill=tk.X)
 
+        # Device selection (devices from every connected server)
+        self.device_combo = ttk.Combobox(master, state="readonly", font=('Arial', 12))
+        self.device_combo.pack(pady=5, padx=20, fill=tk.X)
+        self.device_combo.bind("<<ComboboxSelected>>", self.select_device)
+
         # Vibrate Button (Press and Hold)
         self.vibrate_button = ttk.Button(master, text="Vibrate", style='TButton')
         self.vibrate_button.pack(pady=5, padx=20, fill=tk.X)
@@ -75,232 +99,175 @@ class IntifaceApp:
         self.status_label = ttk.Label(master, text="Not Connected", style='TLabel')
         self.status_label.pack(pady=5)
 
+        # Status lines from plugins (relay latency, ...), empty unless a plugin reports something
+        self.plugin_status_label = ttk.Label(master, text="", style='TLabel', wraplength=280, justify=tk.LEFT)
+        self.plugin_status_label.pack(pady=2)
+
         # Quit Button
         self.quit_button = ttk.Button(master, text="Quit", command=self.quit_app, style='TButton')  # Use quit_app
         self.quit_button.pack(pady=10, padx=20, fill=tk.X)
 
-        # Asynchronous event loop handling (for Buttplug)
-        self.event_loop = asyncio.new_event_loop()
-        self.event_loop_thread = threading.Thread(
-            target=self.run_event_loop, daemon=True
-        )
-        self.event_loop_thread.start()
+        self.hook_process_var.set(self.core.hook_process)
+        self.auto_connect_var.set(self.core.auto_connect)
+        if self.core.auto_connect:
+            self.connect_button.config(state=tk.DISABLED)  # Already connecting
+
+        # Show the last session's devices right away; they go live as soon as they reappear
+        self.prebuild_device_list()
 
         # bind close button
         self.master.protocol("WM_DELETE_WINDOW", self.on_close)
 
-        # Keyboard binding
-        self.update_keyboard_binding()
-
-    def run_event_loop(self):
-        asyncio.set_event_loop(self.event_loop)
-        self.event_loop.run_forever()
+        # Stop devices on Ctrl+C and termination too
+        self.install_shutdown_handlers()
+
+    def on_core_event(self, event, value):
+        """Core listener, called from any thread; widgets are only touched from the Tk thread."""
+        self.master.after(0, self.apply_core_event, event, value)
+
+    def apply_core_event(self, event, value):
+        if event == "status":
+            self.status_label.config(text=value)
+        elif event == "vibrating":
+            self.vibrate_button.config(text="Vibrating..." if value else "Vibrate")
+        elif event == "devices":
+            self.device_combo.config(values=value)
+        elif event == "device":
+            if value is not None:
+                self.device_combo.current(value)
+        elif event == "connection":
+            if value == "connected":
+                self.vibrate_button.config(state=tk.NORMAL)
+            else:
+                self.connect_button.config(state=tk.NORMAL)
+        elif event == "plugin_status":
+            self.plugin_status_label.config(text=value)
+        elif event == "settings":
+            # The settings file was edited
+            self.hook_process_var.set(self.core.hook_process)
+            self.auto_connect_var.set(self.core.auto_connect)
+
+    def prebuild_device_list(self):
+        """Fills the device list from the cache before any connection exists."""
+        labels, index = self.core.cached_devices()
+        if not labels:
+            return
+        self.device_combo.config(values=labels)
+        if index is not None:
+            self.device_combo.current(index)
 
     def connect_to_intiface(self):
         self.connect_button.config(state=tk.DISABLED)
-        asyncio.run_coroutine_threadsafe(self.connect_task(), self.event_loop)
-
-    async def connect_task(self):
-        """Connects to Intiface and scans for devices."""
+        self.core.connect()
 
-        self.status_label.config(text="Connecting...")
-        self.client = Client("Haptic Control App")
-        connector = WebsocketConnector("ws://localhost:12345")
-        try:
-            await self.client.connect(connector)
-            self.status_label.config(text="Connected.  Scanning...")
-            await self.client.start_scanning()
-            while not self.client.devices:
-                await asyncio.sleep(0.1)
-            self.device = list(self.client.devices.values())[0]
-            self.status_label.config(text=f"Connected to: {self.device.name}\nIntensity:{self.vibration_intensity}")
-            self.vibrate_button.config(state=tk.NORMAL)
-            await self.client.stop_scanning()
-
-        except ClientError as e:
-            self.status_label.config(text=f"Connection Error: {e}")
-            self.connect_button.config(state=tk.NORMAL)
-            return
-        except Exception as e:
-            self.status_label.config(text=f"Error: {e}")
-            self.connect_button.config(state=tk.NORMAL)
-            return
+    def select_device(self, event=None):
+        """Handles a pick from the device list."""
+        self.core.select_device(self.device_combo.current())
 
     def start_vibration(self, event=None):
         """Starts vibration (GUI button)."""
-        if self.device and not self.vibrating:
-            self.vibrating = True
-            asyncio.run_coroutine_threadsafe(self.vibrate_task(self.vibration_intensity), self.event_loop)  # Use stored intensity
-            self.vibrate_button.config(text="Vibrating...")
+        self.core.press("button")  # Watchdog can't check a held GUI button against key state
 
     def stop_vibration(self, event=None):
         """Stops vibration (GUI button)."""
-        if self.device and self.vibrating:
-            self.vibrating = False
-            asyncio.run_coroutine_threadsafe(self.vibrate_task(0.0), self.event_loop)
-            self.vibrate_button.config(text="Vibrate")
-
-    async def vibrate_task(self, intensity):
-        """Sends vibration commands, handling potential errors."""
-        try:
-            if not self.device:  # Early exit if no device
-                return
-
-            if hasattr(self.device, 'actuators') and self.device.actuators:
-                if hasattr(self.device.actuators[0], 'command'):
-                    await self.device.actuators[0].command(intensity)
-                else:
-                    self.status_label.config(text="Actuator does not have a command")
-            elif hasattr(self.device, 'linear_actuators') and self.device.linear_actuators:
-                if hasattr(self.device.linear_actuators[0], 'command'):
-                    await self.device.linear_actuators[0].command(250, intensity)
-                else:
-                    self.status_label.config(text="Linear Actuator error")
-            elif hasattr(self.device, 'rotatory_actuators') and self.device.rotatory_actuators:
-                if hasattr(self.device.rotatory_actuators[0], 'command'):
-                    await self.device.rotatory_actuators[0].command(intensity, True)
-                else:
-                    self.status_label.config(text="Rotatory Actuator error")
-            else:
-                self.status_label.config(text="Device doesn't support vibrate")
-
-        except (ConnectorError, ButtplugError, Exception) as e:
-            print(f"Error during vibration: {e}")
-            self.status_label.config(text=f"Error: {e}")
+        self.core.release("button")
+
+    def toggle_graph(self):
+        if self.show_graph_var.get():
+            if self.graph is None:
+                self.graph = IntensityGraph(self.master, self.core)
+            self.graph.pack(pady=5, padx=20, before=self.quit_button)
+            self.graph.start()
+        elif self.graph is not None:
+            self.graph.stop()
+            self.graph.pack_forget()
+
+    def toggle_hook_process(self):
+        """Moves the key/mouse hooks into (or back out of) their own process."""
+        self.core.hook_process = self.hook_process_var.get()
+        self.core.update_keyboard_binding()
+
+    def toggle_auto_connect(self):
+        """Connects in the background on the next launches (saved with the other settings)."""
+        self.core.auto_connect = self.auto_connect_var.get()
 
     def on_close(self):
-        async def close_client():
-            if self.client:
-                try:
-                    if self.device and self.device.connected:
-                        await self.device.stop()
-                    await self.client.disconnect()
-                except Exception:
-                    pass  # Ignore errors during close
-                finally:
-                    self.master.after(0, self.master.destroy)
-            else:
-                self.master.destroy()
+        self.core.shutdown()
+        self.master.destroy()
 
-        if self.client:
-            asyncio.run_coroutine_threadsafe(close_client(), self.event_loop)
-        else:
-            self.master.destroy()
+    def install_shutdown_handlers(self):
+        """Runs the core's stop-all shutdown on termination signals (it registers atexit itself)."""
+        for name in ("SIGINT", "SIGTERM", "SIGBREAK"):  # SIGBREAK only exists on Windows
+            sig = getattr(signal, name, None)
+            if sig is not None:
+                signal.signal(sig, self.handle_signal)
+
+    def handle_signal(self, signum, frame):
+        """Stops devices, then closes the window from the Tk thread."""
+        self.core.shutdown()
+        try:
+            self.master.after(0, self.master.destroy)
+        except tk.TclError:
+            pass  # Window already gone
 
     def rebind_vibration_key(self):
-        dialog = KeyRebindDialog(self.master, self, "vibration")
+        dialog = KeyRebindDialog(self.master, self.core, "vibration")
         self.master.wait_window(dialog)
 
     def rebind_increase_key(self):
-        dialog = KeyRebindDialog(self.master, self, "increase")
+        dialog = KeyRebindDialog(self.master, self.core, "increase")
         self.master.wait_window(dialog)
 
     def rebind_decrease_key(self):
-        dialog = KeyRebindDialog(self.master, self, "decrease")
+        dialog = KeyRebindDialog(self.master, self.core, "decrease")
         self.master.wait_window(dialog)
 
     def set_intensity(self):
-        dialog = IntensityDialog(self.master, self)
+        dialog = IntensityDialog(self.master, self.core)
         self.master.wait_window(dialog)
 
-    def increase_intensity(self, event=None):
-        """Increases the vibration intensity by 0.1, up to a maximum of 1.0."""
-        self.vibration_intensity = min(1.0, round(self.vibration_intensity + 0.1, 1))
-        if self.device:
-            self.status_label.config(text=f"Connected to: {self.device.name}\nIntensity:{self.vibration_intensity}")
-        if self.vibrating:  # If already vibrating, update the vibration
-             asyncio.run_coroutine_threadsafe(self.vibrate_task(self.vibration_intensity), self.event_loop)
-
-
-    def decrease_intensity(self, event=None):
-        """Decreases the vibration intensity by 0.1, down to a minimum of 0.0."""
-        self.vibration_intensity = max(0.0, round(self.vibration_intensity - 0.1, 1))
-        if self.device:
-            self.status_label.config(text=f"Connected to: {self.device.name}\nIntensity:{self.vibration_intensity}")
-        if self.vibrating:  # If already vibrating, update the vibration
-            asyncio.run_coroutine_threadsafe(self.vibrate_task(self.vibration_intensity), self.event_loop)
-
-    def update_keyboard_binding(self):
-        """Updates keyboard/mouse bindings, unhooking previous ones."""
-        keyboard.unhook_all()
-        mouse.unhook_all()
-
-        if self.vibration_key in ["left", "middle", "right"]:  # Mouse buttons
-            if self.vibration_key == "left":
-                mouse.on_button(self.start_vibration_mouse, buttons=(mouse.LEFT,), types=(mouse.DOWN,))
-                mouse.on_button(self.stop_vibration_mouse, buttons=(mouse.LEFT,), types=(mouse.UP,))
-            elif self.vibration_key == "middle":
-                mouse.on_button(self.start_vibration_mouse, buttons=(mouse.MIDDLE,), types=(mouse.DOWN,))
-                mouse.on_button(self.stop_vibration_mouse, buttons=(mouse.MIDDLE,), types=(mouse.UP,))
-            elif self.vibration_key == "right":
-                mouse.on_button(self.start_vibration_mouse, buttons=(mouse.RIGHT,), types=(mouse.DOWN,))
-                mouse.on_button(self.stop_vibration_mouse, buttons=(mouse.RIGHT,), types=(mouse.UP,))
-        else:  # Keyboard keys
-            keyboard.on_press_key(self.vibration_key, self.start_vibration_keyboard)
-            keyboard.on_release_key(self.vibration_key, self.stop_vibration_keyboard)
-
-        # Bind intensity increase and decrease keys
-        keyboard.on_press_key(self.intensity_increase_key, self.increase_intensity)
-        keyboard.on_press_key(self.intensity_decrease_key, self.decrease_intensity)
-
-    def start_vibration_keyboard(self, event):
-        """Starts vibration (keyboard event)."""
-        if self.device and not self.vibrating:
-            self.vibrating = True
-            asyncio.run_coroutine_threadsafe(self.vibrate_task(self.vibration_intensity), self.event_loop)  # Use intensity
-            self.master.after(0, lambda: self.vibrate_button.config(text="Vibrating..."))
-
-    def stop_vibration_keyboard(self, event):
-        """Stops vibration (keyboard event)."""
-        if self.device and self.vibrating:
-            self.vibrating = False
-            asyncio.run_coroutine_threadsafe(self.vibrate_task(0.0), self.event_loop)
-            self.master.after(0, lambda: self.vibrate_button.config(text="Vibrate"))
-
-    def start_vibration_mouse(self):
-        """Starts vibration (mouse event)."""
-        if self.device and not self.vibrating:
-            self.vibrating = True
-            asyncio.run_coroutine_threadsafe(self.vibrate_task(self.vibration_intensity), self.event_loop)  # Use intensity
-            self.master.after(0, lambda: self.vibrate_button.config(text="Vibrating..."))
-
-    def stop_vibration_mouse(self):
-        """Stops vibration (mouse event)."""
-        if self.device and self.vibrating:
-            self.vibrating = False
-            asyncio.run_coroutine_threadsafe(self.vibrate_task(0.0), self.event_loop)
-            self.master.after(0, lambda: self.vibrate_button.config(text="Vibrate"))
-
-    def load_keybindings(self):
-        """Loads keybindings from a JSON file."""
-        try:
-            with open("keybindings.json", "r") as f:
-                bindings = json.load(f)
-                self.vibration_key = bindings.get("vibration_key", "space")
-                self.intensity_increase_key = bindings.get("intensity_increase_key", "+")
-                self.intensity_decrease_key = bindings.get("intensity_decrease_key", "-")
-                self.vibration_intensity = bindings.get("vibration_intensity", 1.0)
-        except FileNotFoundError:
-            # Use default values if file not found
-            self.vibration_key = "space"
-            self.intensity_increase_key = "+"
-            self.intensity_decrease_key = "-"
-            self.vibration_intensity = 1.0
-
-    def save_keybindings(self):
-        """Saves keybindings to a JSON file."""
-        bindings = {
-            "vibration_key": self.vibration_key,
-            "intensity_increase_key": self.intensity_increase_key,
-            "intensity_decrease_key": self.intensity_decrease_key,
-            "vibration_intensity" : self.vibration_intensity
-        }
-        with open("keybindings.json", "w") as f:
-            json.dump(bindings, f)
+    def show_plugins(self):
+        dialog = PluginDialog(self.master, self.core)
+        self.master.wait_window(dialog)
+
+    def show_choreography(self):
+        ChoreographyDialog(self.master, self.core)
+
+    def show_curves(self):
+        dialog = CurveDialog(self.master, self.core)
+        self.master.wait_window(dialog)
+
+    def show_diagnostics(self):
+        DiagnosticsDialog(self.master, self.core)
+
+    def show_log(self):
+        LogDialog(self.master, self.core)
+
+    def show_stats(self):
+        StatsDialog(self.master, self.core)
+
+    def set_server_urls(self):
+        urls = simpledialog.askstring(
+            "Intiface Servers",
+            "Websocket URLs of the Intiface servers, separated by commas\n(used on the next connect):",
+            initialvalue=", ".join(self.core.server_urls), parent=self.master
+        )
+        if urls is not None:
+            self.core.server_urls = [url.strip() for url in urls.split(",") if url.strip()] or [DEFAULT_SERVER_URL]
+
+    def set_max_vibration_time(self):
+        seconds = simpledialog.askfloat(
+            "Max Vibration Time",
+            "Seconds of continuous vibration before the watchdog stops it (0 = no limit):",
+            initialvalue=self.core.max_vibration_time, minvalue=0.0, parent=self.master
+        )
+        if seconds is not None:
+            self.core.max_vibration_time = seconds
 
     def quit_app(self):
-        """Saves keybindings and destroys the application."""
-        self.save_keybindings()
+        """Saves keybindings, stops all devices and destroys the application."""
+        self.core.save_keybindings()
+        self.core.shutdown()
         self.master.destroy()
 
 
@@ -434,15 +401,399 @@ class IntensityDialog(Toplevel):
         pass
 
     def close_dialog(self):
-        self.app.vibration_intensity = self.intensity_var.get()  # Update the main app's value
-        if self.app.device:
-            self.app.status_label.config(text=f"Connected to: {self.app.device.name}\nIntensity:{self.app.vibration_intensity}")
+        self.app.set_vibration_intensity(self.intensity_var.get())  # Update the core's value
         self.destroy()
 
+class IntensityGraph(tk.Canvas):
+    """Scrolling graph of sent intensities (line) and acknowledgements (dots).
+
+    Each frame shifts the existing items with one move() and only draws the samples that
+    arrived since the last frame; items that scroll off the left edge are deleted.
+    """
+
+    def __init__(self, parent, app_instance, width=280, height=80):
+        super().__init__(parent, width=width, height=height, bg="black", highlightthickness=0)
+        self.app = app_instance
+        self.width = width
+        self.height = height
+        self.px_per_second = width / GRAPH_SECONDS
+        self.running = False
+        self.history = None
+        self.frame_id = None  # The pending after() for the next frame
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.cancel_frame()  # A stop() and start() within one frame must not leave two loops
+            self.reset()
+            self.frame()
+
+    def stop(self):
+        self.running = False
+        self.cancel_frame()
+
+    def cancel_frame(self):
+        if self.frame_id is not None:
+            self.after_cancel(self.frame_id)
+            self.frame_id = None
+
+    def x(self, timestamp, now):
+        return self.width - (now - timestamp) * self.px_per_second
+
+    def y(self, value):
+        return self.height - 3 - value * (self.height - 10)
+
+    def reset(self):
+        """Full redraw, only when the graph opens or the selected device changes."""
+        self.delete("all")
+        self.history = self.app.current_history()
+        self.items = deque()  # (created at, item id), oldest first
+        self.pending_acks = deque()  # (sequence, sample time) still waiting for an ack
+        self.last_sample = None  # (time, value) of the newest drawn sample
+        self.drawn = max(0, self.history.written - self.history.size)
+        self.last_frame = time.monotonic()
+        self.head = self.create_line(0, 0, 0, 0, fill="lime green", width=2)
+        self.draw_new(self.last_frame)
+
+    def frame(self):
+        self.frame_id = None
+        if not self.running:
+            return
+        now = time.monotonic()
+        if self.app.current_history() is not self.history:
+            self.reset()
+        else:
+            self.move("scroll", -(now - self.last_frame) * self.px_per_second, 0)
+            self.last_frame = now
+            self.draw_new(now)
+        self.draw_acks(now)
+        self.expire(now)
+        self.frame_id = self.after(int(1000 / GRAPH_FPS), self.frame)
+
+    def draw_new(self, now):
+        history = self.history
+        written = history.written
+        self.drawn = max(self.drawn, written - history.size)  # Skip anything already overwritten
+        while self.drawn < written:
+            slot = self.drawn % history.size
+            timestamp, value = history.times[slot], history.values[slot]
+            if now - timestamp < GRAPH_SECONDS:
+                if self.last_sample is not None:
+                    last_time, last_value = self.last_sample
+                    x0, x1 = self.x(max(last_time, now - GRAPH_SECONDS), now), self.x(timestamp, now)
+                    segment = self.create_line(x0, self.y(last_value), x1, self.y(last_value), x1, self.y(value),
+                                               fill="lime green", width=2, tags="scroll")
+                    self.items.append((timestamp, segment))
+                self.pending_acks.append((self.drawn, timestamp))
+            self.last_sample = (timestamp, value)
+            self.drawn += 1
+
+        # The level since the newest sample runs up to "now" at the right edge
+        if self.last_sample is not None:
+            last_time, last_value = self.last_sample
+            y = self.y(last_value)
+            self.coords(self.head, self.x(max(last_time, now - GRAPH_SECONDS), now), y, self.width, y)
+
+    def draw_acks(self, now):
+        history = self.history
+        while self.pending_acks:
+            seq, timestamp = self.pending_acks[0]
+            state = history.acks[seq % history.size] if history.written - seq <= history.size else -1
+            if state == 0 and now - timestamp < GRAPH_SECONDS:
+                break  # Acks come back in order, so later ones are still pending too
+            self.pending_acks.popleft()
+            if state != 0:
+                x = self.x(timestamp, now)
+                dot = self.create_oval(x - 2, 2, x + 2, 6, fill="deep sky blue" if state > 0 else "red",
+                                       outline="", tags="scroll")
+                self.items.append((timestamp, dot))
+
+    def expire(self, now):
+        while self.items and now - self.items[0][0] > GRAPH_SECONDS + 1:
+            self.delete(self.items.popleft()[1])
+
+
+class PluginDialog(Toplevel):
+    def __init__(self, parent, app_instance):
+        super().__init__(parent)
+        self.app = app_instance
+        self.title("Plugins")
+        self.minsize(300, 150)
+
+        names = self.app.plugin_host.discover()
+        text = "Enable plugins (only enabled ones are loaded):" if names else \
+            f"No plugins found.\nPut them in {self.app.plugin_host.plugin_dir}"
+        self.label = ttk.Label(self, text=text, font=('Arial', 12))
+        self.label.pack(pady=10, padx=10)
+
+        self.plugin_vars = {}
+        for name in names:
+            var = tk.BooleanVar(value=name in self.app.enabled_plugins)
+            ttk.Checkbutton(self, text=name, variable=var).pack(anchor=tk.W, padx=20)
+            self.plugin_vars[name] = var
+
+        self.ok_button = ttk.Button(self, text="OK", command=self.close_dialog)
+        self.ok_button.pack(pady=10)
+
+        self.grab_set()
+        self.focus_set()
+
+    def close_dialog(self):
+        self.app.enabled_plugins = [name for name, var in self.plugin_vars.items() if var.get()]
+        self.app.plugin_host.apply(self.app.enabled_plugins, self.app.plugin_config)
+        if self.app.plugin_host.errors:
+            messagebox.showerror("Plugins", self.app.plugin_host.report(), parent=self)
+        self.destroy()
+
+
+class ChoreographyDialog(Toplevel):
+    def __init__(self, parent, app_instance):
+        super().__init__(parent)
+        self.app = app_instance
+        self.title("Choreography")
+        self.minsize(360, 260)
+        settings = self.app.choreography
+
+        self.label = ttk.Label(self, text="Pattern played on every connected device:", font=('Arial', 12))
+        self.label.pack(pady=10, padx=10)
+
+        self.pattern_var = tk.StringVar(value=settings["pattern"])
+        ttk.Combobox(self, textvariable=self.pattern_var, values=list(PATTERNS), state="readonly").pack(pady=2)
+        offsets = settings["offsets"] if isinstance(settings["offsets"], str) else "travel"
+        self.offsets_var = tk.StringVar(value=offsets)
+        ttk.Combobox(self, textvariable=self.offsets_var, values=list(OFFSETS), state="readonly").pack(pady=2)
+        self.period_scale = Scale(self, from_=0.2, to=10.0, resolution=0.1, orient=tk.HORIZONTAL,
+                                  label="Period (seconds)", length=250)
+        self.period_scale.set(settings["period"])
+        self.period_scale.pack(pady=5)
+
+        buttons = ttk.Frame(self)
+        buttons.pack(pady=5)
+        ttk.Button(buttons, text="Start", command=self.start).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Stop", command=self.app.stop_choreography).pack(side=tk.LEFT, padx=5)
+
+        self.report_label = ttk.Label(self, text="", font=('Courier', 9), justify=tk.LEFT)
+        self.report_label.pack(pady=5, padx=10, anchor=tk.W)
+        self.refresh()
+
+    def start(self):
+        if not self.app.start_choreography(pattern=self.pattern_var.get(), period=self.period_scale.get(),
+                                           offsets=self.offsets_var.get()):
+            messagebox.showerror("Choreography", "Connect to Intiface first.", parent=self)
+
+    def refresh(self):
+        if not self.winfo_exists():
+            return
+        choreographer = self.app.choreographer
+        self.report_label.config(text=choreographer.report() if choreographer else "Stopped")
+        self.after(1000, self.refresh)
+
+
+class CurveDialog(Toplevel):
+    """Edits per-device response curves; changes apply live so they can be felt before saving."""
+
+    PREVIEW_SIZE = 200
+
+    def __init__(self, parent, app_instance):
+        super().__init__(parent)
+        self.app = app_instance
+        self.title("Device Response Curves")
+        self.minsize(320, 520)
+        self.original = dict(self.app.curves)  # Restored on cancel
+
+        names = self.app.known_device_names()
+        if not names:
+            ttk.Label(self, text="No devices seen yet.\nConnect to Intiface first.", font=('Arial', 12)).pack(pady=20)
+            ttk.Button(self, text="Close", command=self.destroy).pack(pady=10)
+            return
+        current = self.app.device.name if self.app.device else names[0]
+        self.name_var = tk.StringVar(value=current if current in names else names[0])
+        self.name_combo = ttk.Combobox(self, textvariable=self.name_var, values=names, state="readonly")
+        self.name_combo.pack(pady=5, padx=10, fill=tk.X)
+        self.name_combo.bind("<<ComboboxSelected>>", self.load_curve)
+
+        size = self.PREVIEW_SIZE
+        self.preview = tk.Canvas(self, width=size, height=size, bg="black", highlightthickness=0)
+        self.preview.pack(pady=5)
+
+        self.gamma_scale = Scale(self, from_=0.2, to=5.0, resolution=0.05, orient=tk.HORIZONTAL,
+                                 label="Gamma (above 1 = gentler start)", length=250, command=self.changed)
+        self.gamma_scale.pack()
+        self.min_scale = Scale(self, from_=0.0, to=1.0, resolution=0.01, orient=tk.HORIZONTAL,
+                               label="Minimum (lowest non-zero output)", length=250, command=self.changed)
+        self.min_scale.pack()
+        self.max_scale = Scale(self, from_=0.0, to=1.0, resolution=0.01, orient=tk.HORIZONTAL,
+                               label="Maximum", length=250, command=self.changed)
+        self.max_scale.pack()
+        ttk.Label(self, text="Custom points, replace gamma (in:out, ...):").pack(pady=(5, 0))
+        self.points_var = tk.StringVar()
+        self.points_entry = ttk.Entry(self, textvariable=self.points_var)
+        self.points_entry.pack(padx=10, fill=tk.X)
+        self.points_entry.bind("<KeyRelease>", self.changed)
+
+        buttons = ttk.Frame(self)
+        buttons.pack(pady=10)
+        self.test_button = ttk.Button(buttons, text="Hold to Test")
+        self.test_button.pack(side=tk.LEFT, padx=3)
+        self.test_button.bind("<ButtonPress-1>", lambda event: self.app.press("button"))
+        self.test_button.bind("<ButtonRelease-1>", lambda event: self.app.release("button"))
+        ttk.Button(buttons, text="Reset", command=self.reset).pack(side=tk.LEFT, padx=3)
+        ttk.Button(buttons, text="Save", command=self.save).pack(side=tk.LEFT, padx=3)
+        ttk.Button(buttons, text="Cancel", command=self.cancel).pack(side=tk.LEFT, padx=3)
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        self.loading = False
+        self.load_curve()
+        self.grab_set()
+
+    def load_curve(self, event=None):
+        curve = self.app.curve_for(self.name_var.get())
+        self.loading = True  # Scale.set() fires changed() too
+        self.gamma_scale.set(curve["gamma"])
+        self.min_scale.set(curve["min"])
+        self.max_scale.set(curve["max"])
+        self.points_var.set(", ".join(f"{x:g}:{y:g}" for x, y in curve["points"]))
+        self.loading = False
+        self.draw(curve)
+
+    def read_curve(self):
+        """The curve in the widgets, or None while the points field doesn't parse."""
+        try:
+            points = [[float(part) for part in pair.split(":")] for pair in self.points_var.get().split(",")
+                      if pair.strip()]
+            if any(len(point) != 2 for point in points):
+                return None
+        except ValueError:
+            return None
+        return {"gamma": self.gamma_scale.get(), "min": self.min_scale.get(), "max": self.max_scale.get(),
+                "points": points}
+
+    def changed(self, *args):
+        if self.loading:
+            return
+        curve = self.read_curve()
+        if curve is None:
+            return
+        self.app.set_curve(self.name_var.get(), curve)
+        self.draw(self.app.curve_for(self.name_var.get()))
+
+    def draw(self, curve):
+        """Exact curve in grey, what the device actually gets (its steps) in green, current intensity in red."""
+        size = self.PREVIEW_SIZE
+        self.preview.delete("all")
+        exact = []
+        for i in range(size + 1):
+            exact += [i, size - curve_value(curve, i / size) * size]
+        self.preview.create_line(*exact, fill="gray")
+        table = compile_curve(curve, self.app.curve_step_count(self.name_var.get()))
+        steps = len(table) - 1
+        stepped = [0, size]
+        for i in range(1, steps + 1):
+            y = size - table[i] * size
+            stepped += [(i - 1) * size / steps, y, i * size / steps, y]
+        self.preview.create_line(*stepped, fill="lime")
+        x = self.app.vibration_intensity * size
+        self.preview.create_line(x, 0, x, size, fill="red", dash=(2, 2))
+        self.preview.create_text(4, 4, anchor=tk.NW, fill="white", font=('Arial', 8),
+                                 text=f"{steps} steps" if self.app.curve_step_count(self.name_var.get()) else "steps unknown")
+
+    def reset(self):
+        self.app.set_curve(self.name_var.get(), None)
+        self.load_curve()
+
+    def save(self):
+        self.app.save_keybindings()
+        self.destroy()
+
+    def cancel(self):
+        for name in set(self.original) | set(self.app.curves):
+            self.app.set_curve(name, self.original.get(name))
+        self.destroy()
+
+
+class DiagnosticsDialog(Toplevel):
+    def __init__(self, parent, app_instance):
+        super().__init__(parent)
+        self.app = app_instance
+        self.title("Diagnostics")
+        self.geometry("640x420")
+
+        self.text = tk.Text(self, font=('Courier', 10), wrap=tk.NONE)
+        self.text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        self.close_button = ttk.Button(self, text="Close", command=self.destroy)
+        self.close_button.pack(pady=5)
+
+        self.refresh()
+
+    def refresh(self):
+        """Redraws the report once a second while the window is open."""
+        if not self.winfo_exists():
+            return
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, self.app.diagnostics_report())
+        self.after(1000, self.refresh)
+
+class LogDialog(Toplevel):
+    """Recent log records from memory (the log file is never read)."""
+
+    def __init__(self, parent, app_instance):
+        super().__init__(parent)
+        self.app = app_instance
+        self.title("Log")
+        self.geometry("720x400")
+        self.shown = None
+
+        self.text = tk.Text(self, font=('Courier', 9), wrap=tk.NONE)
+        self.text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        self.close_button = ttk.Button(self, text="Close", command=self.destroy)
+        self.close_button.pack(pady=5)
+
+        self.refresh()
+
+    def refresh(self):
+        """Redraws once a second, only when there is something new."""
+        if not self.winfo_exists():
+            return
+        lines = self.app.logs.recent_lines()
+        if lines != self.shown:
+            self.shown = lines
+            self.text.delete("1.0", tk.END)
+            self.text.insert(tk.END, "\n".join(lines) if lines else "Nothing logged yet")
+            self.text.see(tk.END)
+        self.after(1000, self.refresh)
+
+class StatsDialog(Toplevel):
+    """This session's and lifetime usage statistics (see SessionStats.py)."""
+
+    def __init__(self, parent, app_instance):
+        super().__init__(parent)
+        self.app = app_instance
+        self.title("Statistics")
+        self.geometry("640x480")
+
+        self.text = tk.Text(self, font=('Courier', 10), wrap=tk.NONE)
+        self.text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        self.close_button = ttk.Button(self, text="Close", command=self.destroy)
+        self.close_button.pack(pady=5)
+
+        self.refresh()
+
+    def refresh(self):
+        """Redraws the report once a second while the window is open."""
+        if not self.winfo_exists():
+            return
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, self.app.stats.report())
+        self.after(1000, self.refresh)
+
 def main():
+    multiprocessing.freeze_support()  # The hook process re-runs the exe when built with pyinstaller
     root = tk.Tk()
     app = IntifaceApp(root)
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
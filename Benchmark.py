@@ -0,0 +1,872 @@
+import argparse
+import asyncio
+import gc
+import importlib.util
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from Log import start_logging
+from HookProcess import HookLatency, HookProcess, KIND_PRESS, KIND_RELEASE
+from MockServer import MockServer
+from Timers import TimerService
+from tests.fakes import FakeTk, install_fakes
+
+# Headless performance comparison of the app versions against MockServer.
+#   python Benchmark.py                       compare AppV1-AppV5 and the bare IntifaceCore
+#   python Benchmark.py versions AppV4 AppV5  compare some of them
+#   python Benchmark.py hooks                 in-process vs separate-process hooks, idle and under load
+#   python Benchmark.py choreography          multi-device timing accuracy, with and without compensation
+#   python Benchmark.py polling               actuation latency with no, unscheduled and laned battery reads
+#   python Benchmark.py batching              command throughput with one frame per message vs batched frames
+#   python Benchmark.py timers                100k pending timed actions: sleeping tasks vs loop timers vs Timers.py
+#   python Benchmark.py soak --hours 8        drives AppV5 for hours and fails if memory or handles keep growing
+# Each version runs in its own subprocess (fresh imports, separate memory) with tkinter,
+# keyboard and mouse replaced by the stand-ins in tests/fakes.py, so no display or input
+# hooks are needed.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+VERSIONS = ["AppV1", "AppV2", "AppV3", "AppV4", "AppV5", "IntifaceCore"]  # IntifaceCore runs without any front end
+SERVER_PORT = 12345  # AppV1-AppV4 hard-code this port
+
+
+def import_version(name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(REPO_DIR, name + ".py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def rss_mib():
+    """Current resident set size, or None where it can't be read without extra packages."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        return None
+
+
+def percentiles(samples):
+    if not samples:
+        return None, None
+    ordered = sorted(samples)
+    return statistics.median(ordered) * 1000, ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000
+
+
+def connect_app(module, fake_input, timeout=10.0):
+    """Builds the app on a fake root (or the bare core) and connects it.
+
+    Returns (engine, seconds or None), where the engine is whatever object owns the
+    device and vibrate_task: the app itself up to AppV4, its IntifaceCore after that.
+    """
+    if hasattr(module, "IntifaceCore") and not hasattr(module, "IntifaceApp"):
+        engine = module.IntifaceCore()
+        connect = engine.connect
+    else:
+        app = module.IntifaceApp(FakeTk())
+        engine = getattr(app, "core", app)
+        connect = app.connect_to_intiface
+    started = time.perf_counter()
+    connect()
+    while engine.device is None and time.perf_counter() - started < timeout:
+        FakeTk.pump(0.001)
+    connected = time.perf_counter() - started if engine.device is not None else None
+    FakeTk.pump(0.05)
+    return engine, connected
+
+
+def shutdown_app(engine):
+    if hasattr(engine, "shutdown"):
+        engine.shutdown()
+    else:
+        engine.event_loop.call_soon_threadsafe(engine.event_loop.stop)
+
+
+def measure_version(name, commands, presses, latency, memory):
+    """Child process body: one version against a fresh mock server; returns a result dict."""
+    fake_input = install_fakes()
+    server = MockServer(SERVER_PORT, latency=latency).start()
+    result = {"version": name}
+    if memory:
+        tracemalloc.start()
+    rss_before = rss_mib()
+
+    started = time.perf_counter()
+    module = import_version(name)
+    result["import_ms"] = (time.perf_counter() - started) * 1000
+
+    engine, connected = connect_app(module, fake_input)
+    result["connect_ms"] = connected * 1000 if connected is not None else None
+    if connected is None:
+        return result
+
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        result["heap_kib"] = current / 1024
+        result["heap_peak_kib"] = peak / 1024
+        shutdown_app(engine)
+        return result
+
+    # Per-command latency: vibrate_task awaited end to end, alternating values so
+    # versions that drop repeated values still send every command
+    latencies = []
+    for i in range(commands):
+        value = 0.75 if i % 2 == 0 else 0.25
+        sent = time.perf_counter()
+        asyncio.run_coroutine_threadsafe(engine.vibrate_task(value), engine.event_loop).result(5)
+        latencies.append(time.perf_counter() - sent)
+    result["command_p50_ms"], result["command_p95_ms"] = percentiles(latencies)
+
+    # Hook-to-send: from the key hook callback to the command arriving at the server
+    key = getattr(engine, "vibration_key", "space")
+    hook_times = []
+    if fake_input.has_hook(key):
+        for _ in range(presses):
+            pressed = time.perf_counter()
+            fake_input.press(key)
+            arrived = server.wait_for_command(pressed)
+            released = time.perf_counter()
+            fake_input.release(key)
+            server.wait_for_command(released)
+            FakeTk.pump(0.002)
+            if arrived is not None:
+                hook_times.append(arrived - pressed)
+    result["hook_p50_ms"], result["hook_p95_ms"] = percentiles(hook_times)
+
+    after = rss_mib()
+    result["rss_mib"] = after
+    result["rss_growth_mib"] = after - rss_before if after is not None and rss_before is not None else None
+    shutdown_app(engine)
+    server.stop()
+    return result
+
+
+def run_child(name, args, memory=False):
+    """Runs one measurement in a subprocess inside a scratch directory (settings files land there)."""
+    command = [sys.executable, os.path.abspath(__file__), "versions", "--child", name,
+               "--commands", str(args.commands), "--presses", str(args.presses), "--latency", str(args.latency)]
+    if memory:
+        command.append("--memory")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryDirectory() as scratch:
+        completed = subprocess.run(command, cwd=scratch, env=env, capture_output=True, text=True, timeout=300)
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    return {"version": name, "error": (completed.stderr.strip().splitlines() or ["no output"])[-1]}
+
+
+def format_table(rows, columns):
+    """Plain text table; columns are (key, header, format)."""
+    table = [[header for key, header, fmt in columns]]
+    for row in rows:
+        table.append(["-" if row.get(key) is None else fmt.format(row[key]) for key, header, fmt in columns])
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    lines = ["  ".join(cell.rjust(width) for cell, width in zip(line, widths)) for line in table]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+VERSION_COLUMNS = [
+    ("version", "version", "{}"),
+    ("import_ms", "import ms", "{:.0f}"),
+    ("connect_ms", "connect ms", "{:.1f}"),
+    ("command_p50_ms", "cmd p50 ms", "{:.2f}"),
+    ("command_p95_ms", "cmd p95 ms", "{:.2f}"),
+    ("hook_p50_ms", "hook->send p50", "{:.2f}"),
+    ("hook_p95_ms", "hook->send p95", "{:.2f}"),
+    ("heap_kib", "heap KiB", "{:.0f}"),
+    ("rss_mib", "RSS MiB", "{:.1f}"),
+]
+
+
+def compare_versions(args):
+    if args.child:
+        result = measure_version(args.child, args.commands, args.presses, args.latency, args.memory)
+        print(json.dumps(result))
+        return
+
+    rows = []
+    for name in args.names or VERSIONS:
+        print(f"Benchmarking {name}...", file=sys.stderr)
+        row = run_child(name, args)
+        memory = run_child(name, args, memory=True)
+        row.update({key: value for key, value in memory.items() if key.startswith("heap")})
+        rows.append(row)
+    print(format_table(rows, VERSION_COLUMNS))
+    for row in rows:
+        if "error" in row:
+            print(f"{row['version']}: {row['error']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+def feed_events(connection, count, interval, warmup):
+    """Stands in for the OS: sends (kind, capture time) pairs at a fixed rate."""
+    time.sleep(warmup)
+    for i in range(count):
+        time.sleep(interval)
+        connection.send((KIND_PRESS if i % 2 == 0 else KIND_RELEASE, time.time()))
+    connection.close()
+
+
+def busy_work(stopping):
+    """Pure-Python CPU load standing in for a busy Tk redraw or event loop; holds the GIL."""
+    while not stopping.is_set():
+        sum(i * i for i in range(20000))
+
+
+def measure_hooks(mode, load, count, interval):
+    """Feeds synthetic hook events to in-process hooks or the hook process; returns latency stats."""
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    stopping = threading.Event()
+    if load:
+        threading.Thread(target=busy_work, args=(stopping,), daemon=True).start()
+
+    if mode == "process":
+        runner = HookProcess(lambda kind, capture: None)
+        runner.start({}, feed=receiver)
+        latency = runner.latency
+    else:
+        latency = HookLatency("in process")
+
+        def hook_thread():
+            # Like the keyboard library's hook thread: blocks outside the GIL, then runs Python
+            while True:
+                try:
+                    kind, capture = receiver.recv()
+                except EOFError:
+                    return
+                done = time.time()
+                latency.record(capture, done, done)
+        threading.Thread(target=hook_thread, daemon=True).start()
+
+    # The warmup lets the hook process start before the first event is stamped
+    feeder = context.Process(target=feed_events, args=(sender, count, interval, 1.0 if mode == "process" else 0.1))
+    feeder.start()
+    sender.close()
+    feeder.join()
+    time.sleep(0.2)
+    stopping.set()
+    if mode == "process":
+        runner.stop()
+    return dict(latency.summary(), hooks=mode, load="busy" if load else "idle", events=latency.count)
+
+
+HOOK_COLUMNS = [
+    ("hooks", "hooks", "{}"),
+    ("load", "main process", "{}"),
+    ("events", "events", "{}"),
+    ("hold_p50", "held p50 ms", "{:.3f}"),
+    ("hold_p99", "held p99 ms", "{:.3f}"),
+    ("hold_max", "held max ms", "{:.2f}"),
+    ("delivery_p50", "handled p50 ms", "{:.3f}"),
+    ("delivery_p99", "handled p99 ms", "{:.3f}"),
+]
+
+
+def compare_hooks(args):
+    rows = []
+    for mode in ("in-process", "process"):
+        for load in (False, True):
+            print(f"Hooks {mode}, {'busy' if load else 'idle'}...", file=sys.stderr)
+            rows.append(measure_hooks(mode, load, args.events, args.interval / 1000))
+    print(format_table(rows, HOOK_COLUMNS))
+    print("held: capture -> hook callback returned (every keystroke on the system waits this long)")
+    print("handled: capture -> event handled in the app process")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+def choreography_errors(log, commands):
+    """Pairs each logged send with the mock server's apply time; returns {device index: [(issued, error)]}."""
+    arrivals = {}
+    for arrived, name, body in commands:
+        if name == "ScalarCmd":
+            arrivals.setdefault(body["DeviceIndex"], []).append(arrived)
+    errors = {}
+    positions = {}
+    for key, now, issued, intended in sorted(log, key=lambda entry: entry[2]):
+        times = arrivals.get(key[1], [])
+        position = positions.get(key[1], 0)
+        while position < len(times) and times[position] < issued:
+            position += 1  # Commands from before this send (zeroing, earlier runs)
+        if position < len(times):
+            errors.setdefault(key[1], []).append((issued, times[position] - intended))
+            position += 1
+        positions[key[1]] = position
+    return errors
+
+
+CHOREOGRAPHY_COLUMNS = [
+    ("compensation", "compensation", "{}"),
+    ("device", "device", "{}"),
+    ("one_way_ms", "true one-way ms", "{:.1f}"),
+    ("lead_ms", "lead ms", "{:.1f}"),
+    ("error_ms", "mean error ms", "{:+.2f}"),
+    ("error_p99_ms", "|error| p99 ms", "{:.2f}"),
+    ("drift_ms", "drift ms", "{:+.2f}"),
+    ("spread_ms", "batch spread p99 ms", "{:.2f}"),
+]
+
+
+def compare_choreography(args):
+    from IntifaceCore import IntifaceCore
+
+    latencies = [float(value) / 1000 for value in args.latency.split(",")]
+    server = MockServer(SERVER_PORT, devices=len(latencies), latency=latencies).start()
+    rows = []
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)  # Fresh settings and device cache
+        core = IntifaceCore(hooks=False)
+        core.connect()
+        while not core.pool or len(core.pool.devices()) < len(latencies):
+            time.sleep(0.01)
+        for compensate in (False, True):
+            print(f"Choreography, compensation {'on' if compensate else 'off'}...", file=sys.stderr)
+            core.start_choreography(pattern=args.pattern, period=args.period, offsets="travel", rate=args.rate)
+            choreographer = core.choreographer
+            choreographer.compensate = compensate
+            choreographer.log = log = []
+            time.sleep(args.seconds)
+            core.stop_choreography()
+            time.sleep(0.3)
+
+            spreads = {}
+            for key, now, issued, intended in log:
+                first, last = spreads.get(now, (issued, issued))
+                spreads[now] = (min(first, issued), max(last, issued))
+            spread = sorted(last - first for first, last in spreads.values())
+            for index, samples in sorted(choreography_errors(log, list(server.commands)).items()):
+                errors = [error for issued, error in samples]
+                tail = max(1, len(errors) // 5)
+                rows.append({
+                    "compensation": "on" if compensate else "off",
+                    "device": index,
+                    "one_way_ms": latencies[index] / 2 * 1000,
+                    "lead_ms": choreographer.leads.get((core.pool.urls[0], index), 0.0) * 1000 if compensate else 0.0,
+                    "error_ms": statistics.mean(errors) * 1000,
+                    "error_p99_ms": sorted(abs(e) for e in errors)[int(len(errors) * 0.99) - 1] * 1000,
+                    "drift_ms": (statistics.mean(errors[-tail:]) - statistics.mean(errors[:tail])) * 1000,
+                    "spread_ms": spread[int(len(spread) * 0.99) - 1] * 1000 if spread else None,
+                })
+            print(choreographer.report(), file=sys.stderr)
+        core.shutdown()
+        core.logs.stop()  # Write out the log before the scratch folder is removed
+        os.chdir(REPO_DIR)
+    server.stop()
+    print(format_table(rows, CHOREOGRAPHY_COLUMNS))
+    print("error: when the mock device applied a value minus when the master clock meant it to apply")
+    print("drift: mean error over the last fifth of the run minus the first fifth")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+async def unscheduled_polling(core, interval):
+    """Naive battery polling: reads every device at a fixed rate, whatever else is being sent."""
+    from CommandLanes import battery_sensor
+
+    while not core.shutting_down:
+        await asyncio.sleep(interval)
+        for device in list(core.pool.devices().values()) if core.pool else []:
+            sensor = battery_sensor(device)
+            if sensor is not None:
+                await sensor.read()
+
+
+def measure_polling(mode, server, args):
+    """Press, change intensity and release in cycles; returns actuation latency with this polling mode."""
+    from IntifaceCore import IntifaceCore
+
+    core = IntifaceCore(hooks=False)
+    poller = core.poller
+    if mode == "lanes":
+        # Worst case for the lanes: no back-off, short quiet time
+        poller.interval = poller.max_interval = args.poll_interval / 1000
+        poller.quiet_time, poller.tick = 0.2, 0.05
+    else:
+        poller.quiet_time = math.inf  # Never idle long enough, the built-in poller stays out
+    core.connect()
+    while not core.device:
+        time.sleep(0.01)
+    if mode == "unscheduled":
+        core.submit(unscheduled_polling(core, args.poll_interval / 1000))
+    time.sleep(0.5)
+
+    first = len(server.commands)
+    presses, vibrating = [], []  # Latency of the first command, and of the ones while vibrating
+    vibrating_reads = 0
+    levels = itertools.cycle((0.5, 0.7, 0.9, 0.6))
+    for cycle in range(args.cycles):
+        core.set_vibration_intensity(next(levels))
+        pressed = time.perf_counter()
+        core.press()
+        presses.append(server.wait_for_command(pressed) - pressed)
+        for change in range(4):
+            time.sleep(0.1)
+            since = time.perf_counter()
+            core.set_vibration_intensity(next(levels))
+            vibrating.append(server.wait_for_command(since) - since)
+        time.sleep(0.1)
+        since = time.perf_counter()
+        core.release()
+        vibrating.append(server.wait_for_command(since) - since)
+        # Reads that reached the device after the press was applied, until the release
+        vibrating_reads += sum(1 for t, name, body in server.commands[first:]
+                               if name == "SensorReadCmd" and pressed + presses[-1] < t <= since)
+        time.sleep(0.4)
+    reads = sum(1 for t, name, body in server.commands[first:] if name == "SensorReadCmd")
+    battery = poller.battery(core.device_key)
+    core.shutdown()
+    presses.sort()
+    vibrating.sort()
+    return {
+        "polling": mode, "reads": reads, "vibrating_reads": vibrating_reads,
+        "press_p50": presses[len(presses) // 2] * 1000, "press_max": presses[-1] * 1000,
+        "p50": vibrating[len(vibrating) // 2] * 1000, "p99": vibrating[int(len(vibrating) * 0.99)] * 1000,
+        "max": vibrating[-1] * 1000, "battery": f"{battery * 100:.0f}%" if battery is not None else "-",
+    }
+
+
+POLLING_COLUMNS = [
+    ("polling", "battery polling", "{}"),
+    ("reads", "reads", "{}"),
+    ("vibrating_reads", "reads while vibrating", "{}"),
+    ("press_p50", "press p50 ms", "{:.2f}"),
+    ("press_max", "press max ms", "{:.2f}"),
+    ("p50", "vibrating p50 ms", "{:.2f}"),
+    ("p99", "vibrating p99 ms", "{:.2f}"),
+    ("max", "vibrating max ms", "{:.2f}"),
+    ("battery", "cached battery", "{}"),
+]
+
+
+def compare_polling(args):
+    # A serial link per device, like Bluetooth: a read in progress holds up the next command
+    server = MockServer(SERVER_PORT, latency=args.latency / 1000, serial=True).start()
+    rows = []
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)  # Fresh settings and device cache
+        for mode in ("none", "unscheduled", "lanes"):
+            print(f"Polling: {mode}...", file=sys.stderr)
+            rows.append(measure_polling(mode, server, args))
+        os.chdir(REPO_DIR)
+    server.stop()
+    print(format_table(rows, POLLING_COLUMNS))
+    print("press: press -> first command applied by the mock device (a read already on the link can hold it up)")
+    print("vibrating: intensity change / release while vibrating -> applied by the mock device")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+async def send_round(core, devices, value):
+    """One value to every device at once, the way a choreography tick sends."""
+    return await asyncio.gather(*(core.send_intensity(key, core.plan_for(key, device), value)
+                                  for key, device in devices))
+
+
+def measure_batching(label, window, server, args):
+    """Sends rounds of commands to every device; returns throughput and frames for this batch window."""
+    from IntifaceCore import IntifaceCore
+
+    with open("keybindings.json", "w") as f:
+        json.dump({"batch_window_ms": window}, f)
+    core = IntifaceCore(hooks=False)
+    core.connect()
+    while not core.pool or len(core.pool.devices()) < args.devices:
+        time.sleep(0.01)
+    time.sleep(0.2)
+    devices = list(core.pool.devices().items())
+
+    frames = server.frames
+    rounds = []
+    cpu, started = time.process_time(), time.perf_counter()
+    for i in range(args.rounds):
+        sent = time.perf_counter()
+        core.submit(send_round(core, devices, 0.75 if i % 2 == 0 else 0.25)).result(5)
+        rounds.append(time.perf_counter() - sent)
+    elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu
+    frames = server.frames - frames
+
+    # One device at a time, as a key press sends: batching must not slow a lone command down
+    singles = []
+    for i in range(args.rounds):
+        sent = time.perf_counter()
+        core.submit(core.send_intensity(devices[0][0], core.plan_for(*devices[0]),
+                                        0.75 if i % 2 == 0 else 0.25)).result(5)
+        singles.append(time.perf_counter() - sent)
+    core.shutdown()
+    commands = args.rounds * len(devices)
+    round_p50, round_p95 = percentiles(rounds)
+    single_p50, single_p95 = percentiles(singles)
+    return {
+        "batching": label, "commands": commands, "frames": frames,
+        "per_second": commands / elapsed, "cpu_us": cpu / commands * 1e6,
+        "round_p50": round_p50, "round_p95": round_p95, "single_p50": single_p50, "single_p95": single_p95,
+    }
+
+
+BATCHING_COLUMNS = [
+    ("batching", "batching", "{}"),
+    ("commands", "commands", "{}"),
+    ("frames", "frames", "{}"),
+    ("per_second", "commands/s", "{:.0f}"),
+    ("cpu_us", "CPU us/command", "{:.1f}"),
+    ("round_p50", "round p50 ms", "{:.2f}"),
+    ("round_p95", "round p95 ms", "{:.2f}"),
+    ("single_p50", "single p50 ms", "{:.2f}"),
+    ("single_p95", "single p95 ms", "{:.2f}"),
+]
+
+
+def compare_batching(args):
+    server = MockServer(SERVER_PORT, devices=args.devices).start()
+    rows = []
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)  # Fresh settings and device cache
+        for label, window in (("per message", None), ("same tick", 0), (f"{args.window:g} ms window", args.window)):
+            print(f"Batching: {label}...", file=sys.stderr)
+            rows.append(measure_batching(label, window, server, args))
+        start_logging().stop()  # Write out the log before the scratch folder is removed
+        os.chdir(REPO_DIR)
+    server.stop()
+    print(format_table(rows, BATCHING_COLUMNS))
+    print(f"round: one command to each of {args.devices} devices at once -> every one acknowledged")
+    print("single: one command to one device -> acknowledged; CPU covers the app and the mock server")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+TIMER_MODES = ("sleep tasks", "loop timers", "timer service")
+
+
+async def sleep_then(delay, callback, due):
+    await asyncio.sleep(delay)
+    callback(due)
+
+
+def start_timer(mode, loop, service, delay, callback):
+    """Schedules callback(due) in delay seconds; returns what cancels it."""
+    due = loop.time() + delay
+    if mode == "sleep tasks":
+        return loop.create_task(sleep_then(delay, callback, due))  # One coroutine per action
+    if mode == "loop timers":
+        return loop.call_later(delay, callback, due)  # asyncio's own heap, one handle per action
+    return service.call_later(delay, callback, due)
+
+
+async def measure_timers(mode, args, trace=False):
+    """Schedules args.timers timers, cancels every other one and lets the rest fire."""
+    loop = asyncio.get_running_loop()
+    service = TimerService(loop)
+    delays = [args.after + random.random() * args.spread for _ in range(args.timers)]
+    late = []
+
+    def fired(due):
+        late.append(loop.time() - due)
+
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    timers = [start_timer(mode, loop, service, delay, fired) for delay in delays]
+    await asyncio.sleep(0)  # Tasks only create their sleep once they first run
+    scheduled = time.perf_counter() - started
+    if trace:
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        for timer in timers:
+            timer.cancel()
+        await asyncio.sleep(0)
+        return {"bytes": memory / len(timers)}
+
+    started = time.perf_counter()
+    for timer in timers[::2]:
+        timer.cancel()
+    await asyncio.sleep(0)  # Cancelled tasks finish on their next step
+    cancelled = time.perf_counter() - started
+    del timers
+
+    # Loop lag while the rest fire: how late a 10 ms sleep wakes up
+    lags = []
+    expected = args.timers - (args.timers + 1) // 2
+    cpu = time.process_time()
+    while len(late) < expected:
+        slept = loop.time()
+        await asyncio.sleep(0.01)
+        lags.append(loop.time() - slept - 0.01)
+    cpu = time.process_time() - cpu
+    late.sort()
+    lags.sort()
+    return {
+        "mode": mode, "timers": args.timers,
+        "schedule_us": scheduled / args.timers * 1e6, "cancel_us": cancelled / ((args.timers + 1) // 2) * 1e6,
+        "fire_us": cpu / expected * 1e6,
+        "late_p50": late[len(late) // 2] * 1000, "late_p99": late[int(len(late) * 0.99)] * 1000,
+        "late_max": late[-1] * 1000, "lag_p99": lags[int(len(lags) * 0.99)] * 1000, "lag_max": lags[-1] * 1000,
+    }
+
+
+TIMER_COLUMNS = [
+    ("mode", "mode", "{}"),
+    ("timers", "timers", "{}"),
+    ("bytes", "bytes/timer", "{:.0f}"),
+    ("schedule_us", "schedule us", "{:.2f}"),
+    ("cancel_us", "cancel us", "{:.2f}"),
+    ("fire_us", "CPU us/fired", "{:.2f}"),
+    ("late_p50", "late p50 ms", "{:.2f}"),
+    ("late_p99", "late p99 ms", "{:.2f}"),
+    ("late_max", "late max ms", "{:.2f}"),
+    ("lag_p99", "loop lag p99 ms", "{:.2f}"),
+    ("lag_max", "loop lag max ms", "{:.2f}"),
+]
+
+
+def compare_timers(args):
+    rows = []
+    for mode in TIMER_MODES:
+        print(f"Timers: {mode}...", file=sys.stderr)
+        random.seed(1)
+        row = asyncio.run(measure_timers(mode, args))
+        random.seed(1)
+        row.update(asyncio.run(measure_timers(mode, args, trace=True)))
+        rows.append(row)
+    print(format_table(rows, TIMER_COLUMNS))
+    print(f"{args.timers} timers due {args.after:g}-{args.after + args.spread:g} s out, every other one cancelled; "
+          "bytes: traced allocations per pending timer")
+    print("late: fire time past the deadline; loop lag: how late a 10 ms sleep wakes up meanwhile")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+def open_fds():
+    """Open file descriptors (handles on Windows), or None where they can't be counted."""
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        pass
+    try:
+        import psutil
+        process = psutil.Process()
+        return process.num_handles() if hasattr(process, "num_handles") else process.num_fds()
+    except ImportError:
+        return None
+
+
+async def loop_task_count():
+    return len(asyncio.all_tasks()) - 1  # Not counting this one
+
+
+SOAK_METRICS = [
+    # key, column, format, budget argument
+    ("rss", "rss MiB", "{:.1f}", "rss_budget"),
+    ("heap", "heap MiB", "{:.2f}", "heap_budget"),
+    ("threads", "threads", "{}", "thread_budget"),
+    ("fds", "fds", "{}", "fd_budget"),
+    ("tasks", "loop tasks", "{}", "task_budget"),
+    ("callbacks", "Tk callbacks", "{}", "callback_budget"),
+]
+
+SOAK_COLUMNS = [("elapsed", "elapsed", "{}"), ("cycles", "input cycles", "{}")] + \
+    [(key, column, fmt) for key, column, fmt, budget in SOAK_METRICS]
+
+
+def soak_sample(core, server, started, cycles):
+    FakeTk.pump(0.05)  # Let callbacks that are already due run, so only lingering ones count
+    server.commands.clear()  # The mock's own log isn't the app's memory
+    gc.collect()  # Only what is still reachable counts, not cycles the collector hasn't reached yet
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "elapsed": time.strftime("%H:%M:%S", time.gmtime(time.monotonic() - started)),
+        "cycles": cycles,
+        "rss": rss_mib(),
+        "heap": current / 2 ** 20,
+        "threads": threading.active_count(),
+        "fds": open_fds(),
+        "tasks": core.submit(loop_task_count()).result(5),
+        "callbacks": FakeTk.pending(),
+    }
+
+
+def soak_input(app, core, fake_input, cycle):
+    """One cycle of synthetic use: taps, holds, intensity keys and the Vibrate button, with
+    rebinding and reconnecting now and then."""
+    key = core.vibration_key
+    fake_input.press(key)
+    FakeTk.pump(0.02)
+    fake_input.press(core.intensity_increase_key)
+    fake_input.release(core.intensity_increase_key)
+    FakeTk.pump(0.03)
+    fake_input.release(key)
+    fake_input.press(core.intensity_decrease_key)
+    fake_input.release(core.intensity_decrease_key)
+    app.start_vibration()
+    FakeTk.pump(0.02)
+    app.stop_vibration()
+    if cycle % 50 == 0:
+        # Hook re-registration: switch the vibration key back and forth
+        core.vibration_key = "f" if key == "space" else "space"
+        core.update_keyboard_binding()
+    if cycle % 200 == 100:
+        app.connect_to_intiface()  # A reconnect replaces every client and device
+        deadline = time.monotonic() + 10
+        while core.device is None and time.monotonic() < deadline:
+            FakeTk.pump(0.01)
+    FakeTk.pump(0.03)
+
+
+def run_soak(args):
+    fake_input = install_fakes()
+    server = MockServer(SERVER_PORT, devices=2).start()
+    tracemalloc.start(10)
+    failures = []
+    samples = []
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)  # Fresh settings and device cache
+        module = import_version("AppV5")
+        app = module.IntifaceApp(FakeTk())
+        core = app.core
+        app.connect_to_intiface()
+        while core.device is None:
+            FakeTk.pump(0.01)
+
+        started = time.monotonic()
+        end = started + args.hours * 3600
+        next_sample = started + args.warmup
+        baseline = snapshot = None
+        cycle = 0
+        while time.monotonic() < end and not failures:
+            soak_input(app, core, fake_input, cycle)
+            cycle += 1
+            if time.monotonic() < next_sample:
+                continue
+            next_sample += args.interval
+            sample = soak_sample(core, server, started, cycle)
+            samples.append(sample)
+            print(format_table([sample], SOAK_COLUMNS).splitlines()[-1] if len(samples) > 1
+                  else format_table([sample], SOAK_COLUMNS), file=sys.stderr)
+            if baseline is None:
+                # Warmed up: imports, caches and the first reconnect are behind us
+                baseline, snapshot = sample, tracemalloc.take_snapshot()
+                continue
+            for key, column, fmt, budget in SOAK_METRICS:
+                limit = getattr(args, budget)
+                if sample[key] is not None and baseline[key] is not None and sample[key] - baseline[key] > limit:
+                    failures.append(f"{column} grew from {fmt.format(baseline[key])} to "
+                                    f"{fmt.format(sample[key])} (budget +{limit:g})")
+
+        top = []
+        if snapshot is not None:
+            gc.collect()
+            for stat in tracemalloc.take_snapshot().compare_to(snapshot, "lineno")[:args.top]:
+                frame = stat.traceback[0]
+                top.append(f"  {stat.size_diff / 1024:+9.1f} KiB {stat.count_diff:+7d} blocks  "
+                           f"{os.path.relpath(frame.filename, REPO_DIR)}:{frame.lineno}")
+        core.shutdown()
+        core.logs.stop()  # Write out the log before the scratch folder is removed
+        os.chdir(REPO_DIR)
+    server.stop()
+
+    print(format_table(samples, SOAK_COLUMNS))
+    print(f"Top allocators since the baseline sample:\n" + "\n".join(top))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"samples": samples, "failures": failures, "top_allocators": top}, f, indent=2)
+    if failures:
+        print("SOAK FAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("Soak passed: everything stayed within budget")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks against a mock Buttplug server")
+    commands = parser.add_subparsers(dest="command")
+
+    versions = commands.add_parser("versions", help="compare AppV1-AppV5 (default)")
+    versions.add_argument("names", nargs="*", help="versions to run, default all")
+    versions.add_argument("--commands", type=int, default=200, help="vibrate_task calls to time")
+    versions.add_argument("--presses", type=int, default=50, help="key presses to time")
+    versions.add_argument("--latency", type=float, default=0.0, help="simulated device latency, seconds")
+    versions.add_argument("--json", help="also write the results to this file")
+    versions.add_argument("--child", help=argparse.SUPPRESS)
+    versions.add_argument("--memory", action="store_true", help=argparse.SUPPRESS)
+    versions.set_defaults(func=compare_versions)
+
+    hooks = commands.add_parser("hooks", help="compare in-process hooks with the hook process")
+    hooks.add_argument("--events", type=int, default=400, help="events per run")
+    hooks.add_argument("--interval", type=float, default=5.0, help="ms between events")
+    hooks.add_argument("--json", help="also write the results to this file")
+    hooks.set_defaults(func=compare_hooks)
+
+    choreography = commands.add_parser("choreography", help="multi-device choreography timing")
+    choreography.add_argument("--latency", default="0,20,60", help="round trip ms per mock device, comma separated")
+    choreography.add_argument("--seconds", type=float, default=10.0, help="run time per mode")
+    choreography.add_argument("--pattern", default="wave")
+    choreography.add_argument("--period", type=float, default=1.0)
+    choreography.add_argument("--rate", type=int, default=20, help="ticks per second")
+    choreography.add_argument("--json", help="also write the results to this file")
+    choreography.set_defaults(func=compare_choreography)
+
+    polling = commands.add_parser("polling", help="actuation latency with background battery reads")
+    polling.add_argument("--cycles", type=int, default=30, help="press/change/release cycles per mode")
+    polling.add_argument("--latency", type=float, default=30.0, help="round trip ms of the mock device link")
+    polling.add_argument("--poll-interval", type=float, default=100.0, help="ms between battery reads")
+    polling.add_argument("--json", help="also write the results to this file")
+    polling.set_defaults(func=compare_polling)
+
+    batching = commands.add_parser("batching", help="command throughput with and without frame batching")
+    batching.add_argument("--devices", type=int, default=8, help="mock devices driven each round")
+    batching.add_argument("--rounds", type=int, default=500, help="rounds of one command per device")
+    batching.add_argument("--window", type=float, default=2.0, help="batch window ms of the third run")
+    batching.add_argument("--json", help="also write the results to this file")
+    batching.set_defaults(func=compare_batching)
+
+    timers = commands.add_parser("timers", help="100k pending timed actions: tasks vs loop timers vs Timers.py")
+    timers.add_argument("--timers", type=int, default=100000, help="timers scheduled per mode")
+    timers.add_argument("--after", type=float, default=1.0, help="seconds until the first is due")
+    timers.add_argument("--spread", type=float, default=2.0, help="seconds the deadlines are spread over")
+    timers.add_argument("--json", help="also write the results to this file")
+    timers.set_defaults(func=compare_timers)
+
+    soak = commands.add_parser("soak", help="long run of synthetic input, failing on resource growth")
+    soak.add_argument("--hours", type=float, default=1.0)
+    soak.add_argument("--interval", type=float, default=60.0, help="seconds between samples")
+    soak.add_argument("--warmup", type=float, default=60.0, help="seconds before the baseline sample")
+    soak.add_argument("--rss-budget", type=float, default=20.0, help="allowed RSS growth, MiB")
+    soak.add_argument("--heap-budget", type=float, default=5.0, help="allowed traced heap growth, MiB")
+    soak.add_argument("--thread-budget", type=int, default=2)
+    soak.add_argument("--fd-budget", type=int, default=5)
+    soak.add_argument("--task-budget", type=int, default=5, help="allowed growth of pending event loop tasks")
+    soak.add_argument("--callback-budget", type=int, default=20, help="allowed growth of pending Tk callbacks")
+    soak.add_argument("--top", type=int, default=10, help="allocators to list at the end")
+    soak.add_argument("--json", help="also write the samples to this file")
+    soak.set_defaults(func=run_soak)
+
+    args = parser.parse_args(sys.argv[1:] or ["versions"])
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
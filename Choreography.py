@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+
+# Coordinated effects across every connected device (alternating pulses, travelling waves,
+# fixed phase offsets). Each device's value is computed from one master clock,
+# time.perf_counter(), rather than from per-device timers, so devices can't drift apart.
+# A tick's commands are computed from a single clock reading and issued back to back.
+# Tick wake-up jitter doesn't turn into phase error, since the phase is taken at the
+# actual send time, not the scheduled one. Each device's value is also taken slightly
+# ahead, by its measured one-way send latency, so it lands when it should.
+#
+# "choreography": {"pattern": "wave", "period": 2.0, "offsets": "travel", "rate": 20}
+# offsets is one of OFFSETS or a list of per-device phase offsets (fractions of a period).
+
+CHOREOGRAPHY_RATE = 20  # Ticks per second
+LATENCY_SMOOTHING = 0.2  # Weight of each new round trip in the per-device latency estimate
+
+log = logging.getLogger("intiface.choreography")
+
+PATTERNS = {
+    "wave": lambda phase: 0.5 - 0.5 * math.cos(2 * math.pi * phase),
+    "pulse": lambda phase: 1.0 if phase < 0.5 else 0.0,
+    "triangle": lambda phase: 1.0 - abs(2.0 * phase - 1.0),
+    "ramp": lambda phase: phase,
+}
+
+OFFSETS = {
+    "together": lambda index, count: 0.0,
+    "alternate": lambda index, count: 0.5 * (index % 2),
+    "travel": lambda index, count: index / count,
+}
+
+
+def percentile_ms(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+
+class Choreographer:
+    """Drives every device of a core's client pool from one clock, one batch of commands per tick."""
+
+    def __init__(self, core, pattern="wave", period=2.0, offsets="travel", rate=CHOREOGRAPHY_RATE, compensate=True):
+        self.core = core
+        self.pattern = pattern
+        self.shape = PATTERNS[pattern]
+        self.period = period
+        self.offsets = offsets
+        self.interval = 1.0 / rate
+        self.compensate = compensate
+        self.stopping = False
+        self.started = None  # Master clock origin, perf_counter seconds
+        self.leads = {}  # device key -> estimated one-way send latency, seconds
+        self.in_flight = set()  # device keys whose last command hasn't been acknowledged yet
+        self.ticks = 0
+        self.missed = 0  # Ticks skipped after the loop fell behind
+        self.skipped = 0  # Device sends skipped because the previous one was still in flight
+        self.lateness = deque(maxlen=1000)  # How late each tick woke up, seconds
+        self.log = None  # Set to a list to collect (device key, tick clock, issued, intended apply time)
+
+    def offset(self, index, count):
+        if isinstance(self.offsets, (list, tuple)):
+            return self.offsets[index % len(self.offsets)]
+        return OFFSETS[self.offsets](index, count)
+
+    async def run(self):
+        self.started = time.perf_counter()
+        tick = 0
+        try:
+            while not self.stopping:
+                # Tick times come from the origin, never from the previous wake-up, so nothing accumulates
+                target = self.started + tick * self.interval
+                delay = target - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                now = time.perf_counter()
+                self.lateness.append(max(0.0, now - target))
+                if now - target > self.interval:
+                    # Fell behind (stalled loop): skip the missed ticks instead of bursting them
+                    behind = int((now - target) / self.interval)
+                    self.missed += behind
+                    tick += behind
+                await self.emit(now)
+                self.ticks += 1
+                tick += 1
+        finally:
+            await self.stop_devices()
+
+    async def emit(self, now):
+        """Computes every device's value from one clock reading and issues them as one batch."""
+        devices = sorted(self.core.pool.devices().items()) if self.core.pool else []
+        batch = []
+        for index, (key, device) in enumerate(devices):
+            if key in self.in_flight:
+                self.skipped += 1  # Never queue behind a slow device
+                continue
+            plan = self.core.plan_for(key, device)
+            if plan is None:
+                continue
+            lead = self.leads.get(key, 0.0) if self.compensate else 0.0
+            phase = ((now + lead - self.started) / self.period + self.offset(index, len(devices))) % 1.0
+            self.in_flight.add(key)
+            batch.append(self.send(key, device, plan, self.shape(phase) * self.core.vibration_intensity, now, lead))
+        for coroutine in batch:
+            # Tasks created together start together on the next loop iteration; acks are awaited there
+            asyncio.ensure_future(coroutine)
+
+    async def send(self, key, device, plan, intensity, now, lead):
+        from CommandBatch import UNBATCHED
+
+        # Each send runs in a task of its own, so this only affects this device's command: in a
+        # batched frame its round trip would be the slowest device's, and so would its lead
+        UNBATCHED.set(True)
+        started = time.perf_counter()
+        try:
+            sent = await self.core.send_intensity(key, plan, intensity)
+            if sent is not None:
+                one_way = (time.perf_counter() - started) / 2  # Half the round trip as the one-way estimate
+                previous = self.leads.get(key)
+                self.leads[key] = one_way if previous is None else previous + (one_way - previous) * LATENCY_SMOOTHING
+                if self.log is not None:
+                    self.log.append((key, now, started, now + lead))
+        except Exception as e:
+            self.core.quantizer.forget()  # Whatever failed, the device step is unknown now
+            log.error("Choreography: sending to %s failed: %s", device.name, e, extra={"device": device.name})
+        finally:
+            self.in_flight.discard(key)
+
+    async def stop_devices(self):
+        devices = self.core.pool.devices() if self.core.pool else {}
+        sends = [self.core.send_intensity(key, self.core.plan_for(key, device), 0.0)
+                 for key, device in devices.items() if self.core.plan_for(key, device)]
+        await asyncio.gather(*sends, return_exceptions=True)
+
+    def report(self):
+        lines = [f"Choreography: {self.pattern}, period {self.period:g} s, {self.ticks} ticks, "
+                 f"{self.missed} missed, {self.skipped} sends skipped while a device was busy"]
+        if self.lateness:
+            lines.append(f"  tick wake-up late {percentile_ms(self.lateness, 0.5):.2f} ms p50, "
+                         f"{percentile_ms(self.lateness, 0.99):.2f} ms p99 (phase uses the actual send time)")
+        for key, lead in sorted(self.leads.items()):
+            lines.append(f"  {key[0]} device {key[1]}: sent {lead * 1000:.1f} ms ahead"
+                         + ("" if self.compensate else " (compensation off)"))
+        return "\n".join(lines) + "\n"
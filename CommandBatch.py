@@ -0,0 +1,132 @@
+import asyncio
+import contextvars
+import os
+import socket
+import struct
+
+from buttplug import WebsocketConnector
+
+# Buttplug frames are JSON arrays and may carry any number of messages, but the client
+# encodes and sends every message as a frame of its own. BatchingConnector collects every
+# message sent on one connection during the same event loop iteration (or within a small
+# window), writes them as one frame and lets each sender continue once it is written.
+# Replies need no special handling: the server answers each message by its Id, whether
+# they come back in one frame or several, and the client already matches them up.
+#
+#   "batch_window_ms": 0     in keybindings.json: batch what is sent in the same loop iteration
+#   "batch_window_ms": 2     also wait up to 2 ms for more messages (adds up to that latency)
+#   "batch_window_ms": null  one frame per message, as the library does on its own
+#
+# A batched frame is answered once every message in it is handled, so its round trip is the
+# slowest device's. Code that times each device's own round trip (the choreography's
+# latency compensation) sends with UNBATCHED set and gets a frame of its own.
+
+UNBATCHED = contextvars.ContextVar("unbatched", default=False)  # Set in a task to bypass batching
+
+
+def masked_text_frame(text):
+    """A complete client-to-server websocket text frame (RFC 6455: client frames are masked)."""
+    payload = text.encode()
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x81, 0x80 | length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x81, 0x80 | 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x81, 0x80 | 127, length)
+    mask = os.urandom(4)
+    return header + mask + bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+
+
+class BatchingConnector(WebsocketConnector):
+    """Websocket connector that writes the messages sent close together as one frame."""
+
+    def __init__(self, address, window=0.0):
+        super().__init__(address)
+        self.window = window  # Seconds to wait for more messages, 0 for the same loop iteration
+        self.pending = []  # Encoded messages (without their array brackets) waiting to be written
+        self.written = None  # Future resolved once the pending messages are written
+        self.frames = 0
+        self.messages = 0
+        self.largest = 0
+
+    async def send(self, message):
+        if self.window is None or UNBATCHED.get():
+            self.frames += 1
+            self.messages += 1
+            return await super().send(message)
+        if self.written is None:
+            loop = asyncio.get_running_loop()
+            self.written = loop.create_future()
+            if self.window:
+                loop.call_later(self.window, self.flush)
+            else:
+                loop.call_soon(self.flush)  # Runs after everything already scheduled this iteration
+        self.pending.append(message[1:-1])  # The client encodes every message as a one-element array
+        # Shielded: one sender being cancelled must not cancel the write for the others
+        await asyncio.shield(self.written)
+
+    def flush(self):
+        batch, written = self.pending, self.written
+        self.pending, self.written = [], None
+        asyncio.ensure_future(self.write(batch, written))
+
+    async def write(self, batch, written):
+        self.frames += 1
+        self.messages += len(batch)
+        self.largest = max(self.largest, len(batch))
+        try:
+            await super().send("[" + ",".join(batch) + "]")
+        except Exception as e:
+            if not written.done():
+                written.set_exception(e)
+                written.exception()  # Retrieved here too, in case every sender was cancelled
+            return
+        if not written.done():
+            written.set_result(None)
+
+    def write_from_thread(self, text):
+        """Writes one text frame straight to the socket, without the event loop (any thread).
+
+        For the stalled-loop watchdog only: the loop that owns the connection isn't running,
+        so nothing else is writing. Refuses (returns False) on a TLS connection, where
+        plaintext would corrupt the stream, and if the transport still holds unsent bytes,
+        since a frame written after half of another would too.
+        """
+        transport = getattr(self._connection, "transport", None)
+        if transport is None or transport.is_closing() or transport.get_write_buffer_size():
+            return False
+        if transport.get_extra_info("ssl_object") is not None:
+            return False
+        sock = transport.get_extra_info("socket")
+        if sock is None:
+            return False
+        frame = masked_text_frame(text)
+        try:
+            with socket.fromfd(sock.fileno(), sock.family, sock.type) as duplicate:
+                return duplicate.send(frame) == len(frame)
+        except OSError:
+            return False
+
+    def close_from_thread(self):
+        """Shuts the socket down without the event loop (any thread); False if it wasn't open.
+
+        The fallback when write_from_thread refuses: Buttplug servers stop a client's devices
+        when it disconnects. The client sees the connection closed once its loop recovers.
+        """
+        transport = getattr(self._connection, "transport", None)
+        sock = transport.get_extra_info("socket") if transport is not None else None
+        if sock is None or transport.is_closing():
+            return False
+        try:
+            with socket.fromfd(sock.fileno(), sock.family, sock.type) as duplicate:
+                duplicate.shutdown(socket.SHUT_RDWR)  # Ends the connection for the original fd too
+            return True
+        except OSError:
+            return False
+
+    def report(self):
+        if not self.messages:
+            return ""
+        return (f"{self.messages} messages in {self.frames} frames "
+                f"({self.messages / self.frames:.2f} per frame, largest {self.largest})")
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+
+# Priority lanes for everything sent to a device. Battery reads share the websocket (and,
+# inside Intiface, usually the Bluetooth link) with vibration commands, so they must never
+# be in the way of one:
+#
+#   stop       zero intensity and stop commands: sent at once, and an actuation still
+#              waiting for that device is dropped.
+#   actuation  one in flight per device; a newer value replaces one still waiting, so a
+#              slow device gets the latest value instead of a backlog.
+#   polling    only starts on a device whose other lanes are empty and have been quiet
+#              for POLL_QUIET_TIME, never while anything is vibrating, one read at a time,
+#              and nothing ever waits behind it.
+#
+# Battery levels are cached; the poll interval doubles while the level doesn't change
+# (up to POLL_MAX_INTERVAL) and drops back to POLL_INTERVAL when it does.
+
+LANE_STOP = 0
+LANE_ACTUATE = 1
+LANE_POLL = 2
+LANE_NAMES = ("stop", "actuation", "polling")
+
+POLL_INTERVAL = 30.0  # Seconds between battery reads at first and after a change
+POLL_MAX_INTERVAL = 600.0  # Longest interval while the level stays the same
+POLL_QUIET_TIME = 2.0  # Seconds a device must have been idle before it is read
+POLL_TICK = 1.0  # Seconds between poller checks
+POLL_TIMEOUT = 5.0  # Seconds before a read is given up on
+
+log = logging.getLogger("intiface.lanes")
+
+
+def percentile_ms(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+
+class CommandLanes:
+    """Runs each device's commands in its stop, actuation or polling lane (event loop only)."""
+
+    def __init__(self):
+        self.waiting = {}  # device key -> (send, future, queued time) of an actuation waiting its turn
+        self.in_flight = {}  # device key -> stop/actuation commands in flight
+        self.actuating = set()  # device keys with an actuation in flight
+        self.last_active = {}  # device key -> monotonic time its last stop/actuation finished
+        self.waits = [deque(maxlen=1000) for _ in LANE_NAMES]  # Time spent queued, per lane, seconds
+        self.sent = [0] * len(LANE_NAMES)
+        self.superseded = 0  # Actuations replaced by a newer value before they were sent
+        self.deferred = 0  # Polls not started because the device was busy
+
+    def idle(self, key, quiet_time=0.0):
+        """True when nothing is waiting or in flight for the device and it has been quiet long enough."""
+        if self.in_flight.get(key) or key in self.waiting:
+            return False
+        return time.monotonic() - self.last_active.get(key, -math.inf) >= quiet_time
+
+    async def run(self, key, lane, send):
+        """Runs send() (a coroutine function) in a lane and returns its result.
+
+        Returns None without sending for an actuation superseded while waiting, or a poll
+        on a busy device.
+        """
+        queued = time.perf_counter()
+        if lane == LANE_POLL:
+            if not self.idle(key):
+                self.deferred += 1
+                return None
+        elif lane == LANE_STOP:
+            self.drop_waiting(key)
+        elif key in self.actuating:
+            self.drop_waiting(key)
+            future = asyncio.get_running_loop().create_future()
+            self.waiting[key] = (send, future, queued)
+            return await future
+        return await self.dispatch(key, lane, send, queued)
+
+    async def dispatch(self, key, lane, send, queued):
+        self.waits[lane].append(time.perf_counter() - queued)
+        self.sent[lane] += 1
+        if lane != LANE_POLL:
+            self.in_flight[key] = self.in_flight.get(key, 0) + 1
+        if lane == LANE_ACTUATE:
+            self.actuating.add(key)
+        try:
+            return await send()
+        finally:
+            if lane != LANE_POLL:
+                self.in_flight[key] -= 1
+                self.last_active[key] = time.monotonic()
+            if lane == LANE_ACTUATE:
+                self.actuating.discard(key)
+                self.start_waiting(key)
+
+    def start_waiting(self, key):
+        """Sends the actuation that waited behind the one just acknowledged."""
+        entry = self.waiting.pop(key, None)
+        if entry is None:
+            return
+        send, future, queued = entry
+
+        def resolve(task):
+            if future.done():
+                return
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+        asyncio.ensure_future(self.dispatch(key, LANE_ACTUATE, send, queued)).add_done_callback(resolve)
+
+    def drop_waiting(self, key):
+        entry = self.waiting.pop(key, None)
+        if entry is not None:
+            self.superseded += 1
+            if not entry[1].done():
+                entry[1].set_result(None)
+
+    def report(self):
+        lines = ["Command lanes:"]
+        for lane, name in enumerate(LANE_NAMES):
+            line = f"  {name}: {self.sent[lane]} sent"
+            if self.waits[lane]:
+                line += (f", queued {percentile_ms(self.waits[lane], 0.5):.2f} ms p50, "
+                         f"{percentile_ms(self.waits[lane], 0.99):.2f} ms p99")
+            lines.append(line)
+        lines.append(f"  {self.superseded} actuations replaced by a newer value, "
+                     f"{self.deferred} polls deferred for a busy device")
+        return "\n".join(lines) + "\n"
+
+
+def battery_sensor(device):
+    """The device's battery sensor, or None."""
+    for sensor in getattr(device, "sensors", ()):
+        if getattr(sensor, "type", None) == "Battery":
+            return sensor
+    return None
+
+
+class SensorPoller:
+    """Reads battery levels in the polling lane and caches them per device key."""
+
+    def __init__(self, core, lanes, interval=POLL_INTERVAL, max_interval=POLL_MAX_INTERVAL,
+                 quiet_time=POLL_QUIET_TIME, tick=POLL_TICK):
+        self.core = core
+        self.lanes = lanes
+        self.interval = interval
+        self.max_interval = max_interval
+        self.quiet_time = quiet_time
+        self.tick = tick
+        self.readings = {}  # device key -> (battery level 0-1, monotonic time read)
+        self.intervals = {}  # device key -> current interval, seconds
+        self.due = {}  # device key -> monotonic time of the next read
+        self.reads = 0
+        self.failures = 0
+
+    def battery(self, key):
+        """Cached battery level of a device (0-1), or None if it hasn't been read."""
+        reading = self.readings.get(key)
+        return reading[0] if reading else None
+
+    def active(self):
+        return self.core.vibrating or self.core.choreographer is not None
+
+    async def run(self):
+        while not self.core.shutting_down:
+            await asyncio.sleep(self.tick)
+            if not self.core.pool or self.active():
+                continue  # No background reads while anything is vibrating
+            for key, device in list(self.core.pool.devices().items()):
+                if self.active():
+                    break
+                if time.monotonic() < self.due.get(key, 0.0) or not self.lanes.idle(key, self.quiet_time):
+                    continue
+                sensor = battery_sensor(device)
+                if sensor is None:
+                    self.due[key] = math.inf
+                    continue
+                await self.read(key, device, sensor)
+
+    async def read(self, key, device, sensor):
+        interval = self.intervals.get(key, self.interval)
+        try:
+            data = await self.lanes.run(key, LANE_POLL, lambda: asyncio.wait_for(sensor.read(), POLL_TIMEOUT))
+        except Exception as e:
+            self.failures += 1
+            self.intervals[key] = min(interval * 2, self.max_interval)
+            self.due[key] = time.monotonic() + self.intervals[key]
+            log.warning("Battery read from %s failed: %s", device.name, e, extra={"device": device.name})
+            return
+        if data is None:
+            return  # The device got busy, try again next tick
+        self.reads += 1
+        ranges = getattr(sensor, "ranges", None)
+        level = data[0] / ranges[0][1] if ranges and ranges[0][1] else data[0]
+        previous = self.battery(key)
+        # Nothing changed: back off. Changed: the battery is moving, read at the base rate again
+        self.intervals[key] = min(interval * 2, self.max_interval) if previous == level else self.interval
+        self.readings[key] = (level, time.monotonic())
+        self.due[key] = time.monotonic() + self.intervals[key]
+        if previous != level and key == self.core.device_key:
+            self.core.notify("status", self.core.device_status())
+
+    def report(self):
+        lines = [f"Battery polling: {self.reads} reads, {self.failures} failed"]
+        for key, (level, read_at) in sorted(self.readings.items()):
+            lines.append(f"  {key[0]} device {key[1]}: {level * 100:.0f}%, "
+                         f"read {time.monotonic() - read_at:.0f} s ago, next after {self.intervals[key]:.0f} s")
+        return "\n".join(lines) + "\n"
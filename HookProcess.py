@@ -0,0 +1,366 @@
+import multiprocessing
+import struct
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+# Optional out-of-process key/mouse hooks ("hook_process": true in keybindings.json).
+# A global hook blocks every keystroke on the system until its callback returns, and
+# in-process that callback first has to win the GIL from Tk and the asyncio thread.
+# Here the hooks live in a small spawned process that only stamps each event into a
+# shared-memory ring buffer and rings a semaphore; a reader thread in the app drains
+# the ring and dispatches the events. New bindings go to the running process over a pipe
+# and are swapped in without restarting it (see HookSet).
+#
+# Ring layout: an 8-byte count of records ever written, padded to HEADER_SIZE, then
+# RING_CAPACITY fixed-size records. There is one writer (the hook process) and one
+# reader, so the writer fills a record first and publishes it by bumping the count.
+
+RING_CAPACITY = 256
+HEADER = struct.Struct("<Q")
+HEADER_SIZE = 64  # Count on its own cache line
+RECORD = struct.Struct("<QddB7x")  # sequence, capture time, hook done time, kind
+KEY_STATE_INTERVAL = 0.25  # Seconds between key state checks in the hook process
+
+KIND_PRESS = 1
+KIND_RELEASE = 2
+KIND_INCREASE = 3
+KIND_DECREASE = 4
+KIND_KEY_DOWN = 5  # Key state polls, for the watchdog's missed-release check
+KIND_KEY_UP = 6
+KIND_TIMED = 16  # Plus the index of the timed binding whose key went down
+
+MOUSE_BUTTONS = ("left", "middle", "right")
+
+
+class EventRing:
+    """Single-writer, single-reader ring of hook event records in shared memory."""
+
+    def __init__(self, name=None, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        size = HEADER_SIZE + capacity * RECORD.size
+        self.memory = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.name = self.memory.name
+        self.written = 0  # Writer side
+        self.read_count = 0  # Reader side
+        self.dropped = 0  # Records overwritten before the reader got to them
+
+    def write(self, kind, capture):
+        seq = self.written
+        offset = HEADER_SIZE + (seq % self.capacity) * RECORD.size
+        RECORD.pack_into(self.memory.buf, offset, seq, capture, time.time(), kind)
+        self.written = seq + 1
+        HEADER.pack_into(self.memory.buf, 0, self.written)  # Publish only after the record is complete
+
+    def read(self):
+        """Returns [(kind, capture time, hook done time), ...] written since the last read."""
+        written = HEADER.unpack_from(self.memory.buf, 0)[0]
+        if written - self.read_count > self.capacity:
+            self.dropped += written - self.read_count - self.capacity
+            self.read_count = written - self.capacity
+        events = []
+        while self.read_count < written:
+            offset = HEADER_SIZE + (self.read_count % self.capacity) * RECORD.size
+            seq, capture, hooked, kind = RECORD.unpack_from(self.memory.buf, offset)
+            if seq == self.read_count:
+                events.append((kind, capture, hooked))
+            else:
+                self.dropped += 1  # Lapped by the writer while reading
+            self.read_count += 1
+        return events
+
+    def close(self, unlink=False):
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class HookLatency:
+    """Recent hook timings, all measured from the moment the event was captured.
+
+    hold: until the hook callback returned, which is how long the keystroke was held up.
+    delivery: until the app handled the event.
+    """
+
+    def __init__(self, label, size=1000):
+        self.label = label
+        self.holds = deque(maxlen=size)
+        self.deliveries = deque(maxlen=size)
+        self.count = 0
+        self.max_hold = 0.0
+        self.max_delivery = 0.0
+
+    def record(self, capture, hooked, delivered):
+        hold, delivery = max(0.0, hooked - capture), max(0.0, delivered - capture)
+        self.holds.append(hold)
+        self.deliveries.append(delivery)
+        self.count += 1
+        self.max_hold = max(self.max_hold, hold)
+        self.max_delivery = max(self.max_delivery, delivery)
+
+    def summary(self):
+        """{"hold_p50": ms, ...} over the recent events, or {} before the first one."""
+        if not self.holds:
+            return {}
+        holds, deliveries = sorted(self.holds), sorted(self.deliveries)
+        return {
+            "hold_p50": percentile(holds, 0.5) * 1000, "hold_p99": percentile(holds, 0.99) * 1000,
+            "hold_max": self.max_hold * 1000,
+            "delivery_p50": percentile(deliveries, 0.5) * 1000, "delivery_p99": percentile(deliveries, 0.99) * 1000,
+            "delivery_max": self.max_delivery * 1000,
+        }
+
+    def report(self):
+        stats = self.summary()
+        if not stats:
+            return f"Key hooks ({self.label}): no events yet\n"
+        return (f"Key hooks ({self.label}): {self.count} events\n"
+                f"  keystroke held {stats['hold_p50']:.2f} ms p50, {stats['hold_p99']:.2f} ms p99, "
+                f"{stats['hold_max']:.1f} ms max\n"
+                f"  handled after {stats['delivery_p50']:.2f} ms p50, {stats['delivery_p99']:.2f} ms p99, "
+                f"{stats['delivery_max']:.1f} ms max\n")
+
+
+BINDINGS = ("vibration_key", "intensity_increase_key", "intensity_decrease_key")
+BINDING_KINDS = {  # Kinds emitted on key down and key up
+    "vibration_key": (KIND_PRESS, KIND_RELEASE),
+    "intensity_increase_key": (KIND_INCREASE, None),
+    "intensity_decrease_key": (KIND_DECREASE, None),
+}
+
+
+def resolve_binding(name, key):
+    """Scan codes a binding matches, or (button,) for a mouse button; ValueError for an unknown key."""
+    if name == "vibration_key" and key in MOUSE_BUTTONS:
+        return (key,)
+    import keyboard
+    return tuple(keyboard.key_to_scan_codes(key))
+
+
+class HookSet:
+    """The bindings' hooks: one keyboard hook (plus a mouse hook while a button is bound)
+    looking events up in a table of bound scan codes. Rebinding swaps the table instead of
+    unhooking and rehooking, so the other bindings never miss an event.
+
+    emit(kind, capture time) is called from the hook thread. A vibration key rebound while
+    held still delivers its release, so a press in flight is never left vibrating.
+    """
+
+    def __init__(self, emit):
+        self.emit = emit
+        self.bindings = {}
+        self.matches = {}  # binding name -> scan codes or (button,)
+        self.table = {}  # scan code or button -> [(down kind, up kind)]
+        self.held = None  # (key, match) of the vibration key while it is down
+        self.timed_down = set()  # (scan code, kind) of timed binding keys while they are down
+        self.keyboard_hook = None
+        self.mouse_hook = None
+
+    def apply(self, bindings):
+        """Matches these bindings from now on; returns the names of the ones that changed."""
+        changed = [name for name in BINDINGS if bindings[name] != self.bindings.get(name)]
+        matches = dict(self.matches)
+        for name in changed:
+            matches[name] = resolve_binding(name, bindings[name])  # Raises before anything is replaced
+        timed = list(bindings.get("timed_keys", ()))
+        if timed != self.bindings.get("timed_keys", []):
+            changed.append("timed_keys")
+            matches["timed_keys"] = [resolve_binding("timed_keys", key) for key in timed]
+        table = {}
+        for name in BINDINGS:
+            for code in matches[name]:
+                table.setdefault(code, []).append(BINDING_KINDS[name])
+        for index, codes in enumerate(matches.get("timed_keys", ())):
+            for code in codes:
+                table.setdefault(code, []).append((KIND_TIMED + index, None))
+        self.bindings = {name: bindings[name] for name in BINDINGS}
+        self.bindings["timed_keys"] = timed
+        self.matches = matches
+        self.table = table  # One assignment: the hook thread sees either the old table or the new one
+        self.prune()
+        return changed
+
+    def on_key(self, event):
+        self.dispatch(event.scan_code, event.event_type == "down", event.time)
+
+    def on_mouse(self, event):
+        import mouse
+
+        if isinstance(event, mouse.ButtonEvent) and event.event_type in (mouse.DOWN, mouse.UP):
+            self.dispatch(event.button, event.event_type == mouse.DOWN, event.time)
+
+    def dispatch(self, code, down, capture):
+        held = self.held
+        if not down and held is not None and code in held[1] and held[1] != self.matches["vibration_key"]:
+            self.held = None
+            self.emit(KIND_RELEASE, capture)  # Released after a rebind: still ends the press
+        for press, release in self.table.get(code, ()):
+            kind = press if down else release
+            if press >= KIND_TIMED:
+                # Timed bindings fire once per press, not again on every key repeat
+                repeat = down and (code, press) in self.timed_down
+                (self.timed_down.add if down else self.timed_down.discard)((code, press))
+                if repeat:
+                    continue
+            if kind == KIND_PRESS:
+                self.held = (self.bindings["vibration_key"], self.matches["vibration_key"])
+            elif kind == KIND_RELEASE:
+                self.held = None
+            if kind is not None:
+                self.emit(kind, capture)
+
+    def vibration_key(self):
+        """The key whose real state decides whether a press is still held: the vibration key, or
+        the old one while it is held after a rebind."""
+        held = self.held
+        return held[0] if held is not None else self.bindings["vibration_key"]
+
+    def is_pressed(self):
+        import keyboard
+        import mouse
+
+        key = self.vibration_key()
+        return mouse.is_pressed(key) if key in MOUSE_BUTTONS else keyboard.is_pressed(key)
+
+    def prune(self):
+        """Hooks the mouse only while a button is bound (or still held); never call from a hook callback."""
+        import keyboard
+        import mouse
+
+        if self.keyboard_hook is None:
+            self.keyboard_hook = keyboard.hook(self.on_key)
+        held = self.held
+        buttons = any(code in MOUSE_BUTTONS for code in self.table) or (held is not None and held[0] in MOUSE_BUTTONS)
+        if buttons and self.mouse_hook is None:
+            self.mouse_hook = mouse.hook(self.on_mouse)
+        elif not buttons and self.mouse_hook is not None:
+            mouse.unhook(self.mouse_hook)
+            self.mouse_hook = None
+
+    def unhook_all(self):
+        import keyboard
+        import mouse
+
+        if self.keyboard_hook is not None:
+            keyboard.unhook(self.keyboard_hook)
+            self.keyboard_hook = None
+        if self.mouse_hook is not None:
+            mouse.unhook(self.mouse_hook)
+            self.mouse_hook = None
+
+
+def watch_key_state(hook_set, emit):
+    """Reports the vibration key's real state (hook process thread); the app must not start a
+    hook listener of its own just to poll key state."""
+    last = None
+    while True:
+        time.sleep(KEY_STATE_INTERVAL)
+        try:
+            hook_set.prune()
+            down = hook_set.is_pressed()
+        except Exception:
+            continue
+        if down != last:
+            last = down
+            emit(KIND_KEY_DOWN if down else KIND_KEY_UP, time.time())
+
+
+def run_hooks(ring_name, doorbell, stopping, bindings, control, feed=None):
+    """Hook process entry point. New bindings sent over control are applied in place. With a
+    feed connection, (kind, capture time) pairs read from it stand in for real hooks
+    (benchmarks); otherwise the keyboard/mouse hooks are installed."""
+    ring = EventRing(ring_name)  # Shares the app's resource tracker, which unlinks it if the app dies
+
+    def emit(kind, capture):
+        ring.write(kind, capture)
+        doorbell.release()
+
+    hook_set = None
+    if feed is None:
+        hook_set = HookSet(emit)
+        hook_set.apply(bindings)
+        threading.Thread(target=watch_key_state, args=(hook_set, emit), daemon=True).start()
+    else:
+        def pump_feed():
+            while True:
+                try:
+                    emit(*feed.recv())
+                except (EOFError, OSError):
+                    return
+        threading.Thread(target=pump_feed, daemon=True).start()
+
+    def follow_control():
+        while True:
+            try:
+                bindings = control.recv()
+            except (EOFError, OSError):
+                return
+            if hook_set is not None:
+                try:
+                    hook_set.apply(bindings)
+                except ValueError:
+                    pass  # Checked by the app before sending; keep the current bindings
+    threading.Thread(target=follow_control, daemon=True).start()
+    stopping.wait()
+    ring.close()
+
+
+class HookProcess:
+    """Runs the hooks in a child process and hands their events to on_event(kind, capture time)
+    from a reader thread in this process."""
+
+    def __init__(self, on_event):
+        self.on_event = on_event
+        self.latency = HookLatency("separate process")
+        self.process = None
+        self.ring = None
+
+    def start(self, bindings, feed=None):
+        """(Re)starts the hook process for these bindings (vibration and intensity keys)."""
+        self.stop()
+        context = multiprocessing.get_context("spawn")  # Never fork the Tk and asyncio threads
+        self.ring = EventRing()
+        self.doorbell = context.Semaphore(0)
+        self.stopping = context.Event()
+        self.control, control = context.Pipe()
+        self.process = context.Process(target=run_hooks, name="hooks", daemon=True,
+                                       args=(self.ring.name, self.doorbell, self.stopping, bindings, control, feed))
+        self.process.start()
+        self.reader = threading.Thread(target=self.read_loop, daemon=True)
+        self.reader.start()
+
+    def rebind(self, bindings):
+        """Hands new bindings to the running hook process, which swaps them in without restarting."""
+        self.control.send(bindings)
+
+    def read_loop(self):
+        ring, doorbell, stopping = self.ring, self.doorbell, self.stopping
+        while not stopping.is_set():
+            doorbell.acquire(timeout=0.5)
+            for kind, capture, hooked in ring.read():
+                self.latency.record(capture, hooked, time.time())
+                self.on_event(kind, capture)
+
+    def stop(self):
+        if self.process is None:
+            return
+        self.stopping.set()
+        self.doorbell.release()  # Wake the reader so it sees the stop
+        self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.reader.join(1.0)
+        self.control.close()
+        self.ring.close(unlink=True)
+        self.process = None
+
+    def report(self):
+        text = self.latency.report()
+        if self.ring is not None and self.ring.dropped:
+            text += f"  {self.ring.dropped} events dropped (ring full)\n"
+        return text
@@ -0,0 +1,1403 @@
+import asyncio
+import atexit
+import bisect
+import concurrent.futures
+import copy
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import traceback
+from array import array
+
+from Log import start_logging, LOG_FILE
+from CommandLanes import CommandLanes, SensorPoller, LANE_STOP, LANE_ACTUATE
+from ResponseCurve import DEFAULT_CURVE, normalize_curve, compile_curve, apply_curve
+from SessionStats import UsageStats, STATS_FILE
+from Keepalive import Keepalive, KEEPALIVE_INTERVAL
+from Timers import TimerService, timed_action, next_daily, MAX_TIMED_BINDINGS
+from Mixer import IntensityMixer, KEY_SOURCE
+
+# GUI-free engine behind AppV5: the event loop thread, Intiface connections, device
+# selection, the send pipeline, key/mouse bindings, the watchdog and settings I/O.
+# Nothing here imports Tk, and buttplug, keyboard, mouse and the plugin host are only
+# imported when first used, so headless callers, benchmarks and tests can import it cheaply.
+#
+#   core = IntifaceCore(listener=print)  # listener(event, value) is called from any thread
+#   core.connect().result(10)            # sync facade: thread-safe, returns concurrent futures
+#   core.vibrate(0.5)
+#   core.shutdown()
+#
+# The async API (connect_task, vibrate_task, shutdown_task) runs on core.event_loop.
+# Listener events: "status" (text), "connection" ("connected" / "failed"), "devices"
+# (list of labels), "device" (index in that list, or None), "vibrating" (bool),
+# "plugin_status" (text) and "settings" (names of the settings reloaded from disk).
+#
+# keybindings.json is watched while the app runs: edits made to it by hand are diffed
+# against the live settings and only what changed is applied (see reload_settings).
+
+SETTINGS_FILE = "keybindings.json"
+SETTINGS_POLL_INTERVAL = 1.0  # Seconds between checks of the settings file for changes
+DEFAULT_SERVER_URL = "ws://localhost:12345"
+CONNECT_TIMEOUT = 10.0  # Seconds before a single Intiface server is given up on
+DEVICE_CACHE_FILE = "device_cache.json"
+HISTORY_SIZE = 512  # Sent intensities kept per device, for the live graph
+SHUTDOWN_TIMEOUT = 2.0  # Hard deadline (seconds) for stopping devices on exit
+WATCHDOG_INTERVAL = 0.25  # Seconds between watchdog checks
+LOOP_STALL_TIMEOUT = 2.0  # Seconds without an event loop heartbeat before vibration is stopped
+EMERGENCY_STOP_ID = 0xFFFFFFF0  # Buttplug message Id of stops written while the loop is stalled, far above the client's
+MOUSE_VK_CODES = {"left": 0x01, "right": 0x02, "middle": 0x04}
+LAG_SAMPLE_INTERVAL = 0.05  # Seconds between event loop lag samples
+SLOW_CALLBACK_THRESHOLD = 0.05  # Lag (seconds) above which the blocking callback is recorded
+LAG_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)  # Histogram upper bounds
+
+log = logging.getLogger("intiface.core")
+
+DEFAULT_SETTINGS = {
+    "vibration_key": "space",
+    "intensity_increase_key": "+",
+    "intensity_decrease_key": "-",
+    "vibration_intensity": 1.0,
+    "max_vibration_time": 600.0,
+    "server_urls": [DEFAULT_SERVER_URL],
+    "plugins": [],
+    "plugin_config": {},
+    "hook_process": False,  # Run the key/mouse hooks in their own process (HookProcess.py)
+    "choreography": {"pattern": "wave", "period": 2.0, "offsets": "travel", "rate": 20},  # See Choreography.py
+    "curves": {},  # Device name -> response curve, see ResponseCurve.py
+    "batch_window_ms": 0,  # Messages sent this close together share a frame; null: never, see CommandBatch.py
+    "auto_connect": False,  # Connect in the background as soon as the core starts
+    "keepalive_interval": KEEPALIVE_INTERVAL,  # Seconds between pings to each server, 0: never (see Keepalive.py)
+    "timed_bindings": [],  # Keys that vibrate for a set time, see Timers.py
+    "scheduled_sessions": [],  # Daily vibration at a local time, see Timers.py
+    "mixer": {"policy": "max", "priorities": {}, "duck": 0.25, "tick_ms": 0},  # Concurrent sources, see Mixer.py
+}
+SETTING_ATTRIBUTES = {"plugins": "enabled_plugins", "mixer": "mixer_settings"}  # Settings kept under another attribute name
+
+
+def load_win32api():
+    """pywin32's win32api for reading real key state on Windows, or None."""
+    try:
+        import win32api
+    except ImportError:
+        return None
+    return win32api
+
+
+class LoopMonitor:
+    """Samples event loop scheduling lag and captures the stack of whatever stalls it."""
+
+    def __init__(self, loop, interval=LAG_SAMPLE_INTERVAL, threshold=SLOW_CALLBACK_THRESHOLD):
+        self.loop = loop
+        self.interval = interval
+        self.threshold = threshold
+        self.histogram = [0] * (len(LAG_BUCKETS_MS) + 1)  # Last bucket is "over 1000 ms"
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.offenders = {}  # name -> [count, worst lag, total lag, stack text]
+        self.last_tick = time.monotonic()
+        self.loop_thread_id = None
+        self.pending_stack = None
+        self.lock = threading.Lock()
+
+    async def sample_task(self):
+        """Sleeps a fixed interval and records how late the loop woke us up."""
+        self.loop_thread_id = threading.get_ident()
+        threading.Thread(target=self.watch_stalls, daemon=True).start()
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.last_tick = now
+            self.record_lag(max(0.0, now - expected))
+
+    def watch_stalls(self):
+        """Grabs the loop thread's stack from outside while the loop is stalled."""
+        captured_tick = None
+        while not self.loop.is_closed():
+            time.sleep(self.threshold / 2)
+            tick = self.last_tick
+            if tick != captured_tick and time.monotonic() - tick > self.interval + self.threshold:
+                frame = sys._current_frames().get(self.loop_thread_id)
+                if frame is not None:
+                    self.pending_stack = traceback.extract_stack(frame)
+                    captured_tick = tick
+
+    def record_lag(self, lag):
+        with self.lock:
+            self.samples += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+            self.histogram[bisect.bisect_left(LAG_BUCKETS_MS, lag * 1000)] += 1
+            if lag < self.threshold:
+                self.pending_stack = None
+                return
+
+            stack, self.pending_stack = self.pending_stack, None
+            name, text = self.describe_stack(stack)
+            offender = self.offenders.setdefault(name, [0, 0.0, 0.0, text])
+            offender[0] += 1
+            offender[2] += lag
+            if lag >= offender[1]:
+                offender[1] = lag
+                offender[3] = text
+
+    @staticmethod
+    def describe_stack(stack):
+        """Names the callback or coroutine step that was running, below asyncio's own frames."""
+        if not stack:
+            return "(stall too short to capture a stack)", ""
+        callback_frames = stack
+        for index, frame in enumerate(stack):
+            # Handle._run is where asyncio calls into the callback / steps the coroutine
+            if frame.name == "_run" and frame.filename.endswith(os.path.join("asyncio", "events.py")):
+                callback_frames = stack[index + 1:] or stack
+                break
+        user_frames = [f for f in callback_frames if os.sep + "asyncio" + os.sep not in f.filename]
+        entry = (user_frames or callback_frames)[0]
+        innermost = stack[-1]
+        name = f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+        if innermost is not entry:
+            name += f" in {innermost.name} ({os.path.basename(innermost.filename)}:{innermost.lineno})"
+        return name, "".join(traceback.format_list(callback_frames[-8:]))
+
+    def percentile(self, fraction):
+        """Approximate lag percentile in ms, as the histogram bucket bound it falls in."""
+        target = self.samples * fraction
+        seen = 0
+        for bound, count in zip(LAG_BUCKETS_MS + (float("inf"),), self.histogram):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def report(self, worst=5):
+        """Formats the histogram and the worst offenders for the diagnostics view."""
+        with self.lock:
+            if not self.samples:
+                return "Event loop lag: no samples yet\n"
+            lines = [
+                f"Event loop lag ({self.samples} samples every {self.interval * 1000:.0f} ms)",
+                f"  mean {self.total_lag / self.samples * 1000:.2f} ms, max {self.max_lag * 1000:.1f} ms,"
+                f" p50 <= {self.percentile(0.5)} ms, p99 <= {self.percentile(0.99)} ms",
+            ]
+            peak = max(self.histogram)
+            lower = 0
+            for bound, count in zip(LAG_BUCKETS_MS + (float("inf"),), self.histogram):
+                bar = "#" * (round(count / peak * 30) if peak else 0)
+                lines.append(f"  {lower:>5}-{bound:<5} ms {count:>7} {bar}")
+                lower = bound
+
+            offenders = sorted(self.offenders.items(), key=lambda item: item[1][1], reverse=True)[:worst]
+            lines.append(f"Slow callbacks (> {self.threshold * 1000:.0f} ms): {len(self.offenders)} distinct")
+            for name, (count, worst_lag, total_lag, text) in offenders:
+                lines.append(f"  {worst_lag * 1000:.0f} ms worst, {count}x, {total_lag * 1000:.0f} ms total: {name}")
+                if text:
+                    lines.extend("      " + line for line in text.rstrip().splitlines())
+            return "\n".join(lines) + "\n"
+
+
+class ClientPool:
+    """One Buttplug client per Intiface server, all on one loop, with a merged device registry.
+
+    Devices are keyed by (server url, device index). Each Device object sends through the
+    client that created it, so commands always go to the owning connection and a slow
+    server only holds up its own devices.
+    """
+
+    def __init__(self, name, urls, batch_window=0.0):
+        self.name = name
+        self.urls = list(dict.fromkeys(urls))  # Drop duplicates, keep order
+        self.batch_window = batch_window  # See CommandBatch.py; None sends one frame per message
+        self.connectors = {}  # url -> BatchingConnector
+        self.clients = {}  # url -> connected Client
+        self.errors = {}  # url -> last connection error
+        self.changed = asyncio.Event()  # Set whenever a server finishes connecting
+
+    async def connect_server(self, url):
+        """Connects one server and starts scanning on it."""
+        # Correct imports for the Siege-Wizard fork
+        from buttplug import Client
+        from CommandBatch import BatchingConnector
+
+        client = Client(self.name)
+        connector = self.connectors[url] = BatchingConnector(url, self.batch_window)
+        try:
+            await asyncio.wait_for(client.connect(connector), CONNECT_TIMEOUT)
+            self.clients[url] = client
+            self.errors.pop(url, None)
+            self.changed.set()  # The connect handshake already listed known devices
+            await client.start_scanning()
+        except asyncio.TimeoutError:
+            self.errors[url] = "Timed out"
+        except Exception as e:
+            self.errors[url] = str(e) or type(e).__name__
+        self.changed.set()
+
+    async def connect_all(self):
+        """Connects every server concurrently; failures are kept in self.errors."""
+        await asyncio.gather(*(self.connect_server(url) for url in self.urls))
+
+    async def stop_scanning(self):
+        from buttplug.errors import ScanNotRunningError
+
+        async def stop(client):
+            try:
+                await client.stop_scanning()
+            except ScanNotRunningError:
+                pass
+        await asyncio.gather(*(stop(c) for c in list(self.clients.values())), return_exceptions=True)
+
+    async def disconnect_all(self):
+        await asyncio.gather(*(self.close_client(c) for c in list(self.clients.values())))
+
+    @staticmethod
+    async def close_client(client):
+        try:
+            await asyncio.wait_for(client.disconnect(), CONNECT_TIMEOUT)
+        except Exception:
+            pass  # A dead link can't be closed cleanly; the socket is dropped either way
+        # Commands still waiting for an answer would wait forever (the library never fails them)
+        for future in list(getattr(client, "_tasks", {}).values()):
+            future.cancel()
+
+    def emergency_stop(self):
+        """Stops every server's devices without the event loop; returns the servers reached.
+
+        Called from the heartbeat thread while the loop is stalled. StopAllDevices is written
+        to the socket (see write_from_thread), its answer read once the loop recovers and
+        dropped as an unknown Id. Where that can't be done (TLS, unsent bytes) the socket is
+        shut down instead, the server stops the devices of a client that disconnects, and
+        the keepalive reconnects it once the loop recovers.
+        """
+        frame = json.dumps([{"StopAllDevices": {"Id": EMERGENCY_STOP_ID}}])
+        reached = 0
+        for url in list(self.clients):
+            connector = self.connectors.get(url)
+            if connector is None:
+                continue
+            if connector.write_from_thread(frame):
+                reached += 1
+            elif connector.close_from_thread():
+                reached += 1
+                log.warning("Event loop stalled, closed the connection to %s to stop its devices", url,
+                            extra={"url": url})
+        return reached
+
+    async def reconnect_server(self, url):
+        """Replaces one server's client with a new connection; the other servers are untouched.
+
+        Returns True once it is connected again, with its devices listed.
+        """
+        client = self.clients.pop(url, None)
+        self.changed.set()
+        if client is not None:
+            await self.close_client(client)
+        await self.connect_server(url)
+        client = self.clients.get(url)
+        if client is None:
+            return False
+        try:
+            await client.stop_scanning()  # As after the first connect: known devices came with the handshake
+        except Exception:
+            pass  # Not scanning, or the server went again: the keepalive will notice
+        return True
+
+    def devices(self):
+        """Merged registry: (url, device index) -> Device."""
+        merged = {}
+        for url, client in list(self.clients.items()):
+            for index, device in client.devices.items():
+                merged[(url, index)] = device
+        return merged
+
+    def describe(self, key, device):
+        """Label for a device, naming the server only when there is more than one."""
+        if len(self.urls) == 1:
+            return device.name
+        return f"{device.name} ({key[0]})"
+
+    def error_summary(self):
+        return "\n".join(f"{url}: {error}" for url, error in self.errors.items())
+
+    def report(self):
+        lines = ["Command batching: " + ("off" if self.batch_window is None else
+                                         f"window {self.batch_window * 1000:g} ms")]
+        for url, connector in self.connectors.items():
+            if connector.report():
+                lines.append(f"  {url}: {connector.report()}")
+        return "\n".join(lines) + "\n"
+
+
+ACTUATOR_KINDS = (
+    ("scalar", "actuators"),
+    ("linear", "linear_actuators"),
+    ("rotatory", "rotatory_actuators"),
+)
+
+
+def device_layout(device):
+    """Name, index and actuator layout of a device, as stored in the device cache."""
+    layout = {"name": device.name, "index": device.index}
+    for kind, attribute in ACTUATOR_KINDS:
+        layout[attribute] = [
+            {"index": actuator.index, "step_count": actuator.step_count,
+             "type": getattr(actuator, "type", None)}
+            for actuator in getattr(device, attribute, ())
+        ]
+    return layout
+
+
+def build_command_plan(device, layout=None):
+    """Resolves the actuator vibrate_task drives, as (kind, actuator, step count), or None.
+
+    With a cached layout the actuator is looked up directly instead of probing the device.
+    """
+    layout = layout or device_layout(device)
+    for kind, attribute in ACTUATOR_KINDS:
+        actuators = getattr(device, attribute, ())
+        for cached in layout.get(attribute, ()):
+            if cached["index"] < len(actuators):
+                return kind, actuators[cached["index"]], cached["step_count"]
+    return None
+
+
+class StepQuantizer:
+    """Snaps values to each actuator's step count and drops sends that would not change the step."""
+
+    def __init__(self):
+        self.last_steps = {}  # (device key, kind, actuator index) -> step last sent
+        self.sent = 0
+        self.suppressed = 0
+
+    def quantize(self, key, value, step_count):
+        """Returns the value to send, or None if the device is already at that step."""
+        value = min(max(value, 0.0), 1.0)
+        if step_count:
+            # Same rounding Intiface applies: any non-zero value is at least step 1
+            step = math.ceil(value * step_count - 1e-9)
+            value = step / step_count
+        else:
+            step = value  # Unknown step count, only exact repeats can be dropped
+        if self.last_steps.get(key) == step:
+            self.suppressed += 1
+            return None
+        self.last_steps[key] = step
+        self.sent += 1
+        return value
+
+    def forget(self, key=None):
+        """Drops remembered steps (one actuator, or all) when the device state is unknown."""
+        if key is None:
+            self.last_steps.clear()
+        else:
+            self.last_steps.pop(key, None)
+
+    def forget_server(self, url):
+        """Drops the remembered steps of every device on one server."""
+        for key in [key for key in self.last_steps if key[0][0] == url]:
+            del self.last_steps[key]
+
+    def report(self):
+        total = self.sent + self.suppressed
+        saved = self.suppressed / total * 100 if total else 0.0
+        return f"Commands: {self.sent} sent, {self.suppressed} suppressed as same step ({saved:.1f}% saved)\n"
+
+
+class IntensityHistory:
+    """Fixed-size ring buffer of sent intensities and their acknowledgement for one device."""
+
+    def __init__(self, size=HISTORY_SIZE):
+        self.size = size
+        self.times = array("d", [0.0]) * size
+        self.values = array("d", [0.0]) * size
+        self.acks = array("b", [0]) * size  # 0 pending, 1 acknowledged, -1 failed
+        self.written = 0  # Total samples ever added; slot = sequence % size
+
+    def add(self, timestamp, value):
+        """Records a send and returns its sequence number for ack()."""
+        seq = self.written
+        slot = seq % self.size
+        self.times[slot] = timestamp
+        self.values[slot] = value
+        self.acks[slot] = 0
+        self.written = seq + 1
+        return seq
+
+    def ack(self, seq, ok=True):
+        if self.written - seq <= self.size:  # Not overwritten yet
+            self.acks[seq % self.size] = 1 if ok else -1
+
+
+class DeviceCache:
+    """Devices seen in earlier sessions and the last one used, kept in DEVICE_CACHE_FILE."""
+
+    def __init__(self, path=DEVICE_CACHE_FILE):
+        self.path = path
+        self.devices = {}  # "url|name" -> {"url": ..., layout fields}
+        self.last_device = None  # "url|name"
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.devices = data.get("devices", {})
+            self.last_device = data.get("last_device")
+        except (FileNotFoundError, ValueError):
+            pass  # No cache yet (or a corrupt one), everything is discovered live
+
+    @staticmethod
+    def cache_key(url, name):
+        # Intiface may renumber devices between sessions, so match on name per server
+        return f"{url}|{name}"
+
+    def remember(self, url, device):
+        """Stores a device's layout; returns True if anything changed."""
+        entry = dict(device_layout(device), url=url)
+        key = self.cache_key(url, device.name)
+        if self.devices.get(key) == entry:
+            return False
+        self.devices[key] = entry
+        return True
+
+    def layout(self, url, device):
+        return self.devices.get(self.cache_key(url, device.name))
+
+    def save(self):
+        try:
+            with open(self.path, "w") as f:
+                json.dump({"devices": self.devices, "last_device": self.last_device}, f)
+        except OSError as e:
+            log.warning("Could not save device cache: %s", e)
+
+
+class IntifaceCore:
+    """Connections, devices, sending and bindings, shared by every front end.
+
+    Methods without async are thread-safe and never block on the device; state changes
+    are reported to listeners instead of touching any UI.
+    """
+
+    def __init__(self, settings_path=SETTINGS_FILE, hooks=True, listener=None):
+        self.settings_path = settings_path
+        self.hooks = hooks  # Global key/mouse hooks; off for embedded callers that drive press() themselves
+        self.listeners = [listener] if listener else []
+        # Errors and events go to a queue; a writer thread keeps the log file and the recent history
+        self.logs = start_logging(os.path.join(os.path.dirname(settings_path), LOG_FILE))
+        # Session and lifetime usage statistics, saved at exit
+        self.stats = UsageStats(os.path.join(os.path.dirname(settings_path), STATS_FILE))
+        self.listeners.append(self.stats.on_event)
+
+        self.pool = None
+        self.connection_task = None  # connect_task of the current pool, watching its devices
+        self.device = None
+        self.device_key = None
+        self.device_keys = []  # Device list order -> ClientPool key
+        self.command_plan = None  # (kind, actuator, step count, curve table) for the selected device
+        self.command_plans = {}  # device key -> (Device, plan), for every device that was driven
+        self.choreographer = None  # Choreography.Choreographer while one runs
+        self.quantizer = StepQuantizer()
+        self.lanes = CommandLanes()  # Stop, actuation and polling lanes for everything sent
+        self.poller = SensorPoller(self, self.lanes)  # Cached battery levels
+        self.histories = {}  # device key -> IntensityHistory, for the live graph
+        self.device_cache = DeviceCache(os.path.join(os.path.dirname(settings_path), DEVICE_CACHE_FILE))
+        self.vibrating = False  # Any source contributing, see the mixer below
+        self.vibration_started = 0.0  # Loop time the current stretch of vibration began
+        self.limit_timer = None  # The one timer checking max_vibration_time, re-armed rather than replaced
+        self.pulses = {}  # source -> (start Timer, stop Timer) of a pending or running timed action
+        self.session_timers = []
+        self.plugin_statuses = {}
+        self.loop_heartbeat = time.monotonic()
+        self.shutting_down = False
+        self.shutdown_report = None
+        self.plugin_host = None  # PluginHost, created last
+        self.win32api = load_win32api() if hooks else None
+        self.hook_runner = None  # HookProcess while hooks run out of process
+        self.hook_set = None  # HookProcess.HookSet while hooks run in process
+        self.binding_lock = threading.RLock()  # Rebinds come from Tk and from settings reloads
+        self.hook_latency = None  # HookLatency of whichever hooks are active
+        self.hook_key_down = False  # Vibration key state as last reported by the hook process
+
+        # Load keybindings from file, or use defaults
+        self.load_keybindings()
+
+        # Asynchronous event loop handling (for Buttplug)
+        self.event_loop = asyncio.new_event_loop()
+        self.event_loop_thread = threading.Thread(target=self.run_event_loop, daemon=True)
+        self.event_loop_thread.start()
+
+        # Timed presses, delayed triggers, scheduled sessions and the press time limit
+        self.timers = TimerService(self.event_loop)
+        self.event_loop.call_soon_threadsafe(self.schedule_sessions)
+
+        # Every trigger source's intensity per device, mixed into one output per device per tick
+        self.mixer = IntensityMixer(self.event_loop, self.send_mix, self.on_mixer_active, self.vibration_intensity)
+        self.configure_mixer(self.mixer_settings)
+
+        # Connecting takes a while: start it now, alongside the rest of the startup (and the UI)
+        if self.auto_connect:
+            self.connect()
+
+        # Lag histogram and slow-callback profiler for the loop above
+        self.loop_monitor = LoopMonitor(self.event_loop)
+        self.submit(self.loop_monitor.sample_task())
+
+        # Stop devices on interpreter exit whatever the front end does
+        atexit.register(self.shutdown)
+
+        # Dead-man watchdog: polls from the loop, heartbeat checked from its own thread
+        self.submit(self.watchdog_task())
+        threading.Thread(target=self.check_loop_heartbeat, daemon=True).start()
+
+        # Battery reads in the background lane, paused while anything vibrates
+        self.submit(self.poller.run())
+
+        # Hand edits to the settings file are applied without a restart
+        self.submit(self.watch_settings_task())
+
+        # Pings keep idle connections warm and reconnect dead ones before a key press finds them
+        self.keepalive = Keepalive(self)
+        self.submit(self.keepalive.run())
+
+        if hooks:
+            self.update_keyboard_binding()
+
+        # Extra trigger sources and outputs; only the enabled plugins get imported
+        from PluginHost import PluginHost
+        self.plugin_host = PluginHost(self)
+        self.plugin_host.apply(self.enabled_plugins, self.plugin_config)
+
+    def add_listener(self, listener):
+        """listener(event, value) is called from whichever thread changed the state."""
+        self.listeners.append(listener)
+
+    def notify(self, event, value=None):
+        for listener in list(self.listeners):
+            try:
+                listener(event, value)
+            except Exception as e:
+                log.exception("Error in %s listener: %s", event, e)
+
+    def run_event_loop(self):
+        asyncio.set_event_loop(self.event_loop)
+        self.event_loop.run_forever()
+
+        # Loop was stopped by shutdown(); cancel leftovers (hung sockets, scans) so the thread can exit
+        pending = asyncio.all_tasks(self.event_loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.event_loop.run_until_complete(asyncio.wait(pending, timeout=0.25))
+        self.event_loop.close()
+
+    def submit(self, coroutine):
+        """Schedules a coroutine on the core's loop from any thread; returns a concurrent future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.event_loop)
+
+    def connect(self):
+        return self.submit(self.connect_task())
+
+    def vibrate(self, intensity):
+        return self.submit(self.vibrate_task(intensity))
+
+    def device_status(self):
+        if self.device:
+            status = f"Connected to: {self.device.name}\nIntensity:{self.vibration_intensity}"
+            battery = self.poller.battery(self.device_key)
+            if battery is not None:
+                status += f"  Battery: {battery * 100:.0f}%"
+            return status
+        return "No device connected"
+
+    def cached_devices(self):
+        """Labels of the last session's devices and the index of the last one used (or None)."""
+        keys = list(self.device_cache.devices)
+        labels = [entry["name"] for entry in self.device_cache.devices.values()]
+        index = keys.index(self.device_cache.last_device) if self.device_cache.last_device in keys else None
+        return labels, index
+
+    async def connect_task(self):
+        """Connects to every configured Intiface server and scans for devices."""
+        from buttplug.errors import ClientError
+
+        self.notify("status", "Connecting...")
+        self.quantizer.forget()  # Fresh connection, device states are unknown
+        previous, self.connection_task = self.connection_task, asyncio.current_task()
+        if previous is not None and not previous.done():
+            previous.cancel()  # Its watch_devices loop belongs to the old pool
+        if self.pool is not None:
+            self.mixer.reset()
+            self.set_device(None)  # Nothing may be sent to the old clients from here on
+            # The old clients' sockets and receive loops would otherwise live on
+            await self.pool.disconnect_all()
+        window = None if self.batch_window_ms is None else self.batch_window_ms / 1000
+        self.pool = ClientPool("Haptic Control App", self.server_urls, window)
+        connecting = asyncio.ensure_future(self.pool.connect_all())
+        try:
+            # Take the first device from whichever server lists one; slower servers keep going.
+            # Devices Intiface already knows come with the connect handshake, so no scan wait.
+            while not self.pool.devices():
+                if connecting.done() and not self.pool.clients:
+                    self.notify("status", f"Connection Error:\n{self.pool.error_summary()}")
+                    self.notify("connection", "failed")
+                    return
+                if self.pool.clients:
+                    self.notify("status", "Connected.  Scanning...")
+                self.pool.changed.clear()
+                try:
+                    await asyncio.wait_for(self.pool.changed.wait(), 0.1)
+                except asyncio.TimeoutError:
+                    pass  # Scan results have no event, keep polling
+            self.refresh_devices()
+            self.notify("connection", "connected")
+            await self.watch_devices(connecting)
+
+        except ClientError as e:
+            self.notify("status", f"Connection Error: {e}")
+            self.notify("connection", "failed")
+        except Exception as e:
+            self.notify("status", f"Error: {e}")
+            self.notify("connection", "failed")
+
+    async def reconnect_server(self, url):
+        """Reconnects one server of the pool; devices on the other servers carry on vibrating."""
+        pool = self.pool
+        self.mixer.drop_server(url)  # Its devices are gone until the new connection lists them
+        self.quantizer.forget_server(url)
+        connected = await pool.reconnect_server(url)
+        if pool is self.pool:
+            self.refresh_devices()
+        return connected
+
+    async def watch_devices(self, connecting):
+        """Keeps the device list in sync as servers finish connecting and devices come and go."""
+        while not connecting.done():
+            # Keep picking up the last used device while the scan is still settling
+            self.refresh_devices()
+            await asyncio.wait([connecting], timeout=0.1)
+        if self.pool.errors:
+            self.notify("status", f"Some servers failed:\n{self.pool.error_summary()}")
+        await self.pool.stop_scanning()
+        while not self.shutting_down:
+            self.refresh_devices()
+            await asyncio.sleep(1.0)
+
+    def refresh_devices(self):
+        """Updates the device list, keeping the current selection when it is still there."""
+        devices = self.pool.devices()
+        keys = list(devices)
+        if keys != self.device_keys:
+            self.device_keys = keys
+            self.notify("devices", [self.pool.describe(key, device) for key, device in devices.items()])
+            if any([self.device_cache.remember(url, device) for (url, _), device in devices.items()]):
+                self.device_cache.save()
+
+        # Switch to the last used device the moment it shows up, unless the user is vibrating
+        last_key = next((key for key, device in devices.items()
+                         if DeviceCache.cache_key(key[0], device.name) == self.device_cache.last_device), None)
+        if last_key is not None and last_key != self.device_key and not self.vibrating:
+            self.set_device(last_key)
+        elif self.device_key not in devices:
+            self.mixer.drop_device(self.device_key)
+            self.set_device(keys[0] if keys else None)
+        elif devices[self.device_key] is not self.device:
+            self.set_device(self.device_key)  # Same device on a new connection
+
+    def set_device(self, key):
+        """Routes commands to the given device (None when nothing is connected)."""
+        if self.device_key is None and key is not None:
+            self.mixer.clear_device(None)  # The outputs were streamed to without a device; they get a 0
+        devices = self.pool.devices() if self.pool else {}
+        device = devices.get(key)
+        self.command_plan = self.plan_for(key, device) if device else None
+        self.device_key = key
+        self.device = device
+        if device and self.device_cache.last_device is None:
+            self.device_cache.last_device = DeviceCache.cache_key(key[0], device.name)
+            self.device_cache.save()
+        self.notify("device", self.device_keys.index(key) if device else None)
+        self.notify("status", self.device_status())
+
+    def select_device(self, index):
+        """Switches to the device at this position in the device list and remembers the choice."""
+        if 0 <= index < len(self.device_keys) and self.device_keys[index] != self.device_key:
+            self.stop_all()
+            key = self.device_keys[index]
+            self.set_device(key)
+            # Remember the user's choice for the next launch
+            self.device_cache.last_device = DeviceCache.cache_key(key[0], self.device.name)
+            self.device_cache.save()
+
+    def press(self, source=None, intensity=None, device=None):
+        """Starts vibration for a trigger: None for the key/mouse hooks, else a source name (any thread).
+
+        Each source adds its own contribution to the selected device (or the device with key
+        device); the mixer combines them. intensity None follows the main intensity.
+        """
+        if self.shutting_down:
+            return  # The devices are being stopped; plugins and hooks still run until they are
+        key = self.device_key if device is None else device
+        if key is None and not (self.plugin_host is not None and self.plugin_host.outputs):
+            return  # Nothing to drive: no device, and no output plugin to stream to
+        if self.choreographer is None:
+            # Without a device the mix goes to the output plugins alone (mixer key None)
+            self.mixer.set(key, KEY_SOURCE if source is None else source, intensity)
+
+    def release(self, source=None):
+        """Stops a trigger's vibration, leaving every other source's as it is (any thread)."""
+        self.mixer.remove(KEY_SOURCE if source is None else source)
+
+    def set_source_intensity(self, source, intensity, device=None):
+        """Drives intensity continuously from a trigger source; 0 releases (any thread)."""
+        if intensity <= 0:
+            self.release(source)
+        else:
+            self.press(source, intensity, device)
+
+    def stop_all(self):
+        """Drops every source's contribution, so every device stops (any thread)."""
+        self.mixer.clear()
+
+    def configure_mixer(self, settings):
+        """Applies "mixer" settings; an invalid one is logged and the mixer left as it was."""
+        try:
+            self.mixer.configure(**settings)
+        except (ValueError, TypeError) as e:
+            log.warning("Mixer settings not applied: %s", e, extra={"path": self.settings_path})
+            return False
+        return True
+
+    def on_mixer_active(self, active):
+        """Mixer callback when the first source starts or the last one stops (any thread, in order)."""
+        self.vibrating = active
+        if active:
+            self.vibration_started = self.event_loop.time()
+            if self.max_vibration_time and self.limit_timer is None:
+                # A release leaves the timer pending; when it fires for a later start it re-arms
+                self.limit_timer = self.timers.call_at(self.vibration_started + self.max_vibration_time,
+                                                       self.check_vibration_limit)
+        self.notify("vibrating", active)
+
+    def send_mix(self, key, intensity):
+        """Mixer output: sends one device its mixed intensity (event loop only)."""
+        if key is None:
+            for output in self.plugin_host.outputs:  # No device: a relay partner still gets the stream
+                self.event_loop.create_task(self.run_output(output, None, intensity))
+        elif key == self.device_key:
+            self.event_loop.create_task(self.vibrate_task(intensity))
+        elif self.pool is not None and key in self.pool.devices():
+            self.event_loop.create_task(self.drive_device(key, intensity))
+
+    async def drive_device(self, key, intensity):
+        """Sends an intensity to a device other than the selected one."""
+        device = self.pool.devices().get(key)
+        plan = self.plan_for(key, device) if device else None
+        if plan is None:
+            return
+        try:
+            await self.send_intensity(key, plan, intensity)
+        except Exception as e:
+            self.quantizer.forget()
+            self.mixer.forget(key)
+            log.error("Error during vibration: %s", e, extra={"device": device.name})
+
+    def check_vibration_limit(self):
+        """Timer callback: stops vibration on for max_vibration_time, or re-arms for a later start."""
+        with self.mixer.lock:  # Against on_mixer_active, so a start can't miss its timer
+            self.limit_timer = None
+            if not self.vibrating or not self.max_vibration_time:
+                return
+            deadline = self.vibration_started + self.max_vibration_time
+            if self.event_loop.time() < deadline:
+                self.limit_timer = self.timers.call_at(deadline, self.check_vibration_limit)
+                return
+            self.watchdog_stop(f"Stopped after {self.max_vibration_time:g}s of continuous vibration")
+
+    def pulse(self, intensity, seconds, delay=0.0, source="timed"):
+        """Vibrates for seconds after delay seconds, at intensity (None: the current one).
+
+        A pulse from the same source replaces one still pending or running (any thread).
+        """
+        self.event_loop.call_soon_threadsafe(self.start_pulse, source, intensity, seconds, delay)
+
+    def start_pulse(self, source, intensity, seconds, delay):
+        for timer in self.pulses.pop(source, ()):
+            timer.cancel()
+        self.pulses[source] = (self.timers.call_later(delay, self.press, source, intensity),
+                               self.timers.call_later(delay + seconds, self.end_pulse, source))
+
+    def end_pulse(self, source):
+        self.pulses.pop(source, None)
+        self.release(source)
+
+    def run_timed_binding(self, index):
+        """Starts the timed action bound to the key of timed_bindings[index]."""
+        try:
+            intensity, seconds, delay = timed_action(self.timed_bindings[index])
+        except (IndexError, ValueError, TypeError):
+            return  # Rebound since the key went down
+        self.pulse(intensity, seconds, delay, f"timed {index}")
+
+    def schedule_sessions(self):
+        """(Re)schedules every scheduled session's next start (event loop only)."""
+        for timer in self.session_timers:
+            timer.cancel()
+        self.session_timers = []
+        for index, entry in enumerate(self.scheduled_sessions):
+            try:
+                timed_action(entry)
+                when = next_daily(entry.get("at"))
+            except (ValueError, TypeError) as e:
+                log.warning("Scheduled session %d ignored: %s", index, e, extra={"path": self.settings_path})
+                continue
+            self.session_timers.append(self.timers.call_at_wall(when, self.run_session, entry))
+
+    def run_session(self, entry):
+        """Timer callback: starts a scheduled session and schedules it again for the next day."""
+        intensity, seconds, delay = timed_action(entry)
+        log.info("Scheduled session at %s started", entry["at"])
+        self.start_pulse("session", intensity, seconds, delay)
+        self.session_timers.append(self.timers.call_at_wall(next_daily(entry["at"]), self.run_session, entry))
+
+    # Names the plugin API uses (see PluginHost.TriggerSource)
+    plugin_press = press
+    plugin_release = release
+    plugin_set_intensity = set_source_intensity
+
+    def plugin_status(self, source, text):
+        """Shows (or clears, with an empty text) a plugin's status line (any thread)."""
+        if text:
+            self.plugin_statuses[source] = text
+        else:
+            self.plugin_statuses.pop(source, None)
+        self.notify("plugin_status", "\n".join(self.plugin_statuses.values()))
+
+    def set_vibration_intensity(self, intensity):
+        self.vibration_intensity = intensity
+        if self.device:
+            self.notify("status", self.device_status())
+        self.mixer.set_level(intensity)  # Sources following the main intensity are remixed
+
+    def increase_intensity(self, event=None):
+        """Increases the vibration intensity by 0.1, up to a maximum of 1.0."""
+        self.set_vibration_intensity(min(1.0, round(self.vibration_intensity + 0.1, 1)))
+
+    def decrease_intensity(self, event=None):
+        """Decreases the vibration intensity by 0.1, down to a minimum of 0.0."""
+        self.set_vibration_intensity(max(0.0, round(self.vibration_intensity - 0.1, 1)))
+
+    async def vibrate_task(self, intensity):
+        """Sends vibration commands, handling potential errors."""
+        try:
+            if not self.device:  # Early exit if no device
+                # Output plugins (e.g. a relay sender) still see what would have been sent
+                for output in self.plugin_host.outputs:
+                    self.event_loop.create_task(self.run_output(output, None, intensity))
+                return
+
+            if not self.command_plan:
+                self.notify("status", "Device doesn't support vibrate")
+                return
+
+            if await self.send_intensity(self.device_key, self.command_plan, intensity) is None:
+                return  # Device is already at this step
+
+            # Outputs get the intensity before this device's curve (a relay partner applies their own)
+            for output in self.plugin_host.outputs:
+                self.event_loop.create_task(self.run_output(output, self.device.name, intensity))
+
+        except Exception as e:  # Connector and Buttplug errors included
+            self.quantizer.forget()  # Whatever failed, the device step is unknown now
+            self.mixer.forget(self.device_key)
+            log.error("Error during vibration: %s", e, extra={"device": self.device.name if self.device else None})
+            self.notify("status", f"Error: {e}")
+
+    async def send_intensity(self, key, plan, intensity):
+        """Quantizes and sends one intensity to one device, recording it in that device's history.
+
+        Returns the value sent, or None when the device is already at that step or a newer
+        value replaced it while it waited behind the previous one.
+        """
+        kind, actuator, step_count, curve = plan
+        intensity = self.quantizer.quantize((key, kind, actuator.index), apply_curve(curve, intensity), step_count)
+        if intensity is None:
+            return None
+        name = self.command_plans[key][0].name
+
+        async def send():
+            history = self.history_for(key)
+            seq = history.add(time.monotonic(), intensity)
+            try:
+                if kind == "scalar":
+                    await actuator.command(intensity)
+                elif kind == "linear":
+                    await actuator.command(250, intensity)
+                else:
+                    await actuator.command(intensity, True)
+            except Exception:
+                history.ack(seq, ok=False)
+                self.stats.failed(name)
+                raise
+            history.ack(seq)
+            self.stats.sent(name, intensity)
+            return intensity
+
+        # Zero goes in the stop lane, ahead of anything still waiting (see CommandLanes.py)
+        return await self.lanes.run(key, LANE_STOP if intensity == 0 else LANE_ACTUATE, send)
+
+    def plan_for(self, key, device):
+        """Command plan of a device with its compiled response curve, built once per Device object."""
+        cached = self.command_plans.get(key)
+        if cached is None or cached[0] is not device:
+            plan = build_command_plan(device, self.device_cache.layout(key[0], device))
+            if plan is not None:
+                plan += (compile_curve(self.curve_for(device.name), plan[2]),)
+            cached = self.command_plans[key] = (device, plan)
+        return cached[1]
+
+    def curve_for(self, name):
+        """Response curve of a device name; linear unless one was set."""
+        return normalize_curve(self.curves.get(name))
+
+    def set_curve(self, name, curve):
+        """Sets a device's response curve (None resets it) and recompiles its tables (any thread)."""
+        curve = normalize_curve(curve)
+        if curve == DEFAULT_CURVE:
+            self.curves.pop(name, None)
+        else:
+            self.curves[name] = curve
+        # Dropped plans are rebuilt with the new table on their next send
+        self.command_plans = {key: cached for key, cached in self.command_plans.items() if cached[0].name != name}
+        if self.device is not None and self.device.name == name:
+            self.command_plan = self.plan_for(self.device_key, self.device)
+
+    def curve_step_count(self, name):
+        """Step count of the actuator driven on a device name, from the device cache (None if unknown)."""
+        for entry in self.device_cache.devices.values():
+            if entry["name"] == name:
+                for kind, attribute in ACTUATOR_KINDS:
+                    if entry.get(attribute):
+                        return entry[attribute][0]["step_count"]
+        return None
+
+    def known_device_names(self):
+        """Names of every device seen so far or given a curve, for the curve editor."""
+        names = [entry["name"] for entry in self.device_cache.devices.values()] + list(self.curves)
+        return list(dict.fromkeys(names))
+
+    async def run_output(self, output, device_name, intensity):
+        try:
+            await output.send(device_name, intensity)
+        except Exception as e:
+            log.error("Error in output plugin %s: %s", output.name, e)
+
+    def history_for(self, key):
+        """Send history of a device, created on first use."""
+        history = self.histories.get(key)
+        if history is None:
+            history = self.histories[key] = IntensityHistory()
+        return history
+
+    def current_history(self):
+        return self.history_for(self.device_key)
+
+    def start_choreography(self, pattern=None, period=None, offsets=None, rate=None):
+        """Starts driving every connected device from one clock; arguments default to the settings."""
+        from Choreography import Choreographer
+
+        self.stop_choreography()
+        if not self.pool or not self.pool.devices():
+            return False
+        self.stop_all()
+        settings = dict(self.choreography, **{name: value for name, value in
+                                              (("pattern", pattern), ("period", period),
+                                               ("offsets", offsets), ("rate", rate)) if value is not None})
+        self.choreography = settings
+        self.choreographer = Choreographer(self, settings["pattern"], settings["period"],
+                                           settings["offsets"], settings["rate"])
+        self.submit(self.choreographer.run())
+        self.notify("status", f"Choreography: {settings['pattern']} across {len(self.pool.devices())} device(s)")
+        return True
+
+    def stop_choreography(self):
+        """Stops the choreography; its run loop zeroes every device on the way out (any thread)."""
+        if self.choreographer is not None:
+            self.choreographer.stopping = True
+            self.choreographer = None
+            self.notify("status", self.device_status())
+
+    def key_bindings(self):
+        return {"vibration_key": self.vibration_key, "intensity_increase_key": self.intensity_increase_key,
+                "intensity_decrease_key": self.intensity_decrease_key,
+                "timed_keys": [entry.get("key") if isinstance(entry, dict) else None
+                               for entry in self.timed_bindings]}
+
+    def update_keyboard_binding(self):
+        """Applies the key/mouse bindings, re-matching only the keys that changed.
+
+        The hooks themselves stay installed, so no event is missed while rebinding and a key
+        held across the rebind still gets its release. Raises ValueError for an unknown key,
+        leaving the previous bindings active. Switching hook_process moves the hooks.
+        """
+        import HookProcess as hooks
+
+        bindings = self.key_bindings()
+        for name in hooks.BINDINGS:
+            hooks.resolve_binding(name, bindings[name])  # Before anything is replaced
+        if len(self.timed_bindings) > MAX_TIMED_BINDINGS:
+            raise ValueError(f"at most {MAX_TIMED_BINDINGS} timed bindings")
+        for entry, key in zip(self.timed_bindings, bindings["timed_keys"]):
+            timed_action(entry)
+            hooks.resolve_binding("timed_keys", key)
+        with self.binding_lock:
+            if self.hook_process:
+                if self.hook_set is not None:
+                    self.hook_set.unhook_all()
+                    self.hook_set = None
+                if self.hook_runner is None:
+                    self.hook_runner = hooks.HookProcess(self.on_hook_event)
+                    self.hook_runner.start(bindings)
+                else:
+                    self.hook_runner.rebind(bindings)
+                self.hook_latency = self.hook_runner.latency
+                return
+            if self.hook_runner is not None:
+                self.hook_runner.stop()
+                self.hook_runner = None
+            if self.hook_set is None:
+                self.hook_latency = hooks.HookLatency("in process")
+                self.hook_set = hooks.HookSet(self.emit_hook_event)
+            self.hook_set.apply(bindings)
+
+    def emit_hook_event(self, kind, capture):
+        """In-process hook callback, timing how long it holds the keystroke."""
+        self.on_hook_event(kind)
+        done = time.time()
+        self.hook_latency.record(capture, done, done)
+
+    def on_hook_event(self, kind, capture=None):
+        """Handles a key/mouse hook event, from the hook thread or the hook process reader."""
+        from HookProcess import KIND_PRESS, KIND_RELEASE, KIND_INCREASE, KIND_DECREASE, KIND_KEY_DOWN, KIND_TIMED
+
+        if kind == KIND_PRESS:
+            self.hook_key_down = True
+            self.press()
+        elif kind == KIND_RELEASE:
+            self.hook_key_down = False
+            self.release()
+        elif kind == KIND_INCREASE:
+            self.increase_intensity()
+        elif kind == KIND_DECREASE:
+            self.decrease_intensity()
+        elif kind >= KIND_TIMED:
+            self.run_timed_binding(kind - KIND_TIMED)
+        else:
+            self.hook_key_down = kind == KIND_KEY_DOWN
+
+    async def watchdog_task(self):
+        """Stops vibration on a missed key-up or overlong choreography, and stamps the loop heartbeat.
+
+        Overlong presses are stopped by the limit timer press() sets.
+        """
+        released_checks = 0
+        while True:
+            now = time.monotonic()
+            self.loop_heartbeat = now
+            choreographer = self.choreographer
+            if (choreographer is not None and choreographer.started is not None and self.max_vibration_time
+                    and time.perf_counter() - choreographer.started > self.max_vibration_time):
+                self.stop_choreography()
+                self.notify("status", f"Choreography stopped after {self.max_vibration_time:g}s")
+            if self.mixer.has(KEY_SOURCE):
+                if not self.vibration_key_pressed():
+                    # Require two misses in a row so a release racing the poll isn't double-stopped
+                    released_checks += 1
+                    if released_checks >= 2:
+                        self.watchdog_stop("Missed key release, vibration stopped", KEY_SOURCE)
+                else:
+                    released_checks = 0
+            else:
+                released_checks = 0
+            if self.hook_set is not None and self.binding_lock.acquire(blocking=False):
+                try:
+                    self.hook_set.prune()  # Drops the mouse hook once a rebound button is released
+                finally:
+                    self.binding_lock.release()
+            await asyncio.sleep(WATCHDOG_INTERVAL)
+
+    def watchdog_stop(self, reason, source=None):
+        """Forces vibration off: one source's contribution, or every source's."""
+        if not self.vibrating:
+            return
+        if source is None:
+            self.stop_all()
+        else:
+            self.release(source)
+        self.notify("status", reason)
+
+    def vibration_key_pressed(self):
+        """Reads the real state of the vibration key, not the hook library's bookkeeping."""
+        if not self.hooks:
+            return True  # press() is driven by the embedding caller, nothing to check against
+        try:
+            import keyboard
+            import mouse
+
+            # A key rebound while held is still the one that has to be let go
+            key = self.hook_set.vibration_key() if self.hook_set is not None else self.vibration_key
+            if self.win32api is not None:
+                if key in MOUSE_VK_CODES:
+                    vk = MOUSE_VK_CODES[key]
+                else:
+                    scan_code = keyboard.key_to_scan_codes(key)[0]
+                    vk = self.win32api.MapVirtualKey(scan_code, 1)  # MAPVK_VSC_TO_VK
+                return bool(self.win32api.GetAsyncKeyState(vk) & 0x8000)
+            if self.hook_runner is not None:
+                return self.hook_key_down  # Polling here would start a hook listener in this process
+            if key in MOUSE_VK_CODES:
+                return mouse.is_pressed(key)
+            return keyboard.is_pressed(key)
+        except Exception:
+            return True  # Unknown state, never stop on a guess
+
+    def check_loop_heartbeat(self):
+        """Stops vibration from outside the event loop when it stops ticking (own thread)."""
+        while not self.shutting_down:
+            time.sleep(WATCHDOG_INTERVAL)
+            if self.vibrating and time.monotonic() - self.loop_heartbeat > LOOP_STALL_TIMEOUT:
+                # The stalled loop can't send anything: each server is stopped from here (see
+                # emergency_stop). One whose socket is already closing is only stopped by the
+                # mixer's zeroes, which go out once the loop recovers.
+                reached = self.pool.emergency_stop() if self.pool is not None else 0
+                self.stop_all()
+                servers = len(self.pool.clients) if self.pool is not None else 0
+                if reached == servers:
+                    self.notify("status", "Event loop stalled, vibration stopped")
+                else:
+                    self.notify("status", f"Event loop stalled, stopped {reached} of {servers} server(s); "
+                                          "the rest stop once it recovers")
+
+    async def stop_device(self, device):
+        """Stops one device, falling back to zero commands if it has no stop message."""
+        from buttplug.errors import UnsupportedCommandError
+
+        try:
+            await device.stop()
+        except UnsupportedCommandError:
+            for actuator in device.actuators:
+                await actuator.command(0.0)
+            for actuator in device.rotatory_actuators:
+                await actuator.command(0.0, True)
+
+    async def shutdown_task(self, timeout):
+        """Stops every device in parallel, then disconnects, all within timeout seconds."""
+        stopped, total = 0, 0
+        if not self.pool:
+            return stopped, total
+
+        deadline = self.event_loop.time() + timeout
+        devices = list(self.pool.devices().values())
+        total = len(devices)
+        try:
+            # Leave a quarter of the budget for the disconnect handshake
+            results = await asyncio.wait_for(
+                asyncio.gather(*(self.stop_device(d) for d in devices), return_exceptions=True),
+                timeout * 0.75
+            )
+            stopped = sum(1 for result in results if not isinstance(result, BaseException))
+            self.quantizer.forget()
+        except asyncio.TimeoutError:
+            pass
+
+        try:
+            await asyncio.wait_for(self.pool.disconnect_all(), max(0.0, deadline - self.event_loop.time()))
+        except Exception:
+            pass  # Ignore errors and timeouts during close
+        return stopped, total
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """Stops all devices and tears down the event loop thread under a hard deadline.
+
+        The devices are stopped first; plugins and the hook process are stopped after, so
+        their teardown can't delay it. Presses are ignored from the start (see press).
+        """
+        if self.shutting_down:
+            return self.shutdown_report
+        started = time.perf_counter()
+        self.shutting_down = True
+        if self.choreographer is not None:
+            self.choreographer.stopping = True  # shutdown_task stops the devices
+        self.mixer.reset()  # shutdown_task stops every device
+
+        stopped, total = 0, 0
+        if self.event_loop.is_running():
+            future = self.submit(self.shutdown_task(timeout))
+            try:
+                stopped, total = future.result(timeout + 0.1)
+            except (concurrent.futures.TimeoutError, Exception):
+                future.cancel()
+        devices_ms = (time.perf_counter() - started) * 1000
+
+        # Still on a running loop, so plugins can cancel their tasks
+        self.plugin_host.stop_all()
+        if self.hook_runner is not None:
+            self.hook_runner.stop()
+        if self.event_loop.is_running():
+            self.event_loop.call_soon_threadsafe(self.event_loop.stop)
+        # At least a moment to wind down, even if a slow plugin or hook stop used the deadline up
+        self.event_loop_thread.join(max(0.2, timeout + 0.5 - (time.perf_counter() - started)))
+
+        self.stats.save()
+
+        elapsed = (time.perf_counter() - started) * 1000
+        self.shutdown_report = f"Shutdown took {elapsed:.0f} ms, stopped {stopped}/{total} device(s) " \
+                               f"in {devices_ms:.0f} ms"
+        if self.event_loop_thread.is_alive():
+            self.shutdown_report += ", event loop thread still running"
+        log.info(self.shutdown_report)
+        return self.shutdown_report
+
+    def diagnostics_report(self):
+        """Text shown in the diagnostics window."""
+        reports = [self.loop_monitor.report(), self.quantizer.report(), self.lanes.report(), self.poller.report(),
+                   self.keepalive.report(), self.timers.report(), self.mixer.report(),
+                   self.plugin_host.report(), self.logs.report()]
+        if self.pool is not None:
+            reports.append(self.pool.report())
+        if self.choreographer is not None:
+            reports.append(self.choreographer.report())
+        if self.hook_runner is not None:
+            reports.append(self.hook_runner.report())
+        elif self.hook_latency is not None:
+            reports.append(self.hook_latency.report())
+        return "\n".join(reports)
+
+    def read_settings(self):
+        """The settings file merged over the defaults; raises ValueError if it isn't valid."""
+        try:
+            with open(self.settings_path, "r") as f:
+                bindings = json.load(f)
+        except FileNotFoundError:
+            bindings = {}  # Use default values if file not found
+        if not isinstance(bindings, dict):
+            raise ValueError("settings must be a JSON object")
+        settings = dict(DEFAULT_SETTINGS, **bindings)
+        settings["choreography"] = dict(DEFAULT_SETTINGS["choreography"], **settings["choreography"])
+        settings["mixer"] = dict(DEFAULT_SETTINGS["mixer"], **settings["mixer"])
+        settings["curves"] = {name: normalize_curve(curve) for name, curve in settings["curves"].items()}
+        return settings
+
+    def load_keybindings(self):
+        """Loads keybindings and settings from the JSON settings file."""
+        self.settings_signature = self.settings_file_signature()
+        self.file_settings = self.read_settings()  # As last read or written, for reload_settings
+        for name, value in copy.deepcopy(self.file_settings).items():
+            setattr(self, SETTING_ATTRIBUTES.get(name, name), value)
+
+    def settings_dict(self):
+        """The live settings, as saved to the settings file."""
+        return {name: getattr(self, SETTING_ATTRIBUTES.get(name, name)) for name in DEFAULT_SETTINGS}
+
+    def save_keybindings(self):
+        """Saves keybindings and settings to the JSON settings file."""
+        settings = copy.deepcopy(self.settings_dict())
+        temporary = self.settings_path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(settings, f)
+        os.replace(temporary, self.settings_path)  # The watcher never sees a half-written file
+        self.file_settings = settings
+        self.settings_signature = self.settings_file_signature()  # Our own write, not an edit to reload
+
+    def settings_file_signature(self):
+        """(mtime, inode, size) of the settings file, or None while it doesn't exist."""
+        try:
+            stat = os.stat(self.settings_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+    async def watch_settings_task(self):
+        """Reloads the settings file whenever it changes on disk.
+
+        A stat per second costs nothing measurable, works on every platform and catches
+        editors that save by replacing the file (new inode) as well as in place.
+        """
+        while not self.shutting_down:
+            await asyncio.sleep(SETTINGS_POLL_INTERVAL)
+            signature = self.settings_file_signature()
+            if signature is None or signature == self.settings_signature:
+                continue  # Unchanged, or deleted: keep the live settings
+            self.settings_signature = signature
+            # Off the loop: rebinding and loading plugins must not hold up sends
+            await self.event_loop.run_in_executor(None, self.reload_settings)
+
+    def reload_settings(self):
+        """Applies the settings edited in the file since it was last read, and nothing else.
+
+        A setting counts as changed when the file's value differs both from what the file
+        said before (so intensity changed with the keys isn't reset by an unrelated edit)
+        and from the live value. Only the bindings, curves and plugins that changed are
+        touched, so keys held and sends in flight carry on. An invalid file is logged and
+        ignored. Returns the names of the settings that changed (any thread).
+        """
+        try:
+            settings = self.read_settings()
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            log.warning("Settings file not reloaded: %s", e, extra={"path": self.settings_path})
+            return []
+        live = self.settings_dict()
+        edited, self.file_settings = self.file_settings, settings
+        changed = [name for name in DEFAULT_SETTINGS if settings[name] != edited[name] and settings[name] != live[name]]
+        settings = copy.deepcopy(settings)  # The live settings must not share objects with file_settings
+        if not changed:
+            return changed
+
+        bindings = [name for name in changed if name in ("vibration_key", "intensity_increase_key",
+                                                          "intensity_decrease_key", "hook_process", "timed_bindings")]
+        for name in bindings:
+            setattr(self, name, settings[name])
+        if bindings and self.hooks:
+            try:
+                self.update_keyboard_binding()
+            except ValueError as e:
+                for name in bindings:
+                    setattr(self, name, live[name])
+                changed = [name for name in changed if name not in bindings]
+                log.warning("Key bindings not reloaded: %s", e, extra={"path": self.settings_path})
+
+        if "vibration_intensity" in changed:
+            self.set_vibration_intensity(settings["vibration_intensity"])  # Re-sent if vibrating
+        for name in ("max_vibration_time", "server_urls", "choreography", "batch_window_ms", "auto_connect",
+                     "keepalive_interval"):
+            if name in changed:
+                setattr(self, name, settings[name])  # Read when next used (servers and batching: next connect)
+        if "mixer" in changed:
+            if self.configure_mixer(settings["mixer"]):
+                self.mixer_settings = settings["mixer"]
+            else:
+                changed.remove("mixer")
+        if "scheduled_sessions" in changed:
+            self.scheduled_sessions = settings["scheduled_sessions"]
+            self.event_loop.call_soon_threadsafe(self.schedule_sessions)
+
+        if "plugins" in changed or "plugin_config" in changed:
+            for name in list(self.plugin_host.loaded):
+                if live["plugin_config"].get(name) != settings["plugin_config"].get(name):
+                    self.plugin_host.unload(name)  # Restarted below with its new config
+            self.enabled_plugins = settings["plugins"]
+            self.plugin_config = settings["plugin_config"]
+            self.plugin_host.apply(self.enabled_plugins, self.plugin_config)
+
+        if "curves" in changed:
+            previous = dict(live["curves"])
+            for name in set(previous) | set(settings["curves"]):
+                if previous.get(name) != settings["curves"].get(name):
+                    self.set_curve(name, settings["curves"].get(name))  # Recompiles that device only
+
+        if changed:
+            log.info("Settings reloaded: %s", ", ".join(changed), extra={"changed": changed})
+            self.notify("settings", changed)
+            self.notify("status", f"Settings reloaded: {', '.join(changed)}")
+        return changed
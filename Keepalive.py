@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+# Application-level keepalive for the Intiface connections. Intiface asks for no pings by
+# default, so an idle websocket can go stale (a sleeping network adapter, a NAT or proxy
+# dropping the flow, a server restarted underneath) and nothing notices until the next key
+# press, which then hangs or pays for a reconnect. Every KEEPALIVE_INTERVAL a Buttplug Ping
+# goes to each connected server; it never touches a device, keeps the link warm and
+# measures its round trip. A ping that fails or isn't answered within KEEPALIVE_TIMEOUT
+# marks that server lost and only its client is reconnected, retrying with back-off; the
+# other servers' devices keep running.
+
+KEEPALIVE_INTERVAL = 10.0  # Seconds between pings ("keepalive_interval" in keybindings.json, 0 turns it off)
+KEEPALIVE_TIMEOUT = 3.0  # Seconds a ping may take before the link counts as dead
+RECONNECT_MAX_INTERVAL = 60.0  # Longest wait between reconnect attempts
+KEEPALIVE_TICK = 1.0  # Seconds between keepalive checks
+
+log = logging.getLogger("intiface.keepalive")
+
+
+class Keepalive:
+    """Pings the core's connected servers and reconnects the ones that stop answering."""
+
+    def __init__(self, core, timeout=KEEPALIVE_TIMEOUT, tick=KEEPALIVE_TICK):
+        self.core = core
+        self.timeout = timeout
+        self.tick = tick
+        self.due = 0.0  # Monotonic time of the next round of pings
+        self.pool = None  # The pool the state below belongs to
+        self.lost = {}  # url -> [monotonic time of the next attempt, back-off interval, attempt task]
+        self.rtts = deque(maxlen=100)  # Recent ping round trips, seconds
+        self.pings = 0
+        self.failures = 0
+        self.reconnects = 0
+
+    async def run(self):
+        while not self.core.shutting_down:
+            await asyncio.sleep(self.tick)
+            interval = self.core.keepalive_interval
+            pool = self.core.pool
+            if pool is not self.pool:
+                self.pool = pool  # Reconnected as a whole (Connect): nothing of the old pool is pending
+                self.lost = {}
+            if not interval or pool is None:
+                continue
+            now = time.monotonic()
+            for url in list(self.lost):
+                self.recover(pool, url, now)
+            if now >= self.due:
+                self.due = now + interval
+                await self.ping_all(pool)
+
+    async def ping_all(self, pool):
+        clients = [(url, client) for url, client in pool.clients.items() if url not in self.lost]
+        results = await asyncio.gather(*(self.ping(client) for url, client in clients), return_exceptions=True)
+        for (url, client), result in zip(clients, results):
+            if not isinstance(result, Exception) or pool is not self.core.pool or pool.clients.get(url) is not client:
+                continue
+            self.failures += 1
+            log.warning("Connection to %s lost (%s), reconnecting", url, str(result) or type(result).__name__,
+                        extra={"url": url})
+            self.core.notify("status", f"Connection to {url} lost, reconnecting...")
+            self.lost[url] = [time.monotonic(), self.core.keepalive_interval, None]
+            self.recover(pool, url, time.monotonic())
+
+    async def ping(self, client):
+        from buttplug.messages import v3
+
+        message = v3.Ping()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(client.send(message), self.timeout)
+        finally:
+            client._tasks.pop(message.id, None)  # Unanswered, it would wait in the client forever
+        self.pings += 1
+        self.rtts.append(time.perf_counter() - started)
+
+    def recover(self, pool, url, now):
+        """Starts the next reconnect attempt for a lost server once its back-off has passed."""
+        state = self.lost[url]
+        retry_at, interval, attempt = state
+        if attempt is not None and not attempt.done():
+            return  # Still connecting
+        if attempt is not None and not attempt.cancelled() and attempt.exception() is None and attempt.result():
+            del self.lost[url]
+            log.info("Reconnected to %s", url, extra={"url": url})
+            self.core.notify("status", self.core.device_status() if self.core.device else f"Reconnected to {url}")
+            return
+        if now >= retry_at:
+            self.reconnects += 1
+            state[0] = now + interval
+            state[1] = min(interval * 2, RECONNECT_MAX_INTERVAL)
+            state[2] = asyncio.ensure_future(self.core.reconnect_server(url))
+
+    def report(self):
+        interval = self.core.keepalive_interval
+        if not interval:
+            return "Keepalive: off\n"
+        line = f"Keepalive: ping every {interval:g} s, {self.pings} answered, {self.failures} failed, " \
+               f"{self.reconnects} reconnects"
+        if self.rtts:
+            ordered = sorted(self.rtts)
+            line += f"\n  round trip {ordered[len(ordered) // 2] * 1000:.2f} ms p50, {ordered[-1] * 1000:.2f} ms max"
+        for url in self.lost:
+            line += f"\n  {url}: connection lost, reconnecting"
+        return line + "\n"
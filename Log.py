@@ -0,0 +1,167 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from collections import deque
+
+# Logging that never blocks the caller. Loggers under "intiface" hand their records to a
+# bounded queue and return; formatting and file writes happen on the QueueListener's
+# thread. Log files are JSON lines, one record per line with any extra={} fields, rotated
+# at LOG_MAX_BYTES. The last RECENT_SIZE records are also kept as text in memory for the
+# log window. A message repeated over and over (a device failing on every send) is let
+# through REPEAT_LIMIT times per REPEAT_WINDOW and counted after that.
+#
+#   log = logging.getLogger("intiface.core")
+#   log.warning("Vibration failed: %s", e, extra={"device": name})  # %-args: formatted later
+
+LOG_FILE = "intiface.log"
+LOG_MAX_BYTES = 1_000_000  # Size at which the log file is rotated
+LOG_BACKUPS = 3  # Rotated files kept (intiface.log.1 ...)
+QUEUE_SIZE = 10000  # Records waiting for the writer thread; records past this are dropped and counted
+RECENT_SIZE = 500  # Records kept in memory for the log window
+REPEAT_WINDOW = 10.0  # Seconds over which identical records are counted
+REPEAT_LIMIT = 3  # Identical records let through per window
+
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "repeated"}
+
+
+class RepeatFilter(logging.Filter):
+    """Drops identical records past REPEAT_LIMIT per window; the next one let through says how many."""
+
+    def __init__(self, window=REPEAT_WINDOW, limit=REPEAT_LIMIT):
+        super().__init__()
+        self.window = window
+        self.limit = limit
+        self.seen = {}  # (logger, level, template, args) -> [window start, count]
+        self.suppressed = 0
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.msg, str(record.args))
+        entry = self.seen.get(key)
+        if entry is None or record.created - entry[0] >= self.window:
+            if entry is not None and entry[1] > self.limit:
+                record.repeated = entry[1] - self.limit
+            if len(self.seen) > 1000:
+                # Forget finished windows so varying messages can't grow this forever
+                self.seen = {k: v for k, v in self.seen.items() if record.created - v[0] < self.window}
+            self.seen[key] = [record.created, 1]
+            return True
+        entry[1] += 1
+        if entry[1] <= self.limit:
+            return True
+        self.suppressed += 1
+        return False
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records untouched (no formatting on the caller's thread) and drops them when full."""
+
+    def __init__(self, size=QUEUE_SIZE):
+        super().__init__(queue.Queue(size))
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record  # Same process: the writer thread formats it
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        if getattr(record, "repeated", 0):
+            text += f" (and {record.repeated} more like it)"
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with any extra={} fields alongside the standard ones."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_FIELDS)
+        if getattr(record, "repeated", 0):
+            entry["repeated"] = record.repeated
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RecentHandler(logging.Handler):
+    """Keeps the last records as text for the log window (written from the writer thread)."""
+
+    def __init__(self, size=RECENT_SIZE):
+        super().__init__()
+        self.lines = deque(maxlen=size)
+        self.setFormatter(TextFormatter(TEXT_FORMAT, "%H:%M:%S"))
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+class LogService:
+    """The "intiface" logger's queue, writer thread and in-memory history."""
+
+    def __init__(self, path=LOG_FILE, level=logging.INFO):
+        self.path = path
+        self.repeats = RepeatFilter()
+        self.handler = BoundedQueueHandler()
+        self.handler.addFilter(self.repeats)
+        self.recent = RecentHandler()
+        console = logging.StreamHandler(sys.stderr)
+        console.setFormatter(TextFormatter(TEXT_FORMAT))
+        handlers = [self.recent, console]
+        self.file_error = None
+        try:
+            writer = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                                                          encoding="utf-8", delay=True)
+            writer.setFormatter(JsonFormatter())
+            handlers.append(writer)
+        except OSError as e:
+            self.file_error = str(e)  # Read-only folder: memory and console only
+        self.listener = logging.handlers.QueueListener(self.handler.queue, *handlers, respect_handler_level=True)
+
+        self.logger = logging.getLogger("intiface")
+        self.logger.setLevel(level)
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Writes out what is queued and stops the writer thread."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def recent_lines(self):
+        return list(self.recent.lines)
+
+    def report(self):
+        text = (f"Log: {self.path}, {self.repeats.suppressed} repeats suppressed, "
+                f"{self.handler.dropped} dropped (queue full)\n")
+        if self.file_error:
+            text += f"  not writing to disk: {self.file_error}\n"
+        return text
+
+
+_service = None
+
+
+def start_logging(path=LOG_FILE):
+    """Starts the log writer once per process and returns the LogService."""
+    global _service
+    if _service is None:
+        _service = LogService(path)
+    return _service
@@ -0,0 +1,225 @@
+import logging
+import threading
+
+# Several things can ask for vibration at once: the held key, the GUI button, plugins
+# (gamepad, file trigger, relay), timed keys and scheduled sessions. Each source's
+# request is kept as a contribution to one device, and a device's output is its
+# contributions mixed by the policy:
+#
+#   max       the strongest contribution (default)
+#   sum       every contribution added, clamped to 1
+#   priority  only the highest-priority sources; the strongest of those
+#   duck      the highest-priority sources at full strength, plus the strongest
+#             lower-priority one scaled down by "duck"
+#
+# Changes are only marked; once per event loop iteration (or every tick_ms) each changed
+# device gets one output, and only if its mixed value differs from the last one sent.
+#
+#   "mixer": {"policy": "duck", "duck": 0.25, "priorities": {"key": 10, "relay": 5}, "tick_ms": 0}
+#
+# Priorities are looked up by source name, then by its first word ("timed 0" -> "timed");
+# unlisted sources have priority 0. A contribution of None follows the main intensity.
+# Device key None stands for "no device": its mix only goes to the output plugins.
+
+POLICIES = ("max", "sum", "priority", "duck")
+KEY_SOURCE = "key"  # The key/mouse hooks
+DEFAULT_PRIORITIES = {KEY_SOURCE: 10, "button": 10, "timed": 5, "session": 1}
+
+log = logging.getLogger("intiface.mixer")
+
+
+class IntensityMixer:
+    """Per-device contributions from every active source, mixed into one output per tick.
+
+    Contributions change from any thread; send(device key, value) is called on the loop.
+    on_active(active) is called when the first source starts or the last one stops.
+    """
+
+    def __init__(self, loop, send, on_active=None, level=1.0):
+        self.loop = loop
+        self.send = send
+        self.on_active = on_active
+        self.lock = threading.RLock()
+        self.contributions = {}  # device key -> {source: intensity, or None for the main intensity}
+        self.outputs = {}  # device key -> mixed value last sent (absent: 0)
+        self.dirty = set()  # Device keys to mix on the next tick
+        self.armed = False  # A tick is scheduled
+        self.active = False
+        self.level = level  # The main intensity
+        self.policy = "max"
+        self.priorities = dict(DEFAULT_PRIORITIES)
+        self.duck = 0.25
+        self.tick = 0.0  # Seconds to wait for more changes, 0 for the same loop iteration
+        self.changes = 0
+        self.ticks = 0
+        self.emitted = 0
+        self.unchanged = 0  # Devices whose mix came out the same as the last output
+
+    def configure(self, policy="max", priorities=None, duck=0.25, tick_ms=0):
+        """Applies the "mixer" settings; ValueError if they aren't valid."""
+        if policy not in POLICIES:
+            raise ValueError(f"mixer policy must be one of {', '.join(POLICIES)}: {policy!r}")
+        if not 0 <= duck <= 1 or tick_ms < 0:
+            raise ValueError("mixer duck must be between 0 and 1 and tick_ms at least 0")
+        with self.lock:
+            self.policy = policy
+            self.priorities = dict(DEFAULT_PRIORITIES, **(priorities or {}))
+            self.duck = duck
+            self.tick = tick_ms / 1000
+            self.touch(self.contributions)
+
+    def priority(self, source):
+        priority = self.priorities.get(source)
+        if priority is None:
+            priority = self.priorities.get(str(source).split(" ", 1)[0], 0)
+        return priority
+
+    def set(self, key, source, intensity=None):
+        """Sets source's contribution to a device; None follows the main intensity."""
+        with self.lock:
+            contributions = self.contributions.setdefault(key, {})
+            if source in contributions and contributions[source] == intensity:
+                return
+            contributions[source] = intensity
+            self.changes += 1
+            self.touch((key,))
+            self.update_active()
+
+    def remove(self, source, key=None):
+        """Drops source's contribution to one device, or to every device."""
+        with self.lock:
+            for device in [key] if key is not None else list(self.contributions):
+                contributions = self.contributions.get(device)
+                if contributions and source in contributions:
+                    del contributions[source]
+                    if not contributions:
+                        del self.contributions[device]
+                    self.changes += 1
+                    self.touch((device,))
+            self.update_active()
+
+    def clear(self):
+        """Drops every contribution; the devices are sent 0 on the next tick."""
+        with self.lock:
+            self.touch(self.contributions)
+            self.contributions = {}
+            self.update_active()
+
+    def clear_device(self, key):
+        """Drops every contribution to one device; it is sent 0 on the next tick."""
+        with self.lock:
+            if self.contributions.pop(key, None):
+                self.touch((key,))
+            self.update_active()
+
+    def reset(self):
+        """Drops every contribution and output without sending anything (the devices are gone)."""
+        with self.lock:
+            self.contributions, self.outputs = {}, {}
+            self.dirty.clear()
+            self.update_active()
+
+    def drop_device(self, key):
+        """Forgets a device that disconnected."""
+        with self.lock:
+            self.contributions.pop(key, None)
+            self.outputs.pop(key, None)
+            self.dirty.discard(key)
+            self.update_active()
+
+    def drop_server(self, url):
+        """Forgets every device of a server that is reconnecting (device keys are (url, index))."""
+        with self.lock:
+            for key in {key for key in list(self.contributions) + list(self.outputs) if key is not None and key[0] == url}:
+                self.drop_device(key)
+
+    def forget(self, key):
+        """The device's state is unknown (a send failed): its next mix is sent even if unchanged."""
+        with self.lock:
+            self.outputs[key] = None
+
+    def set_level(self, level):
+        """Changes the main intensity, remixing the devices with a contribution that follows it."""
+        with self.lock:
+            self.level = level
+            self.touch([key for key, contributions in self.contributions.items() if None in contributions.values()])
+
+    def has(self, source):
+        with self.lock:
+            return any(source in contributions for contributions in self.contributions.values())
+
+    def sources(self, key):
+        with self.lock:
+            return dict(self.contributions.get(key, {}))
+
+    def update_active(self):
+        active = bool(self.contributions)
+        if active != self.active:
+            self.active = active
+            if self.on_active is not None:
+                self.on_active(active)  # Under the lock, so transitions are reported in order
+
+    def touch(self, keys):
+        self.dirty.update(keys)
+        if self.dirty and not self.armed:
+            self.armed = True
+            self.loop.call_soon_threadsafe(self.arm)
+
+    def arm(self):
+        if self.tick:
+            self.loop.call_later(self.tick, self.flush)
+        else:
+            self.flush()  # Already a loop iteration after the first change
+
+    def mix(self, key):
+        """The device's output under the current policy."""
+        levels = [(self.priority(source), self.level if intensity is None else intensity)
+                  for source, intensity in self.contributions.get(key, {}).items()]
+        if not levels:
+            return 0.0
+        if self.policy == "max":
+            return max(level for priority, level in levels)
+        if self.policy == "sum":
+            return min(1.0, sum(level for priority, level in levels))
+        top = max(priority for priority, level in levels)
+        foreground = max(level for priority, level in levels if priority == top)
+        if self.policy == "priority":
+            return foreground
+        background = max((level for priority, level in levels if priority < top), default=0.0)
+        return min(1.0, foreground + background * self.duck)
+
+    def flush(self):
+        """One tick: mixes every changed device and sends the ones whose value changed (event loop)."""
+        sends = []
+        with self.lock:
+            self.armed = False
+            dirty, self.dirty = self.dirty, set()
+            self.ticks += 1
+            for key in dirty:
+                value = self.mix(key)
+                if value == self.outputs.get(key, 0.0):
+                    self.unchanged += 1
+                    continue
+                if value:
+                    self.outputs[key] = value
+                else:
+                    self.outputs.pop(key, None)
+                sends.append((key, value))
+        self.emitted += len(sends)
+        for key, value in sends:
+            try:
+                self.send(key, value)
+            except Exception as e:
+                log.exception("Error sending the mix for %s: %s", key, e)
+
+    def report(self):
+        with self.lock:
+            lines = [f"Mixer: {self.policy}" + (f" (duck {self.duck:g})" if self.policy == "duck" else "")
+                     + f", {self.changes} changes, {self.ticks} ticks, {self.emitted} outputs, "
+                       f"{self.unchanged} unchanged mixes not sent"]
+            for key, contributions in sorted(self.contributions.items(), key=lambda item: str(item[0])):
+                sources = ", ".join(f"{source} {'main' if level is None else f'{level:.2f}'}"
+                                    for source, level in contributions.items())
+                device = "no device (outputs only)" if key is None else f"{key[0]} device {key[1]}"
+                lines.append(f"  {device}: {self.mix(key):.2f} from {sources}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import threading
+import time
+
+import websockets
+
+# Minimal Buttplug v3 server for benchmarks and tests, standing in for Intiface Desktop.
+# It answers the handshake, lists fake vibrators and acknowledges every device command,
+# optionally after a simulated round-trip latency (one value, or one per device). A command
+# is recorded with a time.perf_counter() timestamp halfway through that latency, when a real
+# device would apply it, so callers in the same process can time end to end. With serial,
+# each device handles one message at a time, like a Bluetooth link, so a sensor read
+# holds up the commands behind it.
+
+
+def fake_device(index, step_count=20, actuators=1):
+    return {
+        "DeviceName": f"Mock Vibrator {index}",
+        "DeviceIndex": index,
+        "DeviceMessages": {
+            "ScalarCmd": [
+                {"FeatureDescriptor": f"Motor {i}", "StepCount": step_count, "ActuatorType": "Vibrate"}
+                for i in range(actuators)
+            ],
+            "StopDeviceCmd": {},
+            "SensorReadCmd": [
+                {"FeatureDescriptor": "Battery Level", "SensorType": "Battery", "SensorRange": [[0, 100]]}
+            ],
+        },
+    }
+
+
+class MockServer:
+    def __init__(self, port=12345, devices=1, step_count=20, actuators=1, latency=0.0, serial=False):
+        self.port = port
+        self.devices = [fake_device(i, step_count, actuators) for i in range(devices)]
+        self.latency = latency  # Round trip seconds per command, or a list with one per device
+        self.serial = serial
+        self.links = {}  # device index -> asyncio.Lock, when serial
+        self.commands = []  # (perf_counter, message name, body)
+        self.frames = 0  # Websocket frames received
+        self.messages = 0  # Buttplug messages received (a frame may carry several)
+        self.command_event = threading.Event()  # Set on every device command
+        self.loop = None
+        self.thread = None
+        self.server = None
+
+    async def reply(self, name, body):
+        message_id = body["Id"]
+        if name == "RequestServerInfo":
+            return {"ServerInfo": {"Id": message_id, "ServerName": "Mock Intiface", "MessageVersion": 3,
+                                   "MaxPingTime": 0}}
+        if name == "RequestDeviceList":
+            return {"DeviceList": {"Id": message_id, "Devices": self.devices}}
+        if name in ("ScalarCmd", "LinearCmd", "RotateCmd", "StopDeviceCmd", "StopAllDevices", "SensorReadCmd"):
+            if self.serial:
+                link = self.links.setdefault(body.get("DeviceIndex", 0), asyncio.Lock())
+                async with link:
+                    return await self.device_reply(name, body)
+            return await self.device_reply(name, body)
+        return {"Ok": {"Id": message_id}}
+
+    async def device_reply(self, name, body):
+        """Answers a device message after the simulated latency."""
+        message_id = body["Id"]
+        latency = self.latency
+        if isinstance(latency, (list, tuple)):
+            latency = latency[body.get("DeviceIndex", 0) % len(latency)]
+        if latency:
+            await asyncio.sleep(latency / 2)  # On its way to the device
+        self.commands.append((time.perf_counter(), name, body))
+        self.command_event.set()
+        if latency:
+            await asyncio.sleep(latency / 2)  # Acknowledgement on its way back
+        if name == "SensorReadCmd":
+            return {"SensorReading": {"Id": message_id, "DeviceIndex": body["DeviceIndex"],
+                                      "SensorIndex": body["SensorIndex"], "SensorType": "Battery",
+                                      "Data": [87]}}
+        return {"Ok": {"Id": message_id}}
+
+    async def answer(self, connection, frame):
+        messages = [next(iter(message.items())) for message in json.loads(frame)]
+        self.messages += len(messages)
+        # Answer a batched frame with one batched reply, like Intiface does
+        replies = await asyncio.gather(*(self.reply(name, body) for name, body in messages))
+        try:
+            await connection.send(json.dumps(replies))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def handle(self, connection):
+        tasks = set()
+        async for frame in connection:
+            self.frames += 1
+            # Frames are answered concurrently so a slow command doesn't hold up the next one
+            task = asyncio.ensure_future(self.answer(connection, frame))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    async def serve(self):
+        self.server = await websockets.serve(self.handle, "localhost", self.port)
+        return self.server
+
+    def start(self):
+        """Runs the server on its own thread and loop; returns once it is listening."""
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.loop.run_until_complete(self.serve())
+            ready.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        ready.wait()
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()  # Closes the connections and lets their handlers finish
+
+    def stop(self, timeout=5.0):
+        """Closes the server, then stops its loop and thread (any other thread)."""
+        if self.loop is not None:
+            future = asyncio.run_coroutine_threadsafe(self.close(), self.loop)
+            try:
+                future.result(timeout)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+
+    def wait_for_command(self, since, timeout=2.0):
+        """perf_counter time of the first device command recorded after `since`, or None."""
+        deadline = time.perf_counter() + timeout
+        while True:
+            matches = [t for t, name, body in self.commands[-50:] if t >= since and name != "SensorReadCmd"]
+            if matches:
+                return min(matches)
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            self.command_event.clear()
+            self.command_event.wait(min(remaining, 0.01))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Buttplug server")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--step-count", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="round trip seconds for each command")
+    parser.add_argument("--serial", action="store_true", help="one message at a time per device, like Bluetooth")
+    args = parser.parse_args()
+    server = MockServer(args.port, args.devices, args.step_count, latency=args.latency, serial=args.serial)
+
+    async def run():
+        await server.serve()
+        print(f"Mock Buttplug server on ws://localhost:{args.port}")
+        await asyncio.Future()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import importlib.util
+import logging
+import os
+import sys
+import time
+from importlib.metadata import entry_points
+
+# Third-party plugins register a module under this entry point group, e.g. in pyproject.toml:
+#   [project.entry-points."intiface_vibes.plugins"]
+#   my_plugin = "my_package.my_plugin"
+ENTRY_POINT_GROUP = "intiface_vibes.plugins"
+
+log = logging.getLogger("intiface.plugins")
+
+
+def default_plugin_dir():
+    """The plugins folder next to the script, or next to the exe when built with pyinstaller."""
+    if getattr(sys, "frozen", False):
+        base = os.path.dirname(sys.executable)
+    else:
+        base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base, "plugins")
+
+
+class TriggerSource:
+    """Base class for plugins that ask for vibration (hooks, files, sockets, audio, ...).
+
+    Call self.app.plugin_press / plugin_release / plugin_set_intensity (and
+    increase_intensity / decrease_intensity, plugin_status) from any thread.
+    """
+
+    def __init__(self, app, config):
+        self.app = app
+        self.config = config
+
+    @property
+    def name(self):
+        return type(self).__name__
+
+    def start(self):
+        """Begins listening. Must not block; start a thread or a task on app.event_loop."""
+
+    def stop(self):
+        """Stops listening and releases anything held."""
+
+    def report(self):
+        """Optional one-line status for the diagnostics window."""
+        return ""
+
+
+class OutputAction:
+    """Base class for plugins that receive every intensity actually sent to a device."""
+
+    def __init__(self, app, config):
+        self.app = app
+        self.config = config
+
+    @property
+    def name(self):
+        return type(self).__name__
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def report(self):
+        return ""
+
+    async def send(self, device_name, intensity):
+        """Runs on the event loop as its own task, so it can't delay the device command.
+
+        device_name is None when no device is connected.
+        """
+
+
+class PluginHost:
+    """Discovers plugins without importing them and loads only the enabled ones.
+
+    A plugin is a module with a create(app, config) function returning a list of
+    TriggerSource and OutputAction instances.
+    """
+
+    def __init__(self, app, plugin_dir=None):
+        self.app = app
+        self.plugin_dir = plugin_dir or default_plugin_dir()
+        self.available = {}  # name -> entry point or file path, nothing imported yet
+        self.loaded = {}  # name -> list of TriggerSource / OutputAction instances
+        self.load_times = {}  # name -> milliseconds spent importing and creating
+        self.errors = {}  # name -> error text
+        self.outputs = []  # OutputActions of every loaded plugin, read on the send path
+
+    def discover(self):
+        """Lists installed plugins from entry points and the plugins folder."""
+        self.available = {}
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            self.available[entry_point.name] = entry_point
+        if os.path.isdir(self.plugin_dir):
+            for filename in sorted(os.listdir(self.plugin_dir)):
+                path = os.path.join(self.plugin_dir, filename)
+                if filename.startswith("_"):
+                    continue
+                if filename.endswith(".py"):
+                    self.available.setdefault(filename[:-3], path)
+                elif os.path.isfile(os.path.join(path, "__init__.py")):
+                    self.available.setdefault(filename, os.path.join(path, "__init__.py"))
+        return sorted(self.available)
+
+    def import_plugin(self, name):
+        source = self.available[name]
+        if isinstance(source, str):
+            module_name = f"intiface_plugins.{name}"
+            spec = importlib.util.spec_from_file_location(module_name, source)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+            return module
+        return source.load()
+
+    def load(self, name, config):
+        """Imports, creates and starts one plugin, timing the whole thing."""
+        if name in self.loaded:
+            return True
+        if name not in self.available:
+            self.errors[name] = "Not installed"
+            return False
+
+        started = time.perf_counter()
+        running = []  # Parts already started, stopped again if a later one fails
+        try:
+            module = self.import_plugin(name)
+            parts = list(module.create(self.app, config))
+            for part in parts:
+                part.start()
+                running.append(part)
+        except Exception as e:
+            self.errors[name] = f"{type(e).__name__}: {e}"
+            log.error("Could not load plugin %s: %s", name, e, extra={"plugin": name})
+            for part in reversed(running):
+                try:
+                    part.stop()
+                except Exception as e:
+                    log.error("Error stopping plugin %s: %s", name, e, extra={"plugin": name})
+            return False
+        self.load_times[name] = (time.perf_counter() - started) * 1000
+        self.errors.pop(name, None)
+        self.loaded[name] = parts
+        self.outputs = [part for parts in self.loaded.values() for part in parts if isinstance(part, OutputAction)]
+        return True
+
+    def unload(self, name):
+        for part in self.loaded.pop(name, []):
+            try:
+                part.stop()
+            except Exception as e:
+                log.error("Error stopping plugin %s: %s", name, e, extra={"plugin": name})
+        self.outputs = [part for parts in self.loaded.values() for part in parts if isinstance(part, OutputAction)]
+
+    def apply(self, enabled, configs):
+        """Brings the loaded set in line with the enabled list; disabled plugins are never imported."""
+        if enabled and not self.available:
+            self.discover()
+        for name in list(self.loaded):
+            if name not in enabled:
+                self.unload(name)
+        for name in enabled:
+            self.load(name, configs.get(name, {}))
+
+    def stop_all(self):
+        for name in list(self.loaded):
+            self.unload(name)
+
+    def report(self):
+        lines = [f"Plugins: {len(self.loaded)} loaded of {len(self.available)} installed"]
+        for name, ms in sorted(self.load_times.items(), key=lambda item: item[1], reverse=True):
+            if name in self.loaded:
+                lines.append(f"  {name}: loaded in {ms:.1f} ms")
+        for name, error in self.errors.items():
+            lines.append(f"  {name}: {error}")
+        for parts in self.loaded.values():
+            lines.extend(f"  {part.report()}" for part in parts if part.report())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+
+import websockets
+
+# Stand-in relay for remote partner control: every message a client sends is forwarded
+# to the other clients connected to the same path ("room"), e.g. ws://localhost:8765/myroom.
+# Run it with: python RelayServer.py --port 8765
+
+rooms = {}  # path -> set of connections
+
+
+async def relay(connection):
+    # websockets >= 13 exposes the path on the request, older versions on the connection
+    path = getattr(connection, "path", None) or connection.request.path
+    peers = rooms.setdefault(path, set())
+    peers.add(connection)
+    try:
+        async for message in connection:
+            for peer in list(peers):
+                if peer is not connection:
+                    try:
+                        await peer.send(message)
+                    except websockets.ConnectionClosed:
+                        pass  # Removed by its own handler
+    finally:
+        peers.discard(connection)
+        if not peers:
+            rooms.pop(path, None)
+
+
+async def serve(host, port):
+    async with websockets.serve(relay, host, port):
+        print(f"Relay listening on ws://{host}:{port}/<room>")
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local relay for remote partner control")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
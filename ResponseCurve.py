@@ -0,0 +1,73 @@
+import math
+from array import array
+
+# Per-device response curves. The same nominal intensity feels very different from toy
+# to toy, so each device name can get its own curve in keybindings.json:
+#
+# "curves": {"Lovense Hush": {"gamma": 1.8, "min": 0.15, "max": 0.9, "points": []}}
+#
+# gamma shapes the curve (above 1 is gentler at the low end, below 1 stronger), min is
+# the floor any non-zero intensity gets lifted to (past a weak motor's dead zone) and max
+# caps it. points, a list of [input, output] pairs, replaces gamma with straight lines
+# through (0, 0), the points and (1, 1). Zero always stays zero.
+#
+# A curve is compiled once per device into a table with one entry per actuator step, so
+# mapping an intensity on the send path is one table index.
+
+CURVE_TABLE_SIZE = 100  # Table entries for actuators that don't report a step count
+
+DEFAULT_CURVE = {"gamma": 1.0, "min": 0.0, "max": 1.0, "points": []}
+
+
+def clamp(value):
+    return min(max(float(value), 0.0), 1.0)
+
+
+def normalize_curve(curve):
+    """Fills in missing fields and clamps a curve loaded from settings or typed by the user."""
+    curve = dict(DEFAULT_CURVE, **(curve or {}))
+    low, high = clamp(curve["min"]), clamp(curve["max"])
+    return {
+        "gamma": min(max(float(curve["gamma"]), 0.1), 10.0),
+        "min": min(low, high),
+        "max": max(low, high),
+        "points": sorted([clamp(x), clamp(y)] for x, y in curve["points"]),
+    }
+
+
+def curve_value(curve, value):
+    """Exact curve output for an input in 0-1 (used to compile tables and draw previews)."""
+    if value <= 0:
+        return 0.0
+    value = min(value, 1.0)
+    if curve["points"]:
+        xs = [0.0] + [x for x, y in curve["points"]] + [1.0]
+        ys = [0.0] + [y for x, y in curve["points"]] + [1.0]
+        for i in range(1, len(xs)):
+            if value <= xs[i]:
+                span = xs[i] - xs[i - 1]
+                t = (value - xs[i - 1]) / span if span else 1.0
+                shaped = ys[i - 1] + (ys[i] - ys[i - 1]) * t
+                break
+    else:
+        shaped = value ** curve["gamma"]
+    return curve["min"] + (curve["max"] - curve["min"]) * shaped
+
+
+def compile_curve(curve, step_count=None):
+    """Lookup table for one actuator: entry i is the output for input step i, already on a step."""
+    steps = step_count or CURVE_TABLE_SIZE
+    table = array("d", [0.0]) * (steps + 1)
+    for i in range(1, steps + 1):
+        output = curve_value(curve, i / steps)
+        if step_count:
+            # Same rounding as StepQuantizer, so a non-zero output is at least step 1
+            output = max(1, math.ceil(output * steps - 1e-9)) / steps if output > 0 else 0.0
+        table[i] = output
+    return table
+
+
+def apply_curve(table, value):
+    """Maps an intensity through a compiled table."""
+    last = len(table) - 1
+    return table[min(max(math.ceil(value * last - 1e-9), 0), last)]
@@ -0,0 +1,232 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# Usage statistics for this session and all sessions so far, kept in STATS_FILE. Every
+# figure is a running total, a maximum or a fixed-bucket histogram updated as events
+# happen, so memory stays the same however long the app runs (only one entry per device
+# name is added). The file is written once, at exit:
+#
+#   {"sessions": 12, "since": 1760000000.0,
+#    "presses": {"count": 340, "total": 812.5, "max": 41.2, "buckets": [3, 20, ...]},
+#    "devices": {"Lovense Hush": {"time": 790.1, "intensity_time": 402.7, "peak": 1.0,
+#                                 "commands": 5120, "errors": 2}}}
+
+STATS_FILE = "stats.json"
+PRESS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300)  # Press duration histogram upper bounds, seconds
+
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.1f} s"
+    minutes, seconds = divmod(int(seconds), 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{minutes // 60}h {minutes % 60:02d}m"
+
+
+class Histogram:
+    """Counts per fixed bucket, with the count, total and maximum of everything added."""
+
+    def __init__(self, bounds, data=None):
+        data = data or {}
+        self.bounds = bounds
+        self.buckets = list(data.get("buckets", ())) or [0] * (len(bounds) + 1)  # Last: over the last bound
+        self.count = data.get("count", 0)
+        self.total = data.get("total", 0.0)
+        self.max = data.get("max", 0.0)
+
+    def add(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merged(self, other):
+        result = Histogram(self.bounds, self.to_dict())
+        result.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        result.count += other.count
+        result.total += other.total
+        result.max = max(self.max, other.max)
+        return result
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket the percentile falls in (inf past the last bound)."""
+        target = self.count * fraction
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def to_dict(self):
+        return {"count": self.count, "total": round(self.total, 3), "max": round(self.max, 3),
+                "buckets": list(self.buckets)}
+
+
+class DeviceStats:
+    """Vibration time, time-weighted intensity, peak, commands and errors for one device.
+
+    The intensity last sent is held until the next send, so time and the intensity
+    integral are accumulated between sends rather than from a list of samples.
+    """
+
+    FIELDS = ("time", "intensity_time", "peak", "commands", "errors")
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.time = data.get("time", 0.0)  # Seconds at a non-zero intensity
+        self.intensity_time = data.get("intensity_time", 0.0)  # Integral of intensity over time
+        self.peak = data.get("peak", 0.0)
+        self.commands = data.get("commands", 0)
+        self.errors = data.get("errors", 0)
+        self.level = 0.0
+        self.since = None  # Monotonic time the current level was sent
+
+    def settle(self, now):
+        """Accounts for the time spent at the current level up to now."""
+        if self.since is not None and self.level > 0:
+            self.time += now - self.since
+            self.intensity_time += self.level * (now - self.since)
+        self.since = now
+
+    def sent(self, now, value):
+        self.settle(now)
+        self.level = value
+        self.peak = max(self.peak, value)
+        self.commands += 1
+
+    def average(self):
+        """Mean intensity while vibrating."""
+        return self.intensity_time / self.time if self.time else 0.0
+
+    def merged(self, other):
+        result = DeviceStats(self.to_dict())
+        result.time += other.time
+        result.intensity_time += other.intensity_time
+        result.peak = max(self.peak, other.peak)
+        result.commands += other.commands
+        result.errors += other.errors
+        return result
+
+    def to_dict(self):
+        return {"time": round(self.time, 3), "intensity_time": round(self.intensity_time, 3),
+                "peak": self.peak, "commands": self.commands, "errors": self.errors}
+
+
+class UsageStats:
+    """This session's statistics, and the earlier sessions' totals loaded from the stats file.
+
+    Updated from any thread: presses from the hook threads, sends from the event loop.
+    """
+
+    def __init__(self, path=STATS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.presses = Histogram(PRESS_BUCKETS)
+        self.devices = {}  # device name -> DeviceStats
+        self.pressed_at = None
+        self.past_sessions = 0
+        self.since = self.started
+        self.past_presses = Histogram(PRESS_BUCKETS)
+        self.past_devices = {}
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            self.past_sessions = data.get("sessions", 0)
+            self.since = data.get("since", self.started)
+            self.past_presses = Histogram(PRESS_BUCKETS, data.get("presses"))
+            self.past_devices = {name: DeviceStats(entry) for name, entry in data.get("devices", {}).items()}
+        except (FileNotFoundError, ValueError, TypeError, AttributeError):
+            pass  # First session (or an unreadable file): lifetime starts now
+
+    def device(self, name):
+        stats = self.devices.get(name)
+        if stats is None:
+            stats = self.devices[name] = DeviceStats()
+        return stats
+
+    def on_event(self, event, value):
+        """Core listener: a press lasts from "vibrating" True to False, however it was stopped."""
+        if event != "vibrating":
+            return
+        now = time.monotonic()
+        with self.lock:
+            if value and self.pressed_at is None:
+                self.pressed_at = now
+            elif not value and self.pressed_at is not None:
+                self.presses.add(now - self.pressed_at)
+                self.pressed_at = None
+
+    def sent(self, name, value):
+        """An intensity a device acknowledged."""
+        with self.lock:
+            self.device(name).sent(time.monotonic(), value)
+
+    def failed(self, name):
+        with self.lock:
+            self.device(name).errors += 1
+
+    def settle(self):
+        now = time.monotonic()
+        for stats in self.devices.values():
+            stats.settle(now)
+
+    def lifetime(self):
+        """(presses, devices) over every session including this one."""
+        devices = dict(self.past_devices)
+        for name, stats in self.devices.items():
+            devices[name] = devices[name].merged(stats) if name in devices else stats
+        return self.past_presses.merged(self.presses), devices
+
+    def save(self):
+        """Writes the lifetime totals (this session included) to the stats file."""
+        with self.lock:
+            self.settle()
+            presses, devices = self.lifetime()
+            data = {"sessions": self.past_sessions + 1, "since": self.since, "presses": presses.to_dict(),
+                    "devices": {name: stats.to_dict() for name, stats in devices.items()}}
+        temporary = self.path + ".tmp"
+        try:
+            with open(temporary, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(temporary, self.path)
+        except OSError:
+            pass  # Read-only folder: the statistics just aren't kept
+
+    def section(self, title, presses, devices):
+        lines = [title]
+        held = presses.total
+        lines.append(f"  vibration held {format_duration(held)} over {presses.count} presses"
+                     + (f", longest {format_duration(presses.max)}" if presses.count else ""))
+        if presses.count:
+            lines.append(f"  press length: median <= {presses.percentile(0.5):g} s, "
+                         f"p90 <= {presses.percentile(0.9):g} s")
+            peak = max(presses.buckets)
+            lower = 0
+            for bound, count in zip(presses.bounds + (float("inf"),), presses.buckets):
+                bar = "#" * (round(count / peak * 30) if peak else 0)
+                lines.append(f"    {lower:>5g}-{bound:<5g} s {count:>6} {bar}")
+                lower = bound
+        commands = sum(stats.commands for stats in devices.values())
+        errors = sum(stats.errors for stats in devices.values())
+        lines.append(f"  {commands} commands, {errors} errors")
+        for name, stats in sorted(devices.items(), key=lambda item: item[1].time, reverse=True):
+            lines.append(f"  {name}: {format_duration(stats.time)} vibrating, average {stats.average() * 100:.0f}%, "
+                         f"peak {stats.peak * 100:.0f}%, {stats.commands} commands, {stats.errors} errors")
+        return lines
+
+    def report(self):
+        with self.lock:
+            self.settle()
+            presses, devices = self.lifetime()
+            lines = self.section(f"This session ({format_duration(time.time() - self.started)})",
+                                 self.presses, self.devices)
+            lines.append("")
+            lines += self.section(f"All {self.past_sessions + 1} sessions since "
+                                  f"{time.strftime('%Y-%m-%d', time.localtime(self.since))}", presses, devices)
+        return "\n".join(lines) + "\n"
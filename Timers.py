@@ -0,0 +1,178 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+# One timer service per event loop for everything that happens "in N seconds" or "at
+# 21:30": timed presses, delayed triggers, scheduled sessions, the vibration time limit.
+# Timers sit in a min-heap ordered by deadline, and the loop holds a single call_at()
+# handle for the earliest one, moved only when a new timer becomes the earliest. A
+# coroutine sleeping per action costs a task, a future and a loop timer each; here a
+# pending timer is one small object in a list.
+#
+# Cancelling only marks the timer; it is skipped when it reaches the top of the heap, and
+# the heap is rebuilt without the cancelled ones once they are more than half of it,
+# checked whenever timers fire or a new one is added. Timers that are set and cancelled
+# over and over before any deadline comes therefore can't pile up.
+#
+#   timer = core.timers.call_later(2.0, core.release, "timed")  # any thread
+#   timer.cancel()
+#
+# Timed actions in keybindings.json (intensity defaults to the current one, delay to 0):
+#
+#   "timed_bindings": [{"key": "f1", "intensity": 0.6, "seconds": 2},
+#                      {"key": "f2", "seconds": 5, "delay": 10}]
+#   "scheduled_sessions": [{"at": "21:30", "intensity": 0.4, "seconds": 600}]  # Daily, local time
+
+COMPACT_MIN = 1024  # Cancelled timers tolerated before compaction is considered
+MAX_TIMED_BINDINGS = 64
+
+log = logging.getLogger("intiface.timers")
+
+
+def timed_action(entry):
+    """(intensity or None, seconds, delay) of a timed binding or session; ValueError if invalid."""
+    if not isinstance(entry, dict):
+        raise ValueError(f"timed action must be an object: {entry!r}")
+    intensity = entry.get("intensity")
+    try:
+        seconds = float(entry.get("seconds", 0))
+        delay = float(entry.get("delay", 0))
+        intensity = None if intensity is None else float(intensity)
+    except TypeError:
+        raise ValueError(f"timed action values must be numbers: {entry!r}")
+    if intensity is not None and not 0 < intensity <= 1:
+        raise ValueError(f"timed action intensity must be between 0 and 1: {entry!r}")
+    if not seconds > 0 or not delay >= 0:
+        raise ValueError(f"timed action needs seconds > 0 and delay >= 0: {entry!r}")
+    return intensity, seconds, delay
+
+
+def next_daily(clock, now=None):
+    """Timestamp of the next local "HH:MM" (or "HH:MM:SS") after now; ValueError if invalid."""
+    parts = [int(part) for part in str(clock).split(":")]
+    if not 2 <= len(parts) <= 3 or not (0 <= parts[0] < 24 and 0 <= parts[1] < 60 and 0 <= parts[-1] < 60):
+        raise ValueError(f"session time must be HH:MM: {clock!r}")
+    now = time.time() if now is None else now
+    day = time.localtime(now)
+    for days in range(3):  # Today, tomorrow, or the day after when a DST change skips the time
+        when = time.mktime((day.tm_year, day.tm_mon, day.tm_mday + days, parts[0], parts[1],
+                            parts[2] if len(parts) == 3 else 0, 0, 0, -1))
+        if when > now:
+            return when
+    raise ValueError(f"no next occurrence of {clock!r}")
+
+
+class Timer:
+    __slots__ = ("when", "callback", "args", "cancelled", "wall_time", "service")
+
+    def __init__(self, service, when, callback, args, wall_time=None):
+        self.service = service
+        self.when = when  # Loop time
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self.wall_time = wall_time  # time.time() deadline of wall clock timers
+
+    def cancel(self):
+        """Stops the timer from firing (any thread)."""
+        if not self.cancelled:
+            self.cancelled = True
+            self.service.cancelled += 1
+
+
+class TimerService:
+    """Min-heap of timers on one event loop, woken once per earliest deadline."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.heap = []  # (loop time, sequence, Timer)
+        self.sequence = itertools.count()  # Ties fire in the order they were set
+        self.handle = None  # The loop's call_at() for the earliest deadline
+        self.wake_at = None
+        self.cancelled = 0  # Cancelled timers still in the heap (approximate while threads race)
+        self.fired = 0
+        self.compactions = 0
+        self.max_late = 0.0
+
+    def call_at(self, when, callback, *args):
+        """Calls callback(*args) on the loop at loop time when; returns the Timer (any thread)."""
+        return self.add(Timer(self, when, callback, args))
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.loop.time() + delay, callback, *args)
+
+    def call_at_wall(self, timestamp, callback, *args):
+        """Calls callback(*args) at a time.time() timestamp (scheduled sessions)."""
+        return self.add(Timer(self, self.loop.time() + timestamp - time.time(), callback, args, timestamp))
+
+    def add(self, timer):
+        try:
+            on_loop = asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self.push(timer)
+        else:
+            self.loop.call_soon_threadsafe(self.push, timer)
+        return timer
+
+    def push(self, timer):
+        if timer.cancelled:
+            self.cancelled -= 1
+            return
+        heapq.heappush(self.heap, (timer.when, next(self.sequence), timer))
+        self.compact_if_mostly_cancelled()
+        if self.wake_at is None or timer.when < self.wake_at:
+            self.wake(timer.when)
+
+    def wake(self, when):
+        if self.handle is not None:
+            self.handle.cancel()
+        self.wake_at = when
+        self.handle = self.loop.call_at(when, self.run)
+
+    def run(self):
+        """Fires every due timer, then sleeps until the next deadline."""
+        self.handle = self.wake_at = None
+        now = self.loop.time()
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            when, sequence, timer = heapq.heappop(heap)
+            if timer.cancelled:
+                self.cancelled -= 1
+                continue
+            if timer.wall_time is not None and time.time() < timer.wall_time - 0.05:
+                # The wall clock was set back since this was scheduled: wait for the rest
+                timer.when = now + timer.wall_time - time.time()
+                heapq.heappush(heap, (timer.when, next(self.sequence), timer))
+                continue
+            timer.cancelled = True  # Fired: a late cancel() must not count it as waiting in the heap
+            self.fired += 1
+            self.max_late = max(self.max_late, now - when)
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                log.exception("Error in timer %s: %s", getattr(timer.callback, "__name__", timer.callback), e)
+        self.compact_if_mostly_cancelled()
+        if self.heap:
+            self.wake(self.heap[0][0])
+
+    def compact_if_mostly_cancelled(self):
+        if self.cancelled > COMPACT_MIN and self.cancelled * 2 > len(self.heap):
+            self.compact()
+
+    def compact(self):
+        """Drops cancelled timers in one O(n) pass."""
+        self.heap = [entry for entry in self.heap if not entry[2].cancelled]
+        heapq.heapify(self.heap)
+        self.cancelled = 0
+        self.compactions += 1
+
+    def pending(self):
+        return len(self.heap) - self.cancelled
+
+    def report(self):
+        return (f"Timers: {self.pending()} pending, {self.fired} fired (latest {self.max_late * 1000:.1f} ms late), "
+                f"{self.compactions} compactions\n")
@@ -0,0 +1,154 @@
+# Linux gamepad trigger source, read straight from /dev/input/event* with evdev
+# (pip install evdev; the user needs read access to the input device).
+# An analog axis (trigger or stick) drives intensity continuously through a curve, and
+# digital buttons map to actions. Axes report hundreds of events per second, so the
+# reader only keeps the latest value and a sampler forwards it at "rate" Hz, and only
+# when the mapped intensity changed.
+#
+# "plugin_config": {"evdev_gamepad": {
+#     "device": null,            # e.g. "/dev/input/event5"; null picks the first pad with the axis
+#     "axis": "ABS_RZ",          # right trigger on most pads
+#     "curve": "quadratic",      # "linear", "quadratic", "cubic", an exponent, or [[x, y], ...] points
+#     "deadzone": 0.05,          # 0 up to (not including) 1
+#     "rate": 20,                # Hz, roughly what a Bluetooth toy can take
+#     "buttons": {"BTN_SOUTH": "vibrate", "BTN_TR": "increase", "BTN_TL": "decrease"}
+# }}
+import threading
+import time
+
+import evdev
+from evdev import ecodes
+
+from PluginHost import TriggerSource
+
+NAMED_CURVES = {"linear": 1.0, "quadratic": 2.0, "cubic": 3.0}
+
+
+def make_curve(spec):
+    """Builds an input -> intensity function from a curve name, an exponent or [x, y] points."""
+    if isinstance(spec, str):
+        spec = NAMED_CURVES[spec]
+    if isinstance(spec, (int, float)):
+        exponent = float(spec)
+        return lambda x: x ** exponent
+
+    points = sorted((float(x), float(y)) for x, y in spec)
+    if not points:
+        raise ValueError("curve needs at least one [x, y] point")
+    if points[0][0] > 0.0:
+        points.insert(0, (0.0, 0.0))
+    if points[-1][0] < 1.0:
+        points.append((1.0, points[-1][1]))
+
+    def piecewise(x):
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            if x <= x1:
+                return y0 if x1 == x0 else y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+        return points[-1][1]
+    return piecewise
+
+
+def find_device(axis_code):
+    """First input device that reports the given absolute axis."""
+    for path in evdev.list_devices():
+        device = evdev.InputDevice(path)
+        if axis_code in dict(device.capabilities().get(ecodes.EV_ABS, [])):
+            return device
+        device.close()
+    return None
+
+
+class EvdevGamepad(TriggerSource):
+    def start(self):
+        self.axis = ecodes.ecodes[self.config.get("axis", "ABS_RZ")]
+        self.curve = make_curve(self.config.get("curve", "quadratic"))
+        self.deadzone = self.config.get("deadzone", 0.05)
+        if not 0 <= self.deadzone < 1:
+            raise ValueError(f"deadzone must be at least 0 and below 1: {self.deadzone!r}")
+        self.period = 1.0 / self.config.get("rate", 20)
+        self.buttons = {ecodes.ecodes[name]: action
+                        for name, action in self.config.get("buttons", {"BTN_SOUTH": "vibrate"}).items()}
+
+        self.latest = 0.0  # Newest normalized axis position, overwritten by every event
+        self.events = 0
+        self.emitted = 0
+        self.stopped = threading.Event()
+
+        path = self.config.get("device")
+        self.device = evdev.InputDevice(path) if path else find_device(self.axis)
+        if self.device is None:
+            raise RuntimeError(f"No input device with {self.config.get('axis', 'ABS_RZ')} found")
+        self.set_range(self.device.absinfo(self.axis))
+
+        threading.Thread(target=self.read_events, daemon=True).start()
+        threading.Thread(target=self.sample, daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+        try:
+            self.device.close()  # Unblocks read_loop
+        except OSError:
+            pass
+        self.app.plugin_release(self.name)
+        self.app.plugin_release(self.button_source)
+
+    @property
+    def button_source(self):
+        return f"{self.name} buttons"
+
+    def set_range(self, absinfo):
+        self.minimum, self.maximum = absinfo.min, absinfo.max
+        # Sticks are centered on zero, triggers start at their minimum
+        self.centered = self.minimum < 0 < self.maximum
+
+    def normalize(self, value):
+        if self.centered:
+            position = abs(value) / max(-self.minimum, self.maximum)
+        else:
+            position = (value - self.minimum) / ((self.maximum - self.minimum) or 1)
+        if position < self.deadzone:
+            return 0.0
+        return min(1.0, (position - self.deadzone) / (1.0 - self.deadzone))
+
+    def read_events(self):
+        try:
+            for event in self.device.read_loop():
+                self.handle_event(event)
+        except OSError:
+            pass  # Device closed by stop(), or unplugged
+
+    def handle_event(self, event):
+        """Runs per input event, so it only stores the axis value or dispatches a button."""
+        self.events += 1
+        if event.type == ecodes.EV_ABS and event.code == self.axis:
+            self.latest = self.normalize(event.value)
+        elif event.type == ecodes.EV_KEY and event.code in self.buttons and event.value != 2:  # 2 = autorepeat
+            self.button(self.buttons[event.code], event.value == 1)
+
+    def button(self, action, pressed):
+        if action == "vibrate":
+            if pressed:
+                self.app.plugin_press(self.button_source)
+            else:
+                self.app.plugin_release(self.button_source)
+        elif pressed and action == "increase":
+            self.app.increase_intensity()
+        elif pressed and action == "decrease":
+            self.app.decrease_intensity()
+
+    def sample(self):
+        """Forwards the coalesced axis value at the send rate, on a fixed schedule."""
+        last_sent = 0.0
+        next_tick = time.monotonic()
+        while not self.stopped.is_set():
+            next_tick += self.period
+            self.stopped.wait(max(0.0, next_tick - time.monotonic()))
+            intensity = round(self.curve(self.latest), 3)
+            if intensity != last_sent:
+                last_sent = intensity
+                self.emitted += 1
+                self.app.plugin_set_intensity(self.name, intensity)
+
+
+def create(app, config):
+    return [EvdevGamepad(app, config)]
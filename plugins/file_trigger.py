@@ -0,0 +1,40 @@
+# Example trigger source: drives vibration from a text file.
+# Any program can write a number between 0 and 1 to the file to set the intensity
+# (0 stops). Enable it with "plugins": ["file_trigger"] in keybindings.json; optional
+# settings go in "plugin_config": {"file_trigger": {"path": "...", "interval": 0.05}}.
+import os
+import threading
+
+from PluginHost import TriggerSource
+
+
+class FileTrigger(TriggerSource):
+    def start(self):
+        self.path = self.config.get("path", "vibe_trigger.txt")
+        self.interval = self.config.get("interval", 0.05)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.app.plugin_release(self.name)
+
+    def watch(self):
+        """Polls the file's mtime and re-reads it only when it changes."""
+        last_mtime = None
+        while not self.stopped.wait(self.interval):
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime == last_mtime:
+                    continue
+                last_mtime = mtime
+                with open(self.path, "r") as f:
+                    intensity = float(f.read().strip() or 0)
+            except (OSError, ValueError):
+                continue  # Missing or half-written file, try again next poll
+            self.app.plugin_set_intensity(self.name, min(max(intensity, 0.0), 1.0))
+
+
+def create(app, config):
+    return [FileTrigger(app, config)]
@@ -0,0 +1,117 @@
+# Trigger source that maps pointer speed (or scroll speed) to intensity.
+# Mouse moves arrive at 500-1000 Hz on the global mouse hook, so the hook callback only
+# writes into a preallocated ring buffer (O(1), no list growth) and a sampler thread
+# turns the estimate into intensity at a fixed rate. The callback's own CPU cost is
+# measured and shown in Options > Diagnostics.
+#
+# "plugin_config": {"mouse_velocity": {
+#     "mode": "move",         # "move" for pointer speed, "scroll" for wheel speed
+#     "max_speed": 3000,      # px/s (or wheel notches/s) that maps to full intensity
+#     "exponent": 1.0,        # response curve, >1 is gentler at low speeds
+#     "rate": 30,             # Hz
+#     "buffer": 64            # ring buffer slots
+# }}
+import math
+import threading
+import time
+from array import array
+
+import mouse
+
+from PluginHost import TriggerSource
+
+IDLE_TIMEOUT = 0.1  # Seconds without input before the speed counts as zero
+
+
+class VelocityEstimator:
+    """Distance per second over the last N samples, kept in a fixed-size ring buffer."""
+
+    def __init__(self, size=64):
+        self.size = size
+        self.times = array("d", [0.0]) * size
+        self.distances = array("d", [0.0]) * size
+        self.head = 0  # Next slot to write
+        self.count = 0
+        self.total = 0.0  # Running sum of the distances in the buffer
+
+    def add(self, timestamp, distance):
+        head = self.head
+        self.total += distance - self.distances[head]  # Evict the oldest sample in the same step
+        self.times[head] = timestamp
+        self.distances[head] = distance
+        self.head = (head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def velocity(self, now):
+        if not self.count:
+            return 0.0
+        newest = self.times[self.head - 1]
+        if now - newest > IDLE_TIMEOUT:
+            return 0.0
+        oldest = self.head if self.count == self.size else 0
+        # A sample's distance was covered before its timestamp, so the window starts at the
+        # oldest timestamp without the oldest distance. Measuring up to "now" makes the
+        # estimate decay as soon as movement slows.
+        return (self.total - self.distances[oldest]) / max(now - self.times[oldest], IDLE_TIMEOUT / 4)
+
+
+class MouseVelocity(TriggerSource):
+    def start(self):
+        self.scroll = self.config.get("mode", "move") == "scroll"
+        self.max_speed = self.config.get("max_speed", 20 if self.scroll else 3000)
+        self.exponent = self.config.get("exponent", 1.0)
+        self.period = 1.0 / self.config.get("rate", 30)
+        self.estimator = VelocityEstimator(self.config.get("buffer", 64))
+        self.last_x = self.last_y = None
+        self.hook_calls = 0
+        self.hook_ns = 0
+        self.hook_max_ns = 0
+        self.stopped = threading.Event()
+        self.handler = mouse.hook(self.on_event)
+        threading.Thread(target=self.sample, daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+        mouse.unhook(self.handler)
+        self.app.plugin_release(self.name)
+
+    def on_event(self, event):
+        """Global hook callback: keep it to a few arithmetic operations."""
+        started = time.perf_counter_ns()
+        kind = type(event)
+        if kind is mouse.MoveEvent and not self.scroll:
+            if self.last_x is not None:
+                self.estimator.add(event.time, math.hypot(event.x - self.last_x, event.y - self.last_y))
+            self.last_x, self.last_y = event.x, event.y
+        elif kind is mouse.WheelEvent and self.scroll:
+            self.estimator.add(event.time, abs(event.delta))
+        else:
+            return
+        elapsed = time.perf_counter_ns() - started
+        self.hook_calls += 1
+        self.hook_ns += elapsed
+        if elapsed > self.hook_max_ns:
+            self.hook_max_ns = elapsed
+
+    def sample(self):
+        last_sent = 0.0
+        next_tick = time.monotonic()
+        while not self.stopped.is_set():
+            next_tick += self.period
+            self.stopped.wait(max(0.0, next_tick - time.monotonic()))
+            speed = self.estimator.velocity(time.time())  # mouse event times come from time.time()
+            intensity = round(min(1.0, speed / self.max_speed) ** self.exponent, 2)
+            if intensity != last_sent:
+                last_sent = intensity
+                self.app.plugin_set_intensity(self.name, intensity)
+
+    def report(self):
+        if not self.hook_calls:
+            return "mouse_velocity: no events yet"
+        return (f"mouse_velocity: {self.hook_calls} hook events, "
+                f"{self.hook_ns / self.hook_calls / 1000:.2f} us mean, {self.hook_max_ns / 1000:.1f} us max per event")
+
+
+def create(app, config):
+    return [MouseVelocity(app, config)]
@@ -0,0 +1,256 @@
+# Remote partner control through a websocket relay (RelayServer.py is a local stand-in).
+# The "send" side streams every intensity this app applies; the "receive" side drives the
+# local device from the remote stream.
+#
+# "plugin_config": {"relay": {
+#     "url": "ws://localhost:8765/myroom",
+#     "role": "receive",     # or "send"
+#     "batch_ms": 50,        # send side: samples are batched into one frame per interval
+#     "min_delay_ms": 20,    # receive side: jitter buffer delay bounds
+#     "max_delay_ms": 500
+# }}
+#
+# Frames are compact JSON: {"s": seq, "t": first sample time (sender ms), "v": first value
+# (0-1000), "d": [dt, dv, dt, dv, ...], "b": batch_ms} with each later sample delta-encoded
+# against the previous one. The receiver never buffers less than the sender's batch_ms,
+# since a frame's first sample has already waited that long before it is sent. The receiver pings through the relay and the sender echoes, which gives
+# the network delay without needing synchronized clocks.
+import asyncio
+import bisect
+import json
+import logging
+import time
+
+import websockets
+
+from PluginHost import OutputAction, TriggerSource
+
+RECONNECT_DELAY = 2.0
+PLAYOUT_INTERVAL = 0.01  # Seconds between jitter buffer checks
+PING_INTERVAL = 1.0
+
+log = logging.getLogger("intiface.plugins.relay")
+
+
+def now_ms():
+    return time.monotonic() * 1000
+
+
+def encode_frame(seq, samples, batch_ms=0):
+    """samples: [(time ms, value 0-1000), ...] -> delta-encoded frame text."""
+    first_time, first_value = samples[0]
+    deltas = []
+    previous_time, previous_value = first_time, first_value
+    for sample_time, value in samples[1:]:
+        deltas += [round(sample_time - previous_time), value - previous_value]
+        previous_time, previous_value = sample_time, value
+    return json.dumps({"s": seq, "t": round(first_time), "v": first_value, "d": deltas, "b": batch_ms},
+                      separators=(",", ":"))
+
+
+def decode_frame(frame):
+    samples = [(frame["t"], frame["v"])]
+    deltas = frame["d"]
+    for i in range(0, len(deltas), 2):
+        sample_time, value = samples[-1]
+        samples.append((sample_time + deltas[i], value + deltas[i + 1]))
+    return samples
+
+
+class JitterBuffer:
+    """Adaptive playout delay: late samples are dropped, never replayed, except stops.
+
+    Transit time (arrival - sender timestamp) contains an unknown clock offset, so delays are
+    measured against the smallest transit seen. Jitter is smoothed like RFC 3550 and the
+    target delay follows it between min_delay and max_delay, but never goes below the
+    sender's batch interval. A late 0 is played at once: dropping it would leave the
+    device running until the next sample.
+    """
+
+    def __init__(self, min_delay=20, max_delay=500):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.target = min_delay
+        self.base_transit = None
+        self.last_transit = None
+        self.jitter = 0.0
+        self.batch = 0  # The sender's batch interval, ms (from the frames)
+        self.queue = []  # (sender ms, playout local ms, value), sorted by sender time
+        self.last_played = float("-inf")
+        self.received = 0
+        self.late = 0
+        self.late_stops = 0  # Late zeros played at once instead of dropped
+
+    def push(self, sent, value, arrival):
+        self.received += 1
+        transit = arrival - sent
+        if self.base_transit is None or transit < self.base_transit:
+            self.base_transit = transit
+        else:
+            self.base_transit += 0.01  # Creep up slowly to follow clock drift and route changes
+        if self.last_transit is not None:
+            self.jitter += (abs(transit - self.last_transit) - self.jitter) / 16
+        self.last_transit = transit
+        self.target = min(self.max_delay, max(self.min_delay, self.batch, 4 * self.jitter))
+
+        playout = sent + self.base_transit + self.target
+        if sent <= self.last_played:
+            self.late += 1  # A newer sample has already been played
+            return
+        if playout < arrival:
+            if value:
+                self.late += 1
+                return
+            self.late_stops += 1
+            playout = arrival
+        bisect.insort(self.queue, (sent, playout, value))
+
+    def pop_due(self, now):
+        """Newest value whose playout time has come, or None. Older due samples are skipped."""
+        value = None
+        while self.queue and self.queue[0][1] <= now:
+            sent, playout, value = self.queue.pop(0)
+            self.last_played = sent
+        return value
+
+    def depth_ms(self, now):
+        return max(0.0, self.queue[-1][1] - now) if self.queue else 0.0
+
+
+class RelayConnection:
+    """Keeps one websocket to the relay open and hands incoming messages to a callback."""
+
+    def __init__(self, url, on_message):
+        self.url = url
+        self.on_message = on_message
+        self.connection = None
+        self.task = None
+
+    def start(self, loop):
+        self.task = asyncio.run_coroutine_threadsafe(self.run(), loop)
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    async def run(self):
+        while True:
+            try:
+                async with websockets.connect(self.url) as connection:
+                    self.connection = connection
+                    async for message in connection:
+                        self.on_message(json.loads(message))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("Relay connection to %s lost: %s", self.url, e)
+            self.connection = None
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def send(self, message):
+        if self.connection is not None:
+            try:
+                await self.connection.send(message if isinstance(message, str) else json.dumps(message))
+            except websockets.ConnectionClosed:
+                pass
+
+
+class RelayReceiver(TriggerSource):
+    def start(self):
+        self.buffer = JitterBuffer(self.config.get("min_delay_ms", 20), self.config.get("max_delay_ms", 500))
+        self.network_delay = None  # One-way estimate from ping round trips, ms
+        self.relay = RelayConnection(self.config["url"], self.on_message)
+        self.relay.start(self.app.event_loop)
+        self.playout = asyncio.run_coroutine_threadsafe(self.playout_task(), self.app.event_loop)
+
+    def stop(self):
+        self.relay.stop()
+        self.playout.cancel()
+        self.app.plugin_release(self.name)
+        self.app.plugin_status(self.name, "")
+
+    def on_message(self, message):
+        if "pong" in message:
+            self.network_delay = (now_ms() - message["pong"]) / 2
+            return
+        if "d" in message:
+            arrival = now_ms()
+            self.buffer.batch = message.get("b", 0)
+            for sent, value in decode_frame(message):
+                self.buffer.push(sent, value, arrival)
+
+    async def playout_task(self):
+        last_value = None
+        next_ping = next_status = 0.0
+        while True:
+            now = now_ms()
+            value = self.buffer.pop_due(now)
+            if value is not None and value != last_value:
+                last_value = value
+                self.app.plugin_set_intensity(self.name, value / 1000)
+            if now >= next_ping:
+                next_ping = now + PING_INTERVAL * 1000
+                await self.relay.send({"ping": now})
+            if now >= next_status:
+                next_status = now + 500
+                self.app.plugin_status(self.name, self.status_text(now))
+            await asyncio.sleep(PLAYOUT_INTERVAL)
+
+    def status_text(self, now):
+        if self.relay.connection is None:
+            return f"Relay: connecting to {self.relay.url}"
+        network = f"{self.network_delay:.0f}" if self.network_delay is not None else "?"
+        latency = (self.network_delay or 0) + self.buffer.target
+        return (f"Relay: ~{latency:.0f} ms end-to-end (network {network} ms + buffer {self.buffer.target:.0f} ms), "
+                f"depth {len(self.buffer.queue)} / {self.buffer.depth_ms(now):.0f} ms, {self.buffer.late} late")
+
+    def report(self):
+        return f"relay receive: {self.buffer.received} samples, {self.buffer.late} dropped late, " \
+               f"{self.buffer.late_stops} late stops played, jitter {self.buffer.jitter:.1f} ms"
+
+
+class RelaySender(OutputAction):
+    def start(self):
+        self.batch_ms = self.config.get("batch_ms", 50)
+        self.batch_interval = self.batch_ms / 1000
+        self.pending = []
+        self.seq = 0
+        self.frames = 0
+        self.bytes = 0
+        self.relay = RelayConnection(self.config["url"], self.on_message)
+        self.relay.start(self.app.event_loop)
+        self.flusher = asyncio.run_coroutine_threadsafe(self.flush_task(), self.app.event_loop)
+        self.app.plugin_status(self.name, f"Relay: sending to {self.relay.url}")
+
+    def stop(self):
+        self.relay.stop()
+        self.flusher.cancel()
+        self.app.plugin_status(self.name, "")
+
+    def on_message(self, message):
+        if "ping" in message:
+            # Echo the receiver's ping so it can measure the network delay
+            asyncio.ensure_future(self.relay.send({"pong": message["ping"]}))
+
+    async def send(self, device_name, intensity):
+        self.pending.append((now_ms(), round(intensity * 1000)))
+
+    async def flush_task(self):
+        while True:
+            await asyncio.sleep(self.batch_interval)
+            if self.pending:
+                samples, self.pending = self.pending, []
+                self.seq += 1
+                frame = encode_frame(self.seq, samples, self.batch_ms)
+                self.frames += 1
+                self.bytes += len(frame)
+                await self.relay.send(frame)
+
+    def report(self):
+        return f"relay send: {self.frames} frames, {self.bytes} bytes"
+
+
+def create(app, config):
+    if config.get("role", "receive") == "send":
+        return [RelaySender(app, config)]
+    return [RelayReceiver(app, config)]
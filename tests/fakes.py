@@ -0,0 +1,205 @@
+import collections
+import heapq
+import itertools
+import queue
+import sys
+import time
+import types
+
+# Headless stand-ins for tkinter, keyboard and mouse, shared by the tests and Benchmark.py.
+# install_fakes() puts them in sys.modules before the app modules are imported; FakeTk.pump()
+# runs the after() callbacks that Tk's mainloop would, and FakeInput fires the hooks the
+# app registered as if keys and buttons were pressed.
+
+
+class FakeWidget:
+    """Accepts any widget call; remembers config() values."""
+
+    def __init__(self, *args, **kwargs):
+        self.options = dict(kwargs)
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def config(self, *args, **kwargs):
+        self.options.update(kwargs)
+
+    configure = config
+
+    def cget(self, key):
+        return self.options.get(key)
+
+    def after(self, ms, func=None, *args):
+        after_id = next(FakeTk.counter)  # Also orders callbacks due at the same time
+        if func is not None:
+            FakeTk.waiting.add(after_id)
+            FakeTk.scheduled.put((time.monotonic() + ms / 1000, after_id, func, args))
+        return after_id
+
+    def after_cancel(self, after_id):
+        FakeTk.waiting.discard(after_id)
+
+    def winfo_exists(self):
+        return True
+
+
+class FakeTk(FakeWidget):
+    """Root window whose after() queue is run by pump() instead of mainloop()."""
+
+    scheduled = queue.Queue()  # Filled from any thread, like Tk's after() from hook threads
+    timers = []
+    counter = itertools.count()
+    waiting = set()  # after() ids that have neither run nor been cancelled
+    pending_peak = 0
+
+    @classmethod
+    def pump(cls, seconds=0.0):
+        """Runs due after() callbacks for `seconds` (at least one pass)."""
+        end = time.monotonic() + seconds
+        while True:
+            while True:
+                try:
+                    due, after_id, func, args = cls.scheduled.get_nowait()
+                except queue.Empty:
+                    break
+                heapq.heappush(cls.timers, (due, after_id, func, args))
+            cls.pending_peak = max(cls.pending_peak, len(cls.timers))
+            now = time.monotonic()
+            if cls.timers and cls.timers[0][0] <= now:
+                after_id, func, args = heapq.heappop(cls.timers)[1:]
+                if after_id in cls.waiting:
+                    cls.waiting.discard(after_id)
+                    func(*args)
+                continue
+            if now >= end:
+                return
+            time.sleep(min(0.001, end - now))
+
+    @classmethod
+    def pending(cls):
+        return len(cls.waiting)
+
+
+class Variable:
+    def __init__(self, master=None, value=None, **kwargs):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class FakeInput:
+    """Stand-in for the keyboard and mouse modules that records hooks so they can be fired."""
+
+    def __init__(self):
+        self.hooks = []  # (kind, key, callback)
+        self.pressed = set()
+        self.scan_codes = {}  # key name -> made-up scan code
+
+    def keyboard_module(self):
+        module = types.ModuleType("keyboard")
+
+        def register(kind):
+            def add(key, callback, *args, **kwargs):
+                hook = (kind, key, callback)
+                self.hooks.append(hook)
+                return hook
+            return add
+
+        module.on_press_key = register("press")
+        module.on_release_key = register("release")
+        module.hook = lambda callback: register("keyboard")(None, callback)
+        module.unhook = self.unhook
+        module.unhook_all = lambda: self.clear("press", "release", "keyboard")
+        module.is_pressed = lambda key: key in self.pressed
+        module.parse_hotkey = lambda key: key
+        module.key_to_scan_codes = lambda key: (self.scan_codes.setdefault(key, len(self.scan_codes) + 1),)
+        return module
+
+    def mouse_module(self):
+        module = types.ModuleType("mouse")
+        module.LEFT, module.MIDDLE, module.RIGHT = "left", "middle", "right"
+        module.UP, module.DOWN = "up", "down"
+
+        def on_button(callback, args=(), buttons=(), types=()):
+            hook = ("mouse " + types[0], buttons[0], callback)
+            self.hooks.append(hook)
+            return hook
+
+        module.on_button = on_button
+        module.hook = lambda callback: self.hooks.append(("mouse move", None, callback)) or self.hooks[-1]
+        module.unhook = self.unhook
+        module.unhook_all = lambda: self.clear("mouse down", "mouse up", "mouse move")
+        module.is_pressed = lambda button="left": button in self.pressed
+        module.ButtonEvent = collections.namedtuple("ButtonEvent", ["event_type", "button", "time"])
+        module.MoveEvent = type("MoveEvent", (), {})
+        module.WheelEvent = type("WheelEvent", (), {})
+        return module
+
+    def unhook(self, hook):
+        if hook in self.hooks:
+            self.hooks.remove(hook)
+
+    def clear(self, *kinds):
+        self.hooks = [hook for hook in self.hooks if hook[0] not in kinds]
+
+    def fire(self, kind, key):
+        event = types.SimpleNamespace(name=key, event_type=kind, time=time.time())
+        direction = "down" if kind == "press" else "up"
+        for hook_kind, hook_key, callback in list(self.hooks):
+            if hook_kind == kind and hook_key == key:
+                callback(event)
+            elif hook_kind == "mouse " + direction and hook_key == key:
+                callback()
+            elif hook_kind == "keyboard" and key not in ("left", "middle", "right"):
+                callback(types.SimpleNamespace(name=key, event_type=direction, time=event.time,
+                                               scan_code=self.scan_codes.setdefault(key, len(self.scan_codes) + 1)))
+            elif hook_kind == "mouse move" and key in ("left", "middle", "right"):
+                callback(sys.modules["mouse"].ButtonEvent(direction, key, event.time))
+
+    def press(self, key):
+        self.pressed.add(key)
+        self.fire("press", key)
+
+    def release(self, key):
+        self.pressed.discard(key)
+        self.fire("release", key)
+
+    def has_hook(self, key):
+        return any(hook[1] == key or hook[0] == "keyboard" for hook in self.hooks)
+
+
+def install_fakes():
+    """Puts headless tkinter, keyboard and mouse modules in sys.modules; returns the FakeInput."""
+    tk = types.ModuleType("tkinter")
+    for name in ("Tk",):
+        setattr(tk, name, FakeTk)
+    for name in ("Toplevel", "Menu", "Scale", "Canvas", "Text", "Frame", "Label", "Button", "Entry",
+                 "Checkbutton", "Listbox", "Scrollbar"):
+        setattr(tk, name, type(name, (FakeWidget,), {}))
+    tk.DoubleVar = tk.StringVar = tk.BooleanVar = tk.IntVar = Variable
+    tk.TclError = RuntimeError
+    for name in ("LEFT", "RIGHT", "TOP", "BOTTOM", "X", "Y", "BOTH", "DISABLED", "NORMAL", "HORIZONTAL",
+                 "VERTICAL", "END", "W", "E", "N", "S", "NW", "NONE", "WORD"):
+        setattr(tk, name, name.lower())
+
+    ttk = types.ModuleType("tkinter.ttk")
+    for name in ("Button", "Label", "Style", "Frame", "Combobox", "Scale", "Entry", "Checkbutton",
+                 "Scrollbar", "Notebook", "Treeview", "Spinbox"):
+        setattr(ttk, name, type(name, (FakeWidget,), {}))
+    messagebox = types.ModuleType("tkinter.messagebox")
+    messagebox.showinfo = messagebox.showerror = messagebox.askyesno = lambda *args, **kwargs: None
+    simpledialog = types.ModuleType("tkinter.simpledialog")
+    simpledialog.askstring = simpledialog.askfloat = lambda *args, **kwargs: None
+    tk.ttk, tk.messagebox, tk.simpledialog = ttk, messagebox, simpledialog
+
+    fake_input = FakeInput()
+    sys.modules.update({
+        "tkinter": tk, "tkinter.ttk": ttk, "tkinter.messagebox": messagebox,
+        "tkinter.simpledialog": simpledialog,
+        "keyboard": fake_input.keyboard_module(), "mouse": fake_input.mouse_module(),
+    })
+    return fake_input
@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from tests.fakes import install_fakes  # noqa: E402
+
+install_fakes()
+
+from IntifaceCore import IntifaceCore  # noqa: E402
+
+
+class RecordingOutput:
+    """Output plugin stand-in that records what it is sent."""
+
+    name = "recorder"
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, device_name, intensity):
+        self.sent.append((device_name, intensity))
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class NoDeviceOutputTest(unittest.TestCase):
+    """Without a connected device, presses still reach the output plugins (relay send role)."""
+
+    def setUp(self):
+        self.scratch = tempfile.TemporaryDirectory()
+        self.core = IntifaceCore(os.path.join(self.scratch.name, "keybindings.json"), hooks=False)
+
+    def tearDown(self):
+        self.core.shutdown()
+        self.core.logs.stop()
+        self.scratch.cleanup()
+
+    def test_press_streams_to_outputs(self):
+        output = RecordingOutput()
+        self.core.plugin_host.outputs = [output]
+        self.core.press("button")
+        self.assertTrue(wait_for(lambda: output.sent == [(None, 1.0)]), output.sent)
+        self.core.set_vibration_intensity(0.5)
+        self.assertTrue(wait_for(lambda: output.sent[-1:] == [(None, 0.5)]), output.sent)
+        self.core.release("button")
+        self.assertTrue(wait_for(lambda: output.sent[-1:] == [(None, 0.0)]), output.sent)
+        self.assertFalse(self.core.vibrating)
+
+    def test_press_without_outputs_is_ignored(self):
+        self.core.press("button")
+        self.assertFalse(self.core.vibrating)
+        self.assertEqual(self.core.mixer.contributions, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "plugins"))
+
+try:
+    import evdev
+    from evdev import ecodes
+except ImportError:
+    evdev = None
+
+if evdev is not None:
+    from evdev_gamepad import EvdevGamepad, make_curve
+
+
+class RecordingApp:
+    def __init__(self):
+        self.calls = []
+
+    def plugin_set_intensity(self, source, intensity):
+        self.calls.append(intensity)
+
+    def plugin_press(self, source, intensity=None):
+        self.calls.append("press")
+
+    def plugin_release(self, source):
+        self.calls.append("release")
+
+
+@unittest.skipIf(evdev is None, "needs evdev")
+class CurveTest(unittest.TestCase):
+    def test_named_and_exponent(self):
+        self.assertEqual(make_curve("quadratic")(0.5), 0.25)
+        self.assertEqual(make_curve(3)(0.5), 0.125)
+
+    def test_points_are_interpolated_and_extended(self):
+        curve = make_curve([[0.5, 0.8]])
+        self.assertEqual(curve(0.0), 0.0)
+        self.assertAlmostEqual(curve(0.25), 0.4)
+        self.assertEqual(curve(1.0), 0.8)
+
+    def test_empty_points_are_rejected(self):
+        with self.assertRaises(ValueError):
+            make_curve([])
+
+
+@unittest.skipIf(evdev is None, "needs evdev")
+class DeadzoneTest(unittest.TestCase):
+    def test_deadzone_of_one_is_rejected(self):
+        for deadzone in (1.0, 1.5, -0.1):
+            with self.assertRaises(ValueError):
+                EvdevGamepad(RecordingApp(), {"deadzone": deadzone}).start()
+
+    def test_normalize_rescales_past_the_deadzone(self):
+        gamepad = EvdevGamepad(RecordingApp(), {})
+        gamepad.deadzone = 0.2
+        gamepad.set_range(evdev.AbsInfo(0, 0, 255, 0, 0, 0))
+        self.assertEqual(gamepad.normalize(25), 0.0)
+        self.assertAlmostEqual(gamepad.normalize(255), 1.0)
+        self.assertAlmostEqual(gamepad.normalize(153), 0.5)
+
+
+@unittest.skipIf(evdev is None or not os.access("/dev/uinput", os.W_OK), "needs evdev and a writable /dev/uinput")
+class UinputPadTest(unittest.TestCase):
+    """Drives a uinput virtual trigger far above the send rate and checks the coalescing."""
+
+    def test_events_are_coalesced_to_the_send_rate(self, seconds=2.0, events_per_second=500, rate=20):
+        capabilities = {
+            ecodes.EV_ABS: [(ecodes.ABS_RZ, evdev.AbsInfo(0, 0, 255, 0, 0, 0))],
+            ecodes.EV_KEY: [ecodes.BTN_SOUTH],
+        }
+        app = RecordingApp()
+        with evdev.UInput(capabilities, name="intiface-vibes-test") as pad:
+            time.sleep(0.5)  # Let udev create the node
+            gamepad = EvdevGamepad(app, {"device": pad.device.path, "curve": "linear", "deadzone": 0.0,
+                                         "rate": rate})
+            gamepad.start()
+            total = int(seconds * events_per_second)
+            for i in range(total):
+                pad.write(ecodes.EV_ABS, ecodes.ABS_RZ, int(255 * i / (total - 1)))
+                pad.syn()
+                time.sleep(1.0 / events_per_second)
+            pad.write(ecodes.EV_KEY, ecodes.BTN_SOUTH, 1)
+            pad.write(ecodes.EV_KEY, ecodes.BTN_SOUTH, 0)
+            pad.syn()
+            time.sleep(3 * gamepad.period)
+            gamepad.stop()
+
+        levels = [call for call in app.calls if isinstance(call, float)]
+        self.assertLessEqual(gamepad.emitted, seconds * rate + 2, "sampler forwarded more than the send rate")
+        self.assertEqual(levels[-1:], [1.0], "final trigger position was not delivered")
+        self.assertIn("press", app.calls, "button press was not delivered")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from Mixer import IntensityMixer  # noqa: E402
+
+DEVICE = ("ws://localhost:12345", 0)
+OTHER = ("ws://localhost:12345", 1)
+
+
+class QueuedLoop:
+    """Stands in for the event loop: callbacks wait until run() (tick_ms stays 0)."""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def call_soon_threadsafe(self, callback, *args):
+        self.callbacks.append((callback, args))
+
+    def run(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback, args in callbacks:
+            callback(*args)
+
+
+class MixerTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = QueuedLoop()
+        self.sent = []
+        self.active = []
+        self.mixer = IntensityMixer(self.loop, lambda key, value: self.sent.append((key, value)),
+                                    self.active.append, level=0.5)
+
+    def mix(self, policy, contributions, **settings):
+        self.mixer.configure(policy, **settings)
+        for source, intensity in contributions.items():
+            self.mixer.set(DEVICE, source, intensity)
+        return self.mixer.mix(DEVICE)
+
+    def test_max(self):
+        self.assertEqual(self.mix("max", {"key": None, "relay": 0.8, "timed": 0.3}), 0.8)
+
+    def test_sum_is_clamped(self):
+        self.assertAlmostEqual(self.mix("sum", {"relay": 0.3, "timed": 0.4}), 0.7)
+        self.mixer.set(DEVICE, "gamepad", 0.6)
+        self.assertEqual(self.mixer.mix(DEVICE), 1.0)
+
+    def test_priority_takes_the_strongest_top_source(self):
+        # key and button share priority 10; relay is unlisted (0)
+        self.assertEqual(self.mix("priority", {"key": 0.2, "button": 0.4, "relay": 0.9}), 0.4)
+
+    def test_duck_scales_the_strongest_lower_source(self):
+        level = self.mix("duck", {"key": 0.6, "relay": 0.8, "gamepad": 0.4}, duck=0.25)
+        self.assertAlmostEqual(level, 0.6 + 0.8 * 0.25)
+
+    def test_priorities_by_first_word(self):
+        self.mixer.configure("priority", priorities={"relay": 20})
+        self.assertEqual(self.mixer.priority("relay"), 20)
+        self.assertEqual(self.mixer.priority("timed 3"), 5)
+        self.assertEqual(self.mixer.priority("unknown"), 0)
+
+    def test_invalid_settings_are_rejected(self):
+        for settings in ({"policy": "loudest"}, {"duck": 1.5}, {"tick_ms": -1}):
+            with self.assertRaises(ValueError):
+                self.mixer.configure(**settings)
+
+    def test_main_level_is_followed(self):
+        self.mixer.set(DEVICE, "key", None)
+        self.loop.run()
+        self.mixer.set_level(0.9)
+        self.loop.run()
+        self.assertEqual(self.sent, [(DEVICE, 0.5), (DEVICE, 0.9)])
+
+    def test_changes_within_a_tick_send_once(self):
+        for value in (0.1, 0.2, 0.3):
+            self.mixer.set(DEVICE, "relay", value)
+        self.mixer.set(OTHER, "timed", 0.4)
+        self.loop.run()
+        self.assertEqual(sorted(self.sent), [(DEVICE, 0.3), (OTHER, 0.4)])
+        self.mixer.set(DEVICE, "gamepad", 0.2)  # Weaker than relay: the mix doesn't change
+        self.loop.run()
+        self.assertEqual(len(self.sent), 2)
+        self.assertEqual(self.mixer.unchanged, 1)
+
+    def test_release_sends_zero_and_reports_inactive(self):
+        self.mixer.set(DEVICE, "key", 0.7)
+        self.mixer.set(DEVICE, "relay", 0.4)
+        self.loop.run()
+        self.mixer.remove("key")
+        self.loop.run()
+        self.assertEqual(self.active, [True])
+        self.mixer.remove("relay")
+        self.loop.run()
+        self.assertEqual(self.sent, [(DEVICE, 0.7), (DEVICE, 0.4), (DEVICE, 0.0)])
+        self.assertEqual(self.active, [True, False])
+
+    def test_clear_stops_every_device(self):
+        self.mixer.set(DEVICE, "key", 0.7)
+        self.mixer.set(None, "relay", 0.4)  # No device: outputs only
+        self.loop.run()
+        self.mixer.clear()
+        self.loop.run()
+        self.assertEqual(sorted(self.sent[2:], key=str), [(DEVICE, 0.0), (None, 0.0)])
+
+    def test_drop_server_forgets_its_devices(self):
+        self.mixer.set(DEVICE, "key", 0.7)
+        self.mixer.set(("ws://other:12345", 0), "key", 0.7)
+        self.loop.run()
+        self.mixer.drop_server(DEVICE[0])
+        self.assertEqual(list(self.mixer.contributions), [("ws://other:12345", 0)])
+        self.assertNotIn(DEVICE, self.mixer.outputs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+import textwrap
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from PluginHost import PluginHost  # noqa: E402
+
+PLUGIN = textwrap.dedent("""
+    from PluginHost import TriggerSource
+
+    events = []
+
+
+    class Part(TriggerSource):
+        def start(self):
+            if self.config.get("fail") == self.name:
+                raise RuntimeError("no device")
+            events.append(("start", self.name))
+
+        def stop(self):
+            events.append(("stop", self.name))
+
+
+    class First(Part):
+        pass
+
+
+    class Second(Part):
+        pass
+
+
+    def create(app, config):
+        return [First(app, config), Second(app, config)]
+""")
+
+
+class PluginHostTest(unittest.TestCase):
+    def setUp(self):
+        self.scratch = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.scratch.name, "two_parts.py"), "w") as f:
+            f.write(PLUGIN)
+        self.host = PluginHost(app=None, plugin_dir=self.scratch.name)
+        self.host.discover()
+
+    def tearDown(self):
+        self.host.stop_all()
+        sys.modules.pop("intiface_plugins.two_parts", None)
+        self.scratch.cleanup()
+
+    def events(self):
+        return sys.modules["intiface_plugins.two_parts"].events
+
+    def test_failed_start_stops_the_parts_already_started(self):
+        self.assertFalse(self.host.load("two_parts", {"fail": "Second"}))
+        self.assertEqual(self.events(), [("start", "First"), ("stop", "First")])
+        self.assertNotIn("two_parts", self.host.loaded)
+        self.assertEqual(self.host.errors["two_parts"], "RuntimeError: no device")
+
+    def test_load_and_unload(self):
+        self.assertTrue(self.host.load("two_parts", {}))
+        self.host.unload("two_parts")
+        self.assertEqual(self.events(), [("start", "First"), ("start", "Second"),
+                                         ("stop", "First"), ("stop", "Second")])
+
+
+if __name__ == "__main__":
+    unittest.main()
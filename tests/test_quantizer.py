@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from IntifaceCore import StepQuantizer  # noqa: E402
+
+ACTUATOR = (("ws://localhost:12345", 0), "Vibrate", 0)
+
+
+class StepQuantizerTest(unittest.TestCase):
+    def setUp(self):
+        self.quantizer = StepQuantizer()
+
+    def test_values_snap_up_to_a_step(self):
+        self.assertEqual(self.quantizer.quantize(ACTUATOR, 0.01, 20), 0.05)  # Non-zero is at least step 1
+        self.assertEqual(self.quantizer.quantize(ACTUATOR, 0.5, 20), 0.5)
+        self.assertEqual(self.quantizer.quantize(ACTUATOR, 0.51, 20), 0.55)
+        self.assertEqual(self.quantizer.quantize(ACTUATOR, 0.0, 20), 0.0)
+
+    def test_out_of_range_values_are_clamped(self):
+        self.assertEqual(self.quantizer.quantize(ACTUATOR, 1.7, 20), 1.0)
+        self.assertEqual(self.quantizer.quantize(ACTUATOR, -0.2, 20), 0.0)
+
+    def test_same_step_is_suppressed(self):
+        self.assertEqual(self.quantizer.quantize(ACTUATOR, 0.42, 10), 0.5)
+        self.assertIsNone(self.quantizer.quantize(ACTUATOR, 0.48, 10))
+        self.assertEqual((self.quantizer.sent, self.quantizer.suppressed), (1, 1))
+
+    def test_unknown_step_count_only_drops_exact_repeats(self):
+        self.assertEqual(self.quantizer.quantize(ACTUATOR, 0.42, None), 0.42)
+        self.assertIsNone(self.quantizer.quantize(ACTUATOR, 0.42, None))
+        self.assertEqual(self.quantizer.quantize(ACTUATOR, 0.43, None), 0.43)
+
+    def test_forget_resends(self):
+        other = (("ws://other:12345", 0), "Vibrate", 0)
+        self.quantizer.quantize(ACTUATOR, 0.5, 20)
+        self.quantizer.quantize(other, 0.5, 20)
+        self.quantizer.forget_server("ws://localhost:12345")
+        self.assertEqual(self.quantizer.quantize(ACTUATOR, 0.5, 20), 0.5)
+        self.assertIsNone(self.quantizer.quantize(other, 0.5, 20))
+        self.quantizer.forget()
+        self.assertEqual(self.quantizer.quantize(other, 0.5, 20), 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import os
+import random
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "plugins"))
+
+from relay import JitterBuffer, decode_frame, encode_frame  # noqa: E402
+
+
+def press_release(seconds, seed=1):
+    """Alternating full/zero samples every 200-1000 ms, like a key held and let go."""
+    rng = random.Random(seed)
+    samples, t, value = [], 0.0, 0
+    while t < seconds * 1000:
+        t += rng.uniform(200, 1000)
+        value = 1000 - value
+        samples.append((t, value))
+    return samples
+
+
+def stream(samples, buffer, batch_ms=50, network_ms=10):
+    """Batches samples like RelaySender and pushes each frame into buffer on arrival."""
+    seq, flush, i = 0, float(batch_ms), 0
+    while i < len(samples):
+        batch = []
+        while i < len(samples) and samples[i][0] <= flush:
+            batch.append(samples[i])
+            i += 1
+        if batch:
+            seq += 1
+            frame = json.loads(encode_frame(seq, batch, batch_ms))
+            buffer.batch = frame.get("b", 0)
+            for sent, value in decode_frame(frame):
+                buffer.push(sent, value, flush + network_ms)
+        flush += batch_ms
+
+
+class FrameCodecTest(unittest.TestCase):
+    def test_round_trip(self):
+        samples = [(1000.0, 0), (1012.0, 1000), (1030.0, 640), (1049.0, 0)]
+        frame = json.loads(encode_frame(7, samples, 50))
+        self.assertEqual((frame["s"], frame["b"]), (7, 50))
+        self.assertEqual(decode_frame(frame), samples)
+
+    def test_later_samples_are_deltas(self):
+        frame = json.loads(encode_frame(1, [(500.4, 300), (510.0, 350), (530.0, 350)]))
+        self.assertEqual((frame["t"], frame["v"], frame["d"]), (500, 300, [10, 50, 20, 0]))
+
+    def test_single_sample(self):
+        frame = json.loads(encode_frame(1, [(42.0, 1000)]))
+        self.assertEqual(decode_frame(frame), [(42, 1000)])
+
+
+class JitterBufferTest(unittest.TestCase):
+    def test_pop_due_returns_the_newest_due_value(self):
+        buffer = JitterBuffer(min_delay=20, max_delay=500)
+        for sent, value, arrival in ((0, 100, 10), (5, 200, 12), (50, 300, 60)):
+            buffer.push(sent, value, arrival)
+        self.assertIsNone(buffer.pop_due(20))
+        self.assertEqual(buffer.pop_due(40), 200)  # 100 was due too, but is already stale
+        self.assertEqual(len(buffer.queue), 1)
+        self.assertEqual(buffer.pop_due(100), 300)
+
+    def test_target_stays_within_bounds(self):
+        buffer = JitterBuffer(min_delay=20, max_delay=100)
+        for i in range(50):
+            buffer.push(i * 10, 500, i * 10 + (0 if i % 2 else 80))  # Very jittery arrivals
+        self.assertEqual(buffer.target, 100)
+        steady = JitterBuffer(min_delay=20, max_delay=100)
+        for i in range(50):
+            steady.push(i * 10, 500, i * 10 + 5)
+        self.assertEqual(steady.target, 20)
+
+    def test_batched_samples_are_not_late(self):
+        buffer = JitterBuffer(min_delay=20, max_delay=500)
+        stream(press_release(60), buffer, batch_ms=50)
+        self.assertEqual(buffer.late, 0)
+        self.assertGreaterEqual(buffer.target, 50)
+
+    def test_late_stop_is_played_at_once(self):
+        buffer = JitterBuffer(min_delay=20, max_delay=500)
+        buffer.push(0, 1000, 10)
+        self.assertEqual(buffer.pop_due(40), 1000)
+        buffer.push(50, 0, 200)  # Far behind its playout time
+        self.assertEqual((buffer.late, buffer.late_stops), (0, 1))
+        self.assertEqual(buffer.pop_due(200), 0)
+
+    def test_late_value_is_dropped(self):
+        buffer = JitterBuffer(min_delay=20, max_delay=500)
+        buffer.push(0, 1000, 10)
+        buffer.push(50, 500, 200)
+        self.assertEqual(buffer.late, 1)
+        self.assertEqual(buffer.pop_due(200), 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from ResponseCurve import (CURVE_TABLE_SIZE, apply_curve, compile_curve, curve_value,  # noqa: E402
+                           normalize_curve)
+
+
+class ResponseCurveTest(unittest.TestCase):
+    def test_normalize_fills_in_and_clamps(self):
+        curve = normalize_curve({"gamma": 50, "min": 0.9, "max": 0.2, "points": [[0.8, 1.4], [0.2, 0.1]]})
+        self.assertEqual(curve, {"gamma": 10.0, "min": 0.2, "max": 0.9, "points": [[0.2, 0.1], [0.8, 1.0]]})
+        self.assertEqual(normalize_curve(None)["gamma"], 1.0)
+
+    def test_gamma_min_and_max(self):
+        curve = normalize_curve({"gamma": 2.0, "min": 0.2, "max": 0.8})
+        self.assertEqual(curve_value(curve, 0.0), 0.0)  # Zero stays zero
+        self.assertAlmostEqual(curve_value(curve, 0.5), 0.2 + 0.6 * 0.25)
+        self.assertAlmostEqual(curve_value(curve, 1.0), 0.8)
+        self.assertAlmostEqual(curve_value(curve, 2.0), 0.8)
+
+    def test_points_replace_gamma(self):
+        curve = normalize_curve({"gamma": 3.0, "points": [[0.5, 0.8]]})
+        self.assertAlmostEqual(curve_value(curve, 0.25), 0.4)
+        self.assertAlmostEqual(curve_value(curve, 0.75), 0.9)
+
+    def test_table_entries_sit_on_actuator_steps(self):
+        curve = normalize_curve({"gamma": 2.0})
+        table = compile_curve(curve, step_count=10)
+        self.assertEqual(len(table), 11)
+        self.assertEqual(table[0], 0.0)
+        self.assertEqual(table[1], 0.1)  # 0.01 rounds up to step 1, never down to 0
+        self.assertEqual(table[5], 0.3)  # 0.25 -> step 3
+        self.assertTrue(all(round(value * 10, 9).is_integer() for value in table))
+
+    def test_apply_curve(self):
+        table = compile_curve(normalize_curve({"gamma": 2.0}), step_count=10)
+        self.assertEqual(apply_curve(table, 0.0), 0.0)
+        self.assertEqual(apply_curve(table, 0.5), 0.3)
+        self.assertEqual(apply_curve(table, 0.41), 0.3)  # Rounds up to input step 5
+        self.assertEqual(apply_curve(table, 1.5), 1.0)
+        self.assertEqual(len(compile_curve(normalize_curve({}))), CURVE_TABLE_SIZE + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from Timers import COMPACT_MIN, TimerService, next_daily, timed_action  # noqa: E402
+
+
+class TimerServiceTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.loop = asyncio.get_running_loop()
+        self.timers = TimerService(self.loop)
+        self.fired = []
+
+    async def test_fire_in_deadline_order(self):
+        for delay, name in ((0.03, "c"), (0.01, "a"), (0.02, "b")):
+            self.timers.call_later(delay, self.fired.append, name)
+        await asyncio.sleep(0.06)
+        self.assertEqual(self.fired, ["a", "b", "c"])
+        self.assertEqual(self.timers.pending(), 0)
+
+    async def test_ties_fire_in_the_order_set(self):
+        when = self.loop.time() + 0.01
+        for name in "abcd":
+            self.timers.call_at(when, self.fired.append, name)
+        await asyncio.sleep(0.03)
+        self.assertEqual(self.fired, list("abcd"))
+
+    async def test_cancelled_timer_does_not_fire(self):
+        first = self.timers.call_later(0.01, self.fired.append, "first")
+        self.timers.call_later(0.02, self.fired.append, "second")
+        first.cancel()
+        self.assertEqual(self.timers.pending(), 1)
+        await asyncio.sleep(0.04)
+        self.assertEqual(self.fired, ["second"])
+        self.assertEqual(self.timers.cancelled, 0)
+        first.cancel()  # After the fact: no effect on the counts
+        self.assertEqual(self.timers.cancelled, 0)
+
+    async def test_earlier_timer_moves_the_wakeup(self):
+        self.timers.call_later(10, self.fired.append, "late")
+        self.timers.call_later(0.01, self.fired.append, "early")
+        await asyncio.sleep(0.03)
+        self.assertEqual(self.fired, ["early"])
+        self.assertEqual(self.timers.pending(), 1)
+
+    async def test_set_and_cancelled_timers_are_compacted(self):
+        for _ in range(COMPACT_MIN * 4):
+            self.timers.call_later(600, self.fired.append, "limit").cancel()
+        self.assertLessEqual(len(self.timers.heap), COMPACT_MIN * 2 + 1)
+        self.assertGreater(self.timers.compactions, 0)
+        self.assertEqual(self.timers.pending(), 0)
+
+    async def test_set_from_another_thread(self):
+        await self.loop.run_in_executor(None, self.timers.call_later, 0.01, self.fired.append, "thread")
+        await asyncio.sleep(0.03)
+        self.assertEqual(self.fired, ["thread"])
+
+    async def test_wall_clock_timer(self):
+        self.timers.call_at_wall(time.time() + 0.02, self.fired.append, "wall")
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.fired, ["wall"])
+
+    async def test_wall_clock_timer_waits_when_the_clock_was_set_back(self):
+        timer = self.timers.call_at_wall(time.time() + 0.2, self.fired.append, "wall")
+        await asyncio.sleep(0)  # Let the timer reach the heap
+        # As if the wall clock had been set back: the loop deadline comes before the wall time
+        self.timers.heap[0] = (self.loop.time(), self.timers.heap[0][1], timer)
+        self.timers.wake(self.loop.time())
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.fired, [])
+        await asyncio.sleep(0.25)
+        self.assertEqual(self.fired, ["wall"])
+
+
+class TimedActionTest(unittest.TestCase):
+    def test_timed_action(self):
+        self.assertEqual(timed_action({"intensity": 0.6, "seconds": 2}), (0.6, 2.0, 0.0))
+        self.assertEqual(timed_action({"seconds": 5, "delay": 10}), (None, 5.0, 10.0))
+        for entry in ({"seconds": 0}, {"seconds": 1, "intensity": 2}, {"seconds": 1, "delay": -1}, [1]):
+            with self.assertRaises(ValueError):
+                timed_action(entry)
+
+    def test_next_daily(self):
+        now = time.mktime((2026, 3, 10, 12, 0, 0, 0, 0, -1))
+        self.assertEqual(time.localtime(next_daily("21:30", now))[2:5], (10, 21, 30))
+        self.assertEqual(time.localtime(next_daily("08:15", now))[2:5], (11, 8, 15))
+        for clock in ("25:00", "12", "12:60"):
+            with self.assertRaises(ValueError):
+                next_daily(clock, now)
+
+
+if __name__ == "__main__":
+    unittest.main()